@@ -0,0 +1,264 @@
+"""
+Asyncio-native serving mode for the chatbot API.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001
+    python asgi_app.py
+
+The chat and user-selection routes are served directly on the event loop: the
+OpenAI call uses AsyncOpenAI, while RAG retrieval and MySQL writes run on a
+bounded thread pool so they never block the loop. Every other /cb/api/* route is
+delegated to the Flask app through uvicorn's WSGI adapter, so routes and
+payloads are identical to the threaded Flask server in rag_backend.py.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import math
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAIError
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+import metrics
+import rag_backend
+from conversation_store import SessionMissing
+from llm_gateway import GatewayOverloaded
+from rag_backend import logger, format_sse, with_api_usage
+
+# Blocking work (ChromaDB queries, MySQL writes) runs here instead of on the event loop
+BLOCKING_WORKERS = int(os.getenv("ASGI_BLOCKING_WORKERS", "32"))
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="asgi-blocking")
+
+# Threads used for routes that fall through to the Flask app
+WSGI_WORKERS = int(os.getenv("ASGI_WSGI_WORKERS", "10"))
+wsgi_fallback = WSGIMiddleware(rag_backend.app, workers=WSGI_WORKERS)
+
+# Mirrors the flask_cors configuration in rag_backend.py
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-expose-headers", b"*")
+]
+
+class BadRequest(Exception):
+    pass
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the worker pool and await its result"""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (per-request stage timings) over to the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(blocking_executor, functools.partial(context.run, func, *args, **kwargs))
+
+async def read_json(receive):
+    """Read the full request body and decode it as a JSON object"""
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise BadRequest("Client disconnected")
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    if not body:
+        return {}
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise BadRequest("Invalid JSON body")
+    if not isinstance(payload, dict):
+        raise BadRequest("JSON body must be an object")
+    return payload
+
+async def send_json(send, body, status=200, headers=()):
+    data = json.dumps(body).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(data)).encode("ascii"))
+        ] + list(headers) + CORS_HEADERS
+    })
+    await send({"type": "http.response.body", "body": data})
+
+async def send_sse(send, frames):
+    """Send an async iterator of SSE frames as a streaming response"""
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no")
+        ] + CORS_HEADERS
+    })
+    async for frame in frames:
+        await send({"type": "http.response.body", "body": frame.encode("utf-8"), "more_body": True})
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+async def iterate_frames(frames):
+    for frame in frames:
+        yield frame
+
+async def stream_chat_completion_async(completion, on_complete=None, done=None):
+    """Async counterpart of rag_backend.stream_chat_completion"""
+    started = time.perf_counter()
+    try:
+        parts = []
+        async for chunk in completion:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield format_sse({"content": delta})
+        if on_complete:
+            await run_blocking(on_complete, "".join(parts))
+        yield format_sse({"done": True, **(done or {})}, event="done")
+    except Exception as e:
+        logger.error(f"Error while streaming chat completion: {e}")
+        yield format_sse({"error": str(e)}, event="error")
+    finally:
+        metrics.observe_stage("llm_stream", time.perf_counter() - started)
+        await completion.close()
+
+async def chat(scope, receive, send, stream=False):
+    payload = await read_json(receive)
+    stream = stream or bool(payload.get("stream", False))
+    try:
+        error = rag_backend.chat_payload_error(payload)
+        if error:
+            await send_json(send, {"error": error}, 400)
+            return
+
+        plan = await run_blocking(rag_backend.prepare_chat, payload)
+        if plan["cached_content"] is not None:
+            await run_blocking(plan["record_turn"], plan["cached_content"])
+            if stream:
+                await send_sse(send, iterate_frames(rag_backend.cached_sse_frames(plan)))
+            else:
+                await send_json(send, {"content": plan["cached_content"], "cached": plan["cache_hit"],
+                                       "token_usage": plan["token_usage"]})
+            return
+
+        with metrics.timed("llm"):
+            if stream:
+                resp, coalesced = await plan["gateway"].stream_async(plan["request"]), False
+            else:
+                resp, coalesced = await plan["gateway"].complete_async(plan["request"])
+        logger.info(f"Generated response with{'out' if not plan['context'] else ''} RAG context")
+
+        if stream:
+            await send_sse(send, stream_chat_completion_async(resp, on_complete=plan["on_complete"],
+                                                              done={"token_usage": plan["token_usage"]}))
+            return
+
+        content = resp.choices[0].message.content
+        await run_blocking(plan["on_complete"], content, shared=coalesced)
+        token_usage = dict(plan["token_usage"], coalesced=True) if coalesced else \
+            with_api_usage(plan["token_usage"], resp)
+        await send_json(send, {"content": content, "token_usage": token_usage})
+
+    except SessionMissing as e:
+        logger.info(str(e))
+        await send_json(send, {"error": str(e), "status": "session_missing"}, 409)
+
+    except GatewayOverloaded as e:
+        logger.warning(f"LLM gateway overloaded: {e}")
+        await send_json(send, {"error": str(e), "status": "overloaded"}, 503,
+                        [(b"retry-after", str(max(1, math.ceil(e.retry_after))).encode("ascii"))])
+
+    except OpenAIError as oe:
+        logger.error(f"OpenAI API error: {oe}")
+        await send_json(send, {"error": str(oe)}, 500)
+
+    except Exception as e:
+        logger.error(f"Error in chat_with_openai: {e}")
+        await send_json(send, {"error": str(e)}, 500)
+
+async def save_user_selections(scope, receive, send):
+    data = await read_json(receive)
+    try:
+        user_selections = data.get("userSelections")
+        if not user_selections:
+            await send_json(send, {"error": "User selections data is required"}, 400)
+            return
+
+        session_id = data.get("sessionId") or str(uuid.uuid4())
+        record = rag_backend.build_user_selection_record(session_id, user_selections)
+        body, status_code = await run_blocking(rag_backend.persist_user_selection, record)
+        await send_json(send, body, status_code)
+
+    except Exception as e:
+        logger.error(f"Error saving user selections: {e}")
+        await send_json(send, {"error": f"Failed to save user selections: {str(e)}"}, 500)
+
+# Routes served natively on the event loop; everything else goes to Flask
+ASYNC_ROUTES = {
+    ("POST", "/cb/api/groq/chat"): chat,
+    ("POST", "/cb/api/groq/chat/stream"): functools.partial(chat, stream=True),
+    ("POST", "/cb/api/user-selections"): save_user_selections
+}
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for gateway in [rag_backend.llm_gateway, *rag_backend.route_gateways.values()]:
+                await gateway.aclose()
+            blocking_executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    handler = None
+    if scope["type"] == "http":
+        handler = ASYNC_ROUTES.get((scope["method"], scope["path"]))
+    if handler is None:
+        await wsgi_fallback(scope, receive, send)
+        return
+
+    await instrumented(handler, scope, receive, send)
+
+async def instrumented(handler, scope, receive, send):
+    """Run a native route with the same request metrics and Server-Timing header as the Flask hooks"""
+    started = time.perf_counter()
+    headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope.get("headers", [])}
+    timings = metrics.start_request_timings() if rag_backend.server_timing_requested(
+        {"X-Server-Timing": headers.get("x-server-timing", "")}) else None
+
+    async def send_with_metrics(message):
+        if message["type"] == "http.response.start":
+            elapsed = time.perf_counter() - started
+            if timings is not None:
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (b"server-timing", metrics.server_timing_header(timings, total=elapsed).encode("latin-1")),
+                    (b"timing-allow-origin", b"*")
+                ])
+            route, method = scope["path"], scope["method"]
+            metrics.HTTP_REQUEST_SECONDS.observe(elapsed, route=route, method=method)
+            metrics.HTTP_REQUESTS.inc(route=route, method=method, status=message["status"])
+            if message["status"] >= 500:
+                metrics.HTTP_ERRORS.inc(route=route)
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_with_metrics)
+    except BadRequest as e:
+        await send_json(send_with_metrics, {"error": str(e)}, 400)
+    finally:
+        metrics.stop_request_timings()
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=5001, log_level="warning")
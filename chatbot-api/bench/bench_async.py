@@ -0,0 +1,100 @@
+"""
+Concurrent-chat throughput: threaded Flask server vs. the ASGI serving mode.
+
+Both servers are started against the same fake OpenAI-compatible server
+(bench/fake_openai_server.py), so the numbers only reflect how many in-flight chats
+each serving mode can hold:
+
+    python bench/bench_async.py --concurrency 50 200 --requests 400 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import api_env, free_port, latency_summary, start_api, start_fake_llm, stop
+
+async def run_load(base_url, total_requests, concurrency, stream=False):
+    """Fire total_requests chat calls with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    path = "/cb/api/groq/chat/stream" if stream else "/cb/api/groq/chat"
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def one():
+            nonlocal errors
+            # A unique question per request keeps the response cache out of the picture
+            payload = {
+                "messages": [{"role": "user", "content": f"How does Flexwork work? ({uuid.uuid4().hex})"}],
+                "use_rag": False
+            }
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(path, json=payload)
+                    if response.status_code != 200:
+                        errors += 1
+                        return
+                except httpx.HTTPError:
+                    errors += 1
+                    return
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total_requests)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        **latency_summary(latencies)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["flask", "asgi"], choices=["flask", "asgi"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[10, 50, 200])
+    parser.add_argument("--requests", type=int, default=400, help="Requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.5, help="Fake LLM time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--stream", action="store_true", help="Benchmark the SSE route instead")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    llm_process, llm_url = start_fake_llm(args.latency, args.tokens_per_second)
+    env = api_env(llm_url, {"RESPONSE_CACHE_ENABLED": "false"})
+    results = []
+    try:
+        for mode in args.modes:
+            port = free_port()
+            api_process = start_api(mode, port, env)
+            try:
+                for concurrency in args.concurrency:
+                    result = asyncio.run(run_load(f"http://127.0.0.1:{port}", args.requests,
+                                                  concurrency, args.stream))
+                    result["mode"] = mode
+                    results.append(result)
+                    print(f"{mode:>5}  c={concurrency:<4} {result['throughput_rps']:>8} req/s  "
+                          f"p50={result['p50_ms']}ms  p95={result['p95_ms']}ms  errors={result['errors']}")
+            finally:
+                stop(api_process)
+    finally:
+        stop(llm_process)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"latency_s": args.latency, "stream": args.stream, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
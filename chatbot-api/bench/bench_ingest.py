@@ -0,0 +1,144 @@
+"""
+Ingestion throughput: one-file-per-request uploads vs. the bulk pipeline.
+
+Generates a synthetic corpus (txt, docx, csv and json files), then ingests it into a
+scratch ChromaDB twice - once file by file through ChromaDBManager.ingest_document
+(what /cb/api/vector-db/upload does per request) and once as a zip archive through
+expand_uploads + ingest_files (what /cb/api/vector-db/upload/bulk does):
+
+    python bench/bench_ingest.py --docs 300 --paragraphs 40 --workers 4
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import docx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import API_DIR
+
+sys.path.insert(0, API_DIR)
+from chromadb_manager import ChromaDBManager
+from ingestion import expand_uploads, ingest_files
+
+WORDS = ("flexwork freelancer employer student training program react sap fico consulting "
+         "project internship upskilling mentor hiring remote onsite contract pricing fees "
+         "career roadmap interview panel headcount availability skills certificate").split()
+
+def make_paragraph(rng, words=60):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def make_corpus(directory, docs, paragraphs, seed=7):
+    """Write a mixed-format corpus and return the file paths"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(docs):
+        kind = ("txt", "docx", "csv", "json")[i % 4]
+        path = os.path.join(directory, f"doc_{i:05d}.{kind}")
+        if kind == "txt":
+            with open(path, "w") as f:
+                f.write("\n\n".join(make_paragraph(rng) for _ in range(paragraphs)))
+        elif kind == "docx":
+            document = docx.Document()
+            for _ in range(paragraphs):
+                document.add_paragraph(make_paragraph(rng))
+            document.save(path)
+        elif kind == "csv":
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["course", "skill", "fee", "description"])
+                for j in range(paragraphs * 4):
+                    writer.writerow([f"C{j}", rng.choice(WORDS), rng.randint(100, 999), make_paragraph(rng, 12)])
+        else:
+            with open(path, "w") as f:
+                json.dump([{"question": make_paragraph(rng, 8), "answer": make_paragraph(rng, 40)}
+                           for _ in range(paragraphs)], f)
+        paths.append(path)
+    return paths
+
+def fresh_manager(workdir, args):
+    """ChromaDBManager on a scratch chroma_db inside workdir"""
+    return ChromaDBManager(persist_path=os.path.join(workdir, "chroma_db"),
+                           embed_batch_size=args.embed_batch_size, embed_workers=args.embed_workers)
+
+def summarize(label, docs, chunks, elapsed):
+    result = {
+        "mode": label,
+        "docs": docs,
+        "chunks": chunks,
+        "elapsed_s": round(elapsed, 3),
+        "docs_per_minute": round(docs * 60 / elapsed, 2) if elapsed else 0.0,
+        "chunks_per_second": round(chunks / elapsed, 2) if elapsed else 0.0
+    }
+    print(f"{label:>10}: {docs} docs, {chunks} chunks in {result['elapsed_s']}s  "
+          f"({result['docs_per_minute']} docs/min, {result['chunks_per_second']} chunks/s)")
+    return result
+
+def run_sequential(paths, args):
+    workdir = tempfile.mkdtemp(prefix="bench-ingest-seq-")
+    try:
+        manager = fresh_manager(workdir, args)
+        chunks = 0
+        started = time.perf_counter()
+        for path in paths:
+            with open(path, "rb") as f:
+                chunks += manager.ingest_document(f, os.path.basename(path))["added_chunks"]
+        return summarize("sequential", len(paths), chunks, time.perf_counter() - started)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def run_bulk(paths, args):
+    workdir = tempfile.mkdtemp(prefix="bench-ingest-bulk-")
+    try:
+        manager = fresh_manager(workdir, args)
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            for path in paths:
+                zf.write(path, arcname=os.path.basename(path))
+        archive.seek(0)
+
+        started = time.perf_counter()
+        spool_dir = tempfile.mkdtemp(dir=workdir)
+        files = expand_uploads([("corpus.zip", archive)], spool_dir, ChromaDBManager.SUPPORTED_EXTENSIONS)
+        result = ingest_files(manager, files, workers=args.workers, write_batch_size=args.write_batch_size)
+        return summarize("bulk", result["summary"]["success"], result["chunk_count"], time.perf_counter() - started)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=30, help="Paragraphs (or row groups) per document")
+    parser.add_argument("--workers", type=int, default=4, help="Bulk chunking workers")
+    parser.add_argument("--write-batch-size", type=int, default=1024)
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--embed-workers", type=int, default=2)
+    parser.add_argument("--modes", nargs="+", default=["sequential", "bulk"], choices=["sequential", "bulk"])
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    corpus_dir = tempfile.mkdtemp(prefix="bench-corpus-")
+    try:
+        paths = make_corpus(corpus_dir, args.docs, args.paragraphs)
+        results = []
+        if "sequential" in args.modes:
+            results.append(run_sequential(paths, args))
+        if "bulk" in args.modes:
+            results.append(run_bulk(paths, args))
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
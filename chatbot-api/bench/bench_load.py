@@ -0,0 +1,317 @@
+"""
+Mixed-workload load test for the chatbot API against a local fake LLM.
+
+The API runs in-process (threaded werkzeug server in this process) or as a subprocess
+("flask" or "asgi" serving mode), pointed at bench/fake_openai_server.py and at the
+SQLite MySQL stand-in from bench/fake_mysql.py. A seeded corpus is bulk-uploaded into a
+scratch ChromaDB first, then a seeded mix of chat (with and without RAG, plain and
+streaming), search, upload and user-selection requests is replayed with a fixed
+concurrency:
+
+    python bench/bench_load.py --mode inprocess --requests 1000 --concurrency 20 --output load.json
+    python bench/bench_load.py --mode asgi --mix chat_rag=5,search=3,user_selection=2 --compare load.json
+    python bench/bench_load.py --mode asgi --llm-fail-rate 0.1 --llm-max-concurrent 8   # flaky, rate-limited LLM
+
+Results (p50/p95/p99 per operation, requests per second, server memory and the mean
+time per processing stage from /cb/api/metrics) are written as JSON with the git commit,
+so runs can be compared between commits with --compare.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime, timezone
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import API_DIR, api_env, free_port, latency_summary, rss_mb, start_api, start_fake_llm, stop, wait_for_http
+
+WORDS = ("flexwork freelancer employer student training program react sap fico consulting "
+         "project internship upskilling mentor hiring remote onsite contract pricing fees "
+         "career roadmap interview panel headcount availability skills certificate").split()
+
+DEFAULT_MIX = "chat_rag=35,chat_no_rag=15,chat_stream=10,search=20,upload=5,user_selection=15"
+
+ROLES = ("Employer", "Freelancer", "Student")
+
+def make_paragraph(rng, words=60):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def make_question(rng):
+    return f"What does Flexwork offer for {' '.join(rng.choice(WORDS) for _ in range(4))}?"
+
+def corpus_archive(docs, paragraphs, seed):
+    """Zip of seeded text documents for the bulk upload endpoint"""
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i in range(docs):
+            archive.writestr(f"corpus_{i:04d}.txt", "\n\n".join(make_paragraph(rng) for _ in range(paragraphs)))
+    return buffer.getvalue()
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Unknown operation in --mix: {name} (expected one of {', '.join(OPERATIONS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+# Each operation returns (method, path, request kwargs) for one request
+def op_chat(rng, n, use_rag=True):
+    # The suffix keeps the response cache out of the measurement unless it is enabled on purpose
+    question = f"{make_question(rng)} ({n})"
+    return "POST", "/cb/api/groq/chat", {"json": {"messages": [{"role": "user", "content": question}], "use_rag": use_rag}}
+
+def op_chat_stream(rng, n):
+    question = f"{make_question(rng)} ({n})"
+    return "POST", "/cb/api/groq/chat/stream", {"json": {"messages": [{"role": "user", "content": question}]}}
+
+def op_search(rng, n):
+    return "POST", "/cb/api/vector-db/search", {"json": {"query": make_question(rng), "n_results": 5}}
+
+def op_upload(rng, n):
+    content = "\n\n".join(make_paragraph(rng) for _ in range(5)).encode("utf-8")
+    return "POST", "/cb/api/vector-db/upload", {"files": {"file": (f"load_upload_{n:06d}.txt", content, "text/plain")}}
+
+def op_user_selection(rng, n):
+    # A few saves per session, like the UI saving after each step of the guided flow
+    selections = {"role": rng.choice(ROLES), "name": f"Load Test {n}", "email": f"load{n}@example.com",
+                  "skills": rng.choice(WORDS), "work_mode": rng.choice(["Remote", "Onsite", "Hybrid"])}
+    return "POST", "/cb/api/user-selections", {"json": {"sessionId": str(uuid.UUID(int=n // 3)), "userSelections": selections}}
+
+OPERATIONS = {
+    "chat_rag": op_chat,
+    "chat_no_rag": lambda rng, n: op_chat(rng, n, use_rag=False),
+    "chat_stream": op_chat_stream,
+    "search": op_search,
+    "upload": op_upload,
+    "user_selection": op_user_selection
+}
+
+def build_schedule(mix, total, seed):
+    """Deterministic list of (operation, request kwargs...) so every run replays the same requests"""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    schedule = []
+    for n in range(total):
+        name = rng.choices(names, weights)[0]
+        schedule.append((name,) + OPERATIONS[name](rng, n))
+    return schedule
+
+async def run_load(base_url, schedule, concurrency):
+    """Replay the schedule with at most `concurrency` requests in flight"""
+    queue = asyncio.Queue()
+    for item in schedule:
+        queue.put_nowait(item)
+    latencies = {name: [] for name, *_ in schedule}
+    errors = {name: 0 for name in latencies}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def worker():
+            while not queue.empty():
+                name, method, path, kwargs = queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    # Streams are read to the end, so their latency covers the whole answer
+                    response = await client.request(method, path, **kwargs)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies[name].append((time.perf_counter() - started) * 1000)
+                else:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    operations = {}
+    for name in sorted(latencies):
+        operations[name] = {
+            "requests": len(latencies[name]) + errors[name],
+            "errors": errors[name],
+            "throughput_rps": round(len(latencies[name]) / elapsed, 2) if elapsed else 0.0,
+            **latency_summary(latencies[name])
+        }
+    everything = [value for values in latencies.values() for value in values]
+    overall = {
+        "requests": len(schedule),
+        "errors": sum(errors.values()),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(everything) / elapsed, 2) if elapsed else 0.0,
+        **latency_summary(everything)
+    }
+    return overall, operations
+
+STAGE_LINE = re.compile(r'^chatbot_stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+def stage_totals(base_url):
+    """{stage: [seconds, count]} from the Prometheus endpoint"""
+    totals = {}
+    text = httpx.get(f"{base_url}/cb/api/metrics", timeout=30).text
+    for line in text.splitlines():
+        match = STAGE_LINE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            totals.setdefault(stage, [0.0, 0])[0 if kind == "sum" else 1] = float(value)
+    return totals
+
+def stage_means(before, after):
+    """Mean milliseconds per stage for the observations made between two snapshots"""
+    means = {}
+    for stage, (seconds, count) in after.items():
+        previous = before.get(stage, [0.0, 0])
+        observed = count - previous[1]
+        if observed > 0:
+            means[stage] = {"count": int(observed), "mean_ms": round((seconds - previous[0]) * 1000 / observed, 2)}
+    return means
+
+def start_inprocess(port, env):
+    """Import rag_backend in this process (after installing the MySQL stand-in) and serve it on a thread"""
+    import logging
+    import fake_mysql
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    os.environ.update(env)
+    fake_mysql.install()
+    sys.path.insert(0, API_DIR)
+    import rag_backend
+
+    server = make_server("127.0.0.1", port, rag_backend.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    wait_for_http(f"http://127.0.0.1:{port}/cb/api/test", timeout=30)
+    return server
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=API_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_report(result, baseline=None):
+    rows = dict(result["operations"], overall=result["overall"])
+    base_rows = dict(baseline["operations"], overall=baseline["overall"]) if baseline else {}
+    print(f"{'operation':<15}{'reqs':>6}{'err':>5}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in rows.items():
+        print(f"{name:<15}{row['requests']:>6}{row['errors']:>5}{row['throughput_rps']:>9}"
+              f"{row['p50_ms'] or '-':>10}{row['p95_ms'] or '-':>10}{row['p99_ms'] or '-':>10}")
+        base = base_rows.get(name)
+        if base and base.get("p95_ms") and row.get("p95_ms"):
+            print(f"{'  vs baseline':<15}{'':>11}{row['throughput_rps'] - base['throughput_rps']:>+9.2f}"
+                  f"{row['p50_ms'] - base['p50_ms']:>+10.1f}{row['p95_ms'] - base['p95_ms']:>+10.1f}"
+                  f"{row['p99_ms'] - base['p99_ms']:>+10.1f}")
+    if result["memory"]:
+        print(f"server memory: {result['memory']}")
+    for stage, values in sorted(result["stages"].items()):
+        print(f"  stage {stage:<16} {values['mean_ms']:>9} ms avg over {values['count']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", default="inprocess", choices=["inprocess", "flask", "asgi"])
+    parser.add_argument("--requests", type=int, default=500, help="Measured requests")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma-separated operation=weight pairs")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--corpus-docs", type=int, default=50)
+    parser.add_argument("--corpus-paragraphs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake LLM time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=100.0)
+    parser.add_argument("--llm-fail-rate", type=float, default=0.0, help="Share of fake LLM calls answered with a 429")
+    parser.add_argument("--llm-max-concurrent", type=int, default=0,
+                        help="Fake LLM answers 429 beyond this many calls in flight (0: no limit)")
+    parser.add_argument("--response-cache", action="store_true", help="Leave the response cache enabled")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline results JSON to print deltas against")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+    # The in-process mode changes into the scratch directory
+    output = os.path.abspath(args.output) if args.output else None
+    compare = os.path.abspath(args.compare) if args.compare else None
+
+    workdir = tempfile.mkdtemp(prefix="chatbot-load-")
+    llm_process, llm_url = start_fake_llm(args.latency, args.tokens_per_second, extra_args=[
+        "--fail-rate", str(args.llm_fail_rate), "--max-concurrent", str(args.llm_max_concurrent), "--seed", str(args.seed)])
+    env = api_env(llm_url, {
+        "CHROMA_DB_PATH": os.path.join(workdir, "chroma_db"),
+        "FAKE_MYSQL_PATH": os.path.join(workdir, "mysql.sqlite3"),
+        "RESPONSE_CACHE_ENABLED": "true" if args.response_cache else "false",
+        "USER_SELECTIONS_WRITE_BEHIND_SECONDS": "0"
+    })
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    api_process = server = None
+    try:
+        if args.mode == "inprocess":
+            os.chdir(workdir)
+            server = start_inprocess(port, env)
+        else:
+            api_process = start_api(args.mode, port, env, workdir=workdir, fake_mysql=True)
+        server_pid = api_process.pid if api_process else None
+
+        started = time.perf_counter()
+        response = httpx.post(f"{base_url}/cb/api/vector-db/upload/bulk", timeout=1800,
+                              files={"files": ("corpus.zip", corpus_archive(args.corpus_docs, args.corpus_paragraphs, args.seed),
+                                               "application/zip")})
+        response.raise_for_status()
+        print(f"Seeded {args.corpus_docs} documents in {time.perf_counter() - started:.1f}s")
+
+        schedule = build_schedule(mix, args.warmup + args.requests, args.seed)
+        if args.warmup:
+            asyncio.run(run_load(base_url, schedule[:args.warmup], args.concurrency))
+        memory_before = rss_mb(server_pid)
+        stages_before = stage_totals(base_url)
+        overall, operations = asyncio.run(run_load(base_url, schedule[args.warmup:], args.concurrency))
+        stages = stage_means(stages_before, stage_totals(base_url))
+        memory = rss_mb(server_pid)
+        if memory and memory_before:
+            memory["rss_growth_mb"] = round(memory["rss_mb"] - memory_before["rss_mb"], 1)
+    finally:
+        if server:
+            server.shutdown()
+        stop(api_process)
+        stop(llm_process)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": dict(vars(args), mix=mix),
+        "overall": overall,
+        "operations": operations,
+        # In-process, this includes the load generator itself
+        "memory": memory,
+        "stages": stages
+    }
+    baseline = None
+    if compare:
+        with open(compare) as f:
+            baseline = json.load(f)
+        print(f"Comparing against {compare} (commit {baseline.get('commit')})")
+    print_report(result, baseline)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(result, f, indent=2)
+
+if __name__ == "__main__":
+    main()
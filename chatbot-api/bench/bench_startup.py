@@ -0,0 +1,106 @@
+"""
+Cold start of an API worker: time until it answers, and the cost of its first chat.
+
+A scratch ChromaDB is filled with a seeded corpus once; then API servers are started
+on it repeatedly, with and without WARMUP_ON_START. For each start the script records
+how long the process took to answer /cb/api/test, the latency of the first and second
+RAG chat, and the import and initialization times from /cb/api/startup ("imported s"
+is the process age when rag_backend finished importing):
+
+    python bench/bench_startup.py --mode flask asgi --starts 3 --corpus-docs 40
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import api_env, free_port, start_api, start_fake_llm, stop
+
+WORDS = ("flexwork freelancer employer student training internship consultant trainer panel "
+         "upskilling certificate payment remote project hiring onboarding").split()
+
+def fill_corpus(workdir, env, docs, paragraphs, seed):
+    """Upload a seeded corpus through a throwaway server so later starts find a populated store"""
+    rng = random.Random(seed)
+    port = free_port()
+    process = start_api("flask", port, env, workdir=workdir, fake_mysql=True)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=300) as client:
+            for index in range(docs):
+                text = "\n\n".join(" ".join(rng.choice(WORDS) for _ in range(60)) for _ in range(paragraphs))
+                response = client.post("/cb/api/vector-db/upload",
+                                       files={"file": (f"doc{index}.txt", text.encode("utf-8"))})
+                response.raise_for_status()
+            return client.get("/cb/api/vector-db/status").json()
+    finally:
+        stop(process)
+
+def timed_chat(client, question):
+    started = time.perf_counter()
+    response = client.post("/cb/api/groq/chat", json={"messages": [{"role": "user", "content": question}]})
+    response.raise_for_status()
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def cold_start(mode, workdir, env, warmup):
+    port = free_port()
+    started = time.perf_counter()
+    process = start_api(mode, port, dict(env, WARMUP_ON_START="true" if warmup else "false"),
+                        workdir=workdir, fake_mysql=True)
+    ready_ms = round((time.perf_counter() - started) * 1000, 1)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            if warmup:
+                # Wait for the background warm-up, as a readiness probe would
+                while not client.get("/cb/api/startup").json().get("warmup"):
+                    time.sleep(0.05)
+            warm_ms = round((time.perf_counter() - started) * 1000, 1)
+            first_ms = timed_chat(client, "How do I join FlexWork as a trainer for corporate training?")
+            second_ms = timed_chat(client, "What internship and upskilling programs are there for students?")
+            response = client.get("/cb/api/startup")
+            # Older commits have no startup report
+            report = response.json() if response.status_code == 200 else {"imports": {}, "components": {}}
+    finally:
+        stop(process)
+    return {"mode": mode, "warmup": warmup, "ready_ms": ready_ms, "warm_ms": warm_ms,
+            "first_chat_ms": first_ms, "second_chat_ms": second_ms, "imports": report["imports"],
+            "components": {name: {"seconds": entry["seconds"], "trigger": entry["trigger"], "ok": entry["ok"]}
+                           for name, entry in report["components"].items()}}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", nargs="+", choices=["flask", "asgi"], default=["flask", "asgi"])
+    parser.add_argument("--starts", type=int, default=3, help="Cold starts per mode and warm-up setting")
+    parser.add_argument("--corpus-docs", type=int, default=40)
+    parser.add_argument("--corpus-paragraphs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency", type=float, default=0.2, help="Fake LLM time to first token (seconds)")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    llm, base_url = start_fake_llm(latency=args.latency, tokens_per_second=500)
+    workdir = tempfile.mkdtemp(prefix="chatbot-startup-")
+    env = api_env(base_url, {"FAKE_MYSQL_PATH": os.path.join(workdir, "mysql.sqlite3"),
+                             "RESPONSE_CACHE_ENABLED": "false", "PRECOMPUTED_ANSWERS_ENABLED": "false"})
+    try:
+        corpus = fill_corpus(workdir, env, args.corpus_docs, args.corpus_paragraphs, args.seed)
+        runs = [cold_start(mode, workdir, env, warmup)
+                for mode in args.mode for warmup in (False, True) for _ in range(args.starts)]
+    finally:
+        stop(llm)
+
+    print(f"{'mode':6} {'warm-up':8} {'ready ms':>9} {'warm ms':>9} {'1st chat':>9} {'2nd chat':>9} {'imported s':>11}")
+    for run in runs:
+        print(f"{run['mode']:6} {str(run['warmup']):8} {run['ready_ms']:9.1f} {run['warm_ms']:9.1f} "
+              f"{run['first_chat_ms']:9.1f} {run['second_chat_ms']:9.1f} {run['imports'].get('process_age', 0):11.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"corpus": corpus, "runs": runs}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
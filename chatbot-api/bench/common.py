@@ -0,0 +1,124 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+
+Servers under test are started as subprocesses from a scratch working directory so
+they never touch the real ./chroma_db next to rag_backend.py.
+"""
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(API_DIR, "bench")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def latency_summary(latencies_ms):
+    """p50/p95/p99/mean/max of a list of latencies in milliseconds"""
+    if not latencies_ms:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    return {
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "p99_ms": round(percentile(latencies_ms, 99), 2),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 2),
+        "max_ms": round(max(latencies_ms), 2)
+    }
+
+def wait_for_http(url, timeout=60.0, process=None):
+    """Poll a URL until it answers (any status) or the timeout expires"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server process exited with code {process.returncode} while starting")
+        try:
+            urllib.request.urlopen(url, timeout=2)
+            return
+        except urllib.error.HTTPError:
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise TimeoutError(f"{url} did not come up within {timeout}s")
+
+def start_fake_llm(latency=0.2, tokens_per_second=50.0, port=None, extra_args=()):
+    """Start bench/fake_openai_server.py as a subprocess; returns (process, base_url)"""
+    port = port or free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "fake_openai_server.py"),
+         "--port", str(port), "--latency", str(latency),
+         "--tokens-per-second", str(tokens_per_second)] + list(extra_args),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}/v1"
+    # Any response (even 404 for GET) means the server is listening
+    wait_for_http(f"http://127.0.0.1:{port}/", timeout=15, process=process)
+    return process, base_url
+
+def api_env(openai_base_url, extra=None):
+    """Environment for an API server subprocess pointed at the fake LLM"""
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_BASE_URL": openai_base_url,
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY", "bench"),
+        "PYTHONPATH": os.pathsep.join([API_DIR, BENCH_DIR, env.get("PYTHONPATH", "")])
+    })
+    env.update(extra or {})
+    return env
+
+def start_api(mode, port, env, workdir=None, fake_mysql=False):
+    """Start the API as "flask" (threaded dev server) or "asgi" (uvicorn); returns the process.
+
+    fake_mysql=True points the API at the SQLite stand-in from bench/fake_mysql.py
+    (FAKE_MYSQL_PATH in env selects the file).
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="chatbot-bench-")
+    setup = "import fake_mysql; fake_mysql.install(); " if fake_mysql else ""
+    if mode == "flask":
+        cmd = [sys.executable, "-c",
+               setup + "import rag_backend; "
+               f"rag_backend.app.run(host='127.0.0.1', port={port}, debug=False, threaded=True)"]
+    elif mode == "asgi":
+        cmd = [sys.executable, "-c",
+               setup + "import uvicorn; "
+               f"uvicorn.run('asgi_app:app', host='127.0.0.1', port={port}, log_level='warning')"]
+    else:
+        raise ValueError(f"Unknown server mode: {mode}")
+    process = subprocess.Popen(cmd, cwd=workdir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_http(f"http://127.0.0.1:{port}/cb/api/test", timeout=120, process=process)
+    return process
+
+def rss_mb(pid=None):
+    """Current and peak resident memory of a process in MB (Linux /proc), or None if unavailable"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"rss_mb": round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+                "peak_rss_mb": round(int(fields["VmHWM"].split()[0]) / 1024, 1)}
+    except (OSError, KeyError, ValueError):
+        return None
+
+def stop(process):
+    if process and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
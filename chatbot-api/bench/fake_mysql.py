@@ -0,0 +1,112 @@
+"""
+SQLite stand-in for MySQL so the API can be benchmarked without a database server.
+
+install() replaces pymysql.connect with a connection to a local SQLite file. It has to
+run before rag_backend is imported (its connection pool calls pymysql.connect). The
+few MySQL-only statements the API issues are translated: CREATE TABLE is replaced by
+an equivalent SQLite schema and the user_selections upsert becomes
+INSERT ... ON CONFLICT(session_id) DO UPDATE.
+"""
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_selections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL UNIQUE,
+    user_type TEXT NOT NULL,
+    name TEXT, email TEXT, phone TEXT, role TEXT, work_mode TEXT, skills TEXT,
+    employer_headcount_consultant TEXT, employer_project_size_consultant TEXT,
+    employer_service TEXT, employer_start_time_consultant TEXT, employer_work_mode_consultant TEXT,
+    chat_transcript TEXT, student_option TEXT, student_training TEXT, freelancer_category TEXT,
+    verified INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+_schema_lock = threading.Lock()
+
+def translate(query):
+    """Rewrite a MySQL statement issued by rag_backend into SQLite syntax"""
+    query = query.replace("%s", "?").replace("NOW()", "CURRENT_TIMESTAMP")
+    if "ON DUPLICATE KEY UPDATE" in query:
+        query = re.sub(r"id\s*=\s*LAST_INSERT_ID\(id\),", "", query)
+        query = query.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT(session_id) DO UPDATE SET")
+        query = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", query)
+        # lastrowid is not set on the update path, so return the row id explicitly
+        query = query.rstrip().rstrip(";") + " RETURNING id"
+    return query
+
+class Cursor:
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+        self.lastrowid = None
+        self.rowcount = -1
+
+    def execute(self, query, args=None):
+        if query.lstrip().upper().startswith("CREATE TABLE"):
+            return 0
+        self._cursor.execute(translate(query), tuple(args or ()))
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        if "ON DUPLICATE KEY UPDATE" in query:
+            row = self._cursor.fetchone()
+            self.lastrowid = row["id"] if row else None
+        return self.rowcount
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return dict(row) if row is not None else None
+
+    def fetchall(self):
+        return [dict(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class Connection:
+    """The subset of a pymysql connection (DictCursor, autocommit) that the API uses"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with _schema_lock:
+            self._conn.execute(SCHEMA)
+
+    def cursor(self, *args):
+        return Cursor(self._conn)
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+def install(path=None):
+    """Route pymysql.connect to a SQLite file (FAKE_MYSQL_PATH or a temp file); returns the path"""
+    import pymysql
+
+    path = path or os.getenv("FAKE_MYSQL_PATH") or os.path.join(tempfile.mkdtemp(prefix="fake-mysql-"), "mysql.sqlite3")
+    pymysql.connect = lambda *args, **kwargs: Connection(path)
+    return path
+
+def count_rows(path, table="user_selections"):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
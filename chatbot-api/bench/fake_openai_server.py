@@ -0,0 +1,231 @@
+"""
+Minimal fake OpenAI-compatible server for local development and benchmarking.
+
+Implements POST /v1/chat/completions (plain and streaming) with configurable
+latency and token rate, so the chat endpoints can be exercised without an API key:
+
+    python bench/fake_openai_server.py --port 8089 --latency 0.3 --tokens-per-second 50
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=test python rag_backend.py
+
+Upstream failures can be injected to exercise the LLM gateway's retries and backpressure:
+a share of requests (--fail-rate) or the first N requests (--fail-first) get an error
+status (--fail-status, 429 by default, with --retry-after), and --max-concurrent answers
+429 to requests beyond that many in flight, like a provider's concurrency limit. The
+server counts requests, failures and the peak number of requests in flight.
+--model-latency gives each model its own time to first token, for trying model routing.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "Flexwork connects employers, freelancers and students through on-demand "
+    "consulting, training programs and project based hiring."
+)
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    # Set on the server instance by make_server()
+    @property
+    def config(self):
+        return self.server.config
+
+    def log_message(self, format, *args):
+        if self.config.get("verbose"):
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        with self.server.lock:
+            self.server.request_count += 1
+            failure = self._injected_failure()
+            if failure is None:
+                self.server.active += 1
+                self.server.max_active = max(self.server.max_active, self.server.active)
+        if failure is not None:
+            self._send_failure(failure)
+            return
+        try:
+            self._complete(body)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def _injected_failure(self):
+        """Status of the error to answer this request with, or None (caller holds the lock)"""
+        config = self.config
+        if config.get("max_concurrent") and self.server.active >= config["max_concurrent"]:
+            status = 429
+        elif self.server.request_count <= config.get("fail_first", 0):
+            status = config.get("fail_status", 429)
+        elif config.get("fail_rate") and self.server.random.random() < config["fail_rate"]:
+            status = config.get("fail_status", 429)
+        else:
+            return None
+        self.server.failure_count += 1
+        return status
+
+    def _send_failure(self, status):
+        headers = {}
+        if status == 429 and self.config.get("retry_after") is not None:
+            headers["Retry-After"] = str(self.config["retry_after"])
+        self._send_json(status, {"error": {"message": f"Injected failure ({status})", "type": "fake_error"}}, headers)
+
+    def _complete(self, body):
+
+        model = body.get("model", "fake-model")
+        reply = self.config["reply"]
+        tokens = reply.split(" ")
+        max_tokens = body.get("max_tokens")
+        if max_tokens:
+            tokens = tokens[:max_tokens]
+
+        # Time to first token (per model, to imitate a ladder of faster and slower models)
+        time.sleep(self.config.get("model_latency", {}).get(model, self.config["latency"]))
+        delay = 1.0 / self.config["tokens_per_second"] if self.config["tokens_per_second"] > 0 else 0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for i, token in enumerate(tokens):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": token if i == 0 else " " + token},
+                        "finish_reason": None
+                    }]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                if delay:
+                    time.sleep(delay)
+            final = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }
+            self.wfile.write(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        if delay:
+            time.sleep(delay * len(tokens))
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(tokens)},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens)
+            }
+        })
+
+def make_server(host="127.0.0.1", port=0, latency=0.2, tokens_per_second=50.0,
+                reply=DEFAULT_REPLY, verbose=False, fail_rate=0.0, fail_first=0, fail_status=429,
+                retry_after=None, max_concurrent=0, seed=None, model_latency=None):
+    """Create (but do not start) a fake server; port=0 picks a free port.
+
+    server.config can be changed while the server runs (e.g. to start failing mid-test).
+    """
+    server = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.random = random.Random(seed)
+    server.request_count = 0
+    server.failure_count = 0
+    server.active = 0
+    server.max_active = 0
+    server.config = {
+        "latency": latency,
+        "tokens_per_second": tokens_per_second,
+        "reply": reply,
+        "verbose": verbose,
+        "fail_rate": fail_rate,
+        "fail_first": fail_first,
+        "fail_status": fail_status,
+        "retry_after": retry_after,
+        "max_concurrent": max_concurrent,
+        "model_latency": model_latency or {}
+    }
+    return server
+
+def start_in_thread(**kwargs):
+    """Start a fake server on a background thread and return (server, base_url)"""
+    server = make_server(**kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with an error")
+    parser.add_argument("--fail-first", type=int, default=0, help="Answer the first N requests with an error")
+    parser.add_argument("--fail-status", type=int, default=429, help="Status of injected errors")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds on injected 429s")
+    parser.add_argument("--max-concurrent", type=int, default=0,
+                        help="Answer 429 beyond this many requests in flight (0: no limit)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--model-latency", default="",
+                        help="Per-model time to first token, e.g. gpt-4.1-nano=0.2,gpt-4.1=1.5")
+    args = parser.parse_args()
+    model_latency = {model: float(seconds) for model, seconds in
+                     (pair.split("=", 1) for pair in args.model_latency.split(",") if pair)}
+
+    server = make_server(args.host, args.port, args.latency, args.tokens_per_second,
+                         args.reply, args.verbose, fail_rate=args.fail_rate, fail_first=args.fail_first,
+                         fail_status=args.fail_status, retry_after=args.retry_after,
+                         max_concurrent=args.max_concurrent, seed=args.seed, model_latency=model_latency)
+    print(f"Fake OpenAI server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
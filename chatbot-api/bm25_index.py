@@ -0,0 +1,102 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.+#][a-z0-9]+)*[+#]*")
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens; keeps codes like "c++", "node.js" and "s4hana" intact"""
+    return TOKEN_PATTERN.findall((text or "").lower())
+
+class BM25Index:
+    """In-memory inverted index with Okapi BM25 scoring over chunk texts.
+
+    Postings map each term to {chunk id: term frequency}. Adds and removals are
+    incremental, so the index can follow every write to the vector collection.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, ids: Iterable[str], documents: Iterable[str]) -> None:
+        """Index chunks; an id that is already indexed is replaced"""
+        with self._lock:
+            for chunk_id, document in zip(ids, documents):
+                if chunk_id in self._doc_terms:
+                    self._remove_one(chunk_id)
+                terms = Counter(tokenize(document))
+                self._doc_terms[chunk_id] = tuple(terms)
+                self._lengths[chunk_id] = sum(terms.values())
+                self._total_length += self._lengths[chunk_id]
+                for term, frequency in terms.items():
+                    self._postings.setdefault(term, {})[chunk_id] = frequency
+
+    def _remove_one(self, chunk_id: str) -> None:
+        terms = self._doc_terms.pop(chunk_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(chunk_id)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def has_term(self, term: str) -> bool:
+        return term in self._postings
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for chunk_id in ids:
+                self._remove_one(chunk_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._doc_terms.clear()
+            self._lengths.clear()
+            self._total_length = 0
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, float]]:
+        """Return up to limit (chunk id, score) pairs, best first"""
+        query_terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._doc_terms)
+            if not count or not query_terms:
+                return []
+            average_length = self._total_length / count
+            scores: Dict[str, float] = {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, frequency in postings.items():
+                    norm = frequency + self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / norm
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"chunks": len(self._doc_terms), "terms": len(self._postings)}
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several best-first id lists: score(id) = sum of 1 / (k + rank) over the lists"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
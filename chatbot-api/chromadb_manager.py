@@ -1,46 +1,138 @@
 import chromadb
 from chromadb.config import Settings
-import PyPDF2
-import docx
-import pandas as pd
 import json
 import hashlib
 import re
 import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 import traceback
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Tuple, Iterable, Iterator, Callable, Union, BinaryIO
+
+import numpy as np
+
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from chunking import Segment, StructuredChunker
+from document_catalog import DocumentCatalog
+from embeddings import Embedder, EmbeddingCache, OnnxMiniLMBackend
+from extraction import DocumentExtractor
+from metrics import timed, timed_iter
+from record_readers import iter_csv_records, iter_json_records, iter_jsonl_records
+from startup import Lazy, initializing
+
+# Raw bytes, a path on disk, or an open binary file object
+FileSource = Union[bytes, str, BinaryIO]
+
+DEFAULT_COLLECTION = "documents"
+# ChromaDB collection names: 3-63 characters, alphanumeric at both ends
+COLLECTION_NAME_RE = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9._-]{1,61}[a-zA-Z0-9]$")
 
 class ChromaDBManager:
-    def __init__(self):
-        self.chroma_client = None
+    SUPPORTED_EXTENSIONS = ('pdf', 'docx', 'doc', 'txt', 'csv', 'json', 'jsonl')
+    
+    def __init__(self, persist_path: str = "./chroma_db", embed_batch_size: int = 64, embed_workers: int = 2,
+                 embedder: Embedder = None, hybrid_search: bool = True, catalog: DocumentCatalog = None,
+                 collection_name: str = DEFAULT_COLLECTION, chroma_client=None, embed_executor: ThreadPoolExecutor = None,
+                 chunk_size: int = 1000, chunk_overlap: int = 100, csv_row_group_size: int = 1000,
+                 extractor: DocumentExtractor = None):
+        self.persist_path = persist_path
+        self.collection_name = collection_name
+        self.chroma_client = chroma_client
         self.collection = None
+        # Every write and query passes explicit embeddings from this embedder; the default is the
+        # collection's own model (all-MiniLM-L6-v2) with a cache stored next to the database
+        self.embedder = embedder or Embedder(
+            OnnxMiniLMBackend(),
+            EmbeddingCache(os.path.join(persist_path, "embedding_cache.sqlite3"))
+        )
+        # Ingestion embeds bounded batches of chunks in parallel on this pool
+        self.embed_batch_size = embed_batch_size
+        self.embed_executor = embed_executor or ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix="embed")
+        self.max_pending_batches = embed_workers * 2
+        # Defaults for uploads that do not choose their own chunking
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.chunker()  # Validate the defaults
+        # CSV files are parsed this many rows at a time
+        self.csv_row_group_size = csv_row_group_size
+        # PDF and DOCX parsing (in the calling thread unless given a pooled extractor)
+        self.extractor = extractor or DocumentExtractor(processes=0)
+        # Keyword index over the same chunks as the collection, fused with vector search
+        self.hybrid_search = hybrid_search
+        self.keyword_index = BM25Index()
+        # Document-level catalog for listing documents without scanning chunks
+        catalog_file = ("document_catalog.sqlite3" if collection_name == DEFAULT_COLLECTION
+                        else f"document_catalog_{collection_name}.sqlite3")
+        self.catalog = catalog or DocumentCatalog(os.path.join(persist_path, catalog_file))
         self.init_chromadb()
+        # A missing catalog (e.g. a database created before it existed) is filled from the same scan
+        self.rebuild_keyword_index(backfill_catalog=self.catalog.is_empty())
     
     def init_chromadb(self):
         """Initialize ChromaDB client and collection"""
         try:
-            # Create persistent ChromaDB client
-            self.chroma_client = chromadb.PersistentClient(
-                path="./chroma_db",
-                settings=Settings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
+            # Create persistent ChromaDB client (unless one is shared with other collections)
+            if self.chroma_client is None:
+                self.chroma_client = chromadb.PersistentClient(
+                    path=self.persist_path,
+                    settings=Settings(
+                        anonymized_telemetry=False,
+                        allow_reset=True
+                    )
                 )
-            )
             
             # Get or create collection
             self.collection = self.chroma_client.get_or_create_collection(
-                name="documents",
+                name=self.collection_name,
                 metadata={"description": "Document embeddings for RAG"}
             )
             
-            print("ChromaDB initialized successfully")
+            print(f"ChromaDB initialized successfully (collection '{self.collection_name}')")
             
         except Exception as e:
             print(f"ChromaDB initialization failed: {str(e)}")
             raise e
     
+    def rebuild_keyword_index(self, page_size: int = 1000, backfill_catalog: bool = False) -> int:
+        """Load every stored chunk into the keyword index (and optionally the document catalog)"""
+        self.keyword_index.clear()
+        include = ["documents", "metadatas"] if backfill_catalog else ["documents"]
+        documents = {}
+        offset = 0
+        while True:
+            page = self.collection.get(include=include, limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            self.keyword_index.add(page["ids"], page["documents"])
+            for metadata in page.get("metadatas") or []:
+                if metadata and "filename" in metadata:
+                    entry = documents.setdefault(metadata["filename"], [metadata, 0])
+                    entry[1] += 1
+            offset += len(page["ids"])
+        print(f"Keyword index built with {offset} chunks")
+        if documents:
+            self.catalog.upsert_many((self.document_key(filename), metadata, count)
+                                     for filename, (metadata, count) in documents.items())
+            print(f"Document catalog backfilled with {len(documents)} documents")
+        return offset
+    
+    def delete_chunks(self, ids: List[str]) -> None:
+        """Delete chunks from the collection and the keyword index"""
+        if not ids:
+            return
+        self.collection.delete(ids=ids)
+        self.keyword_index.remove(ids)
+    
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the configured embedder (cached texts are not re-embedded)"""
+        with timed("embed"):
+            return self.embedder(texts)
+    
     def clean_text(self, text: str) -> str:
         """Clean text by removing unwanted characters"""
         # Remove non-breaking spaces, zero-width spaces, and control characters
@@ -50,117 +142,377 @@ class ChromaDBManager:
         text = re.sub(r'\s+', ' ', text)  # Replace multiple whitespace with single space
         return text.strip()
     
-    def extract_text_from_file(self, file_content: bytes, filename: str) -> str:
-        """Extract text from various file formats"""
-        text = ""
+    def _open_source(self, source: FileSource, stack: ExitStack) -> BinaryIO:
+        """Return a readable binary stream for bytes, a file path or a file object"""
+        if isinstance(source, (bytes, bytearray)):
+            return io.BytesIO(source)
+        if isinstance(source, str):
+            return stack.enter_context(open(source, 'rb'))
+        return source
+    
+    def iter_segments(self, source: FileSource, filename: str) -> Iterator[Segment]:
+        """Yield the text of a file incrementally as structural segments.
+        
+        PDFs yield one segment per page (with its page number), docx files one per
+        paragraph, text files one per block of lines ending at a blank line, CSV files one
+        per row and JSON/JSONL files one per record ("key: value; ..."), so the chunker can
+        split on those boundaries. Text, CSV and JSON files are read incrementally.
+        """
         file_extension = filename.split('.')[-1].lower()
         
         try:
-            if file_extension == 'pdf':
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            
-            elif file_extension in ['docx', 'doc']:
-                doc = docx.Document(io.BytesIO(file_content))
-                for paragraph in doc.paragraphs:
-                    text += paragraph.text + "\n"
-            
-            elif file_extension == 'txt':
-                text = file_content.decode("utf-8")
-            
-            elif file_extension == 'csv':
-                df = pd.read_csv(io.BytesIO(file_content))
-                text = df.to_string()
-            
-            elif file_extension == 'json':
-                json_data = json.loads(file_content.decode("utf-8"))
-                text = json.dumps(json_data, indent=2)
-            
-            else:
-                raise ValueError(f"Unsupported file format: {file_extension}")
+            with ExitStack() as stack:
+                if file_extension in ['pdf', 'docx', 'doc']:
+                    yield from self.extractor.segments(source, filename)
+                    return
+                
+                stream = self._open_source(source, stack)
+                
+                if file_extension == 'txt':
+                    text = io.TextIOWrapper(stream, encoding="utf-8")
+                    try:
+                        lines = []
+                        for line in text:
+                            if line.strip():
+                                lines.append(line)
+                            elif lines:
+                                yield Segment("".join(lines), kind="paragraph")
+                                lines = []
+                        if lines:
+                            yield Segment("".join(lines), kind="paragraph")
+                    finally:
+                        # Leave the underlying stream to its owner
+                        text.detach()
+                
+                elif file_extension == 'csv':
+                    for record in iter_csv_records(stream, self.csv_row_group_size):
+                        yield Segment(record, kind="row")
+                
+                elif file_extension == 'json':
+                    for record in iter_json_records(stream):
+                        yield Segment(record, kind="row")
+                
+                elif file_extension == 'jsonl':
+                    for record in iter_jsonl_records(stream):
+                        yield Segment(record, kind="row")
+                
+                else:
+                    raise ValueError(f"Unsupported file format: {file_extension}")
         
         except Exception as e:
             print(f"Error extracting text from {filename}: {str(e)}")
             traceback.print_exc()
             # Use standard exception instead of FastAPI specific
             raise Exception(f"Error extracting text from {filename}: {str(e)}")
+    
+    def iter_text_from_file(self, source: FileSource, filename: str) -> Iterator[str]:
+        """Yield the text of a file incrementally (one PDF page or docx paragraph at a time)"""
+        for segment in self.iter_segments(source, filename):
+            yield segment.text
+    
+    def extract_text_from_file(self, file_content: FileSource, filename: str) -> str:
+        """Extract text from various file formats"""
+        return "\n".join(self.iter_text_from_file(file_content, filename)).strip()
+    
+    def chunker(self, chunk_size: int = None, chunk_overlap: int = None) -> StructuredChunker:
+        """Chunker for one upload; raises ValueError for an invalid size or overlap"""
+        return StructuredChunker(chunk_size or self.chunk_size,
+                                 self.chunk_overlap if chunk_overlap is None else chunk_overlap,
+                                 clean=self.clean_text)
+    
+    @staticmethod
+    def page_metadata(chunk) -> Dict[str, int]:
+        """page_start/page_end for chunks of paged formats (empty otherwise)"""
+        if chunk.page_start is None:
+            return {}
+        return {"page_start": chunk.page_start, "page_end": chunk.page_end}
+    
+    def hash_segments(self, segments: Iterable[Union[str, Segment]], content_hash,
+                      state: Dict[str, int]) -> Iterator[Union[str, Segment]]:
+        """Pass segments through, hashing the cleaned text as if the segments were joined with spaces.
         
-        return text.strip()
+        Counts segments and text length in state["segments"] and state["text_length"], so
+        the document hash is known without keeping the extracted text around.
+        """
+        for segment in segments:
+            state["segments"] += 1
+            text = self.clean_text(segment if isinstance(segment, str) else segment.text)
+            if text:
+                if state["text_length"]:
+                    content_hash.update(b" ")
+                content_hash.update(text.encode())
+                state["text_length"] += len(text) + (1 if state["text_length"] else 0)
+            yield segment
     
-    def add_document_to_db(self, text: str, filename: str, metadata: Dict[str, Any] = None) -> Tuple[bool, int]:
-        """Add text document to ChromaDB with chunking"""
+    def document_key(self, filename: str) -> str:
+        """Stable id prefix for a document, derived from its filename"""
+        return hashlib.md5(filename.encode()).hexdigest()
+    
+    def chunk_id(self, doc_key: str, chunk: str, occurrences: Dict[str, int]) -> str:
+        """Content-derived chunk id; repeated identical chunks in one document get a counter suffix"""
+        digest = hashlib.sha256(chunk.encode()).hexdigest()[:24]
+        occurrence = occurrences.get(digest, 0)
+        occurrences[digest] = occurrence + 1
+        return f"{doc_key}_{digest}" if occurrence == 0 else f"{doc_key}_{digest}_{occurrence}"
+    
+    def get_document_chunks(self, filename: str) -> Dict[str, Dict[str, Any]]:
+        """Map of chunk id to metadata for every chunk currently stored for a filename"""
+        existing = self.collection.get(where={"filename": filename}, include=["metadatas"])
+        return dict(zip(existing["ids"], existing["metadatas"]))
+    
+    def finish_document(self, ids: List[str], doc_metadata: Dict[str, Any], existing: Dict[str, Dict[str, Any]],
+                        added_ids: Iterable[str], final_ids: Iterable[str] = (),
+                        chunk_metadata: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Reconcile a re-indexed document with what was stored before.
+        
+        ids are the document's chunk ids in order and added_ids the ones that were newly
+        embedded; chunk_metadata optionally holds per-chunk fields (such as pages) in the
+        same order. Chunks that no longer occur are deleted and the metadata of the others
+        is refreshed (without re-embedding) unless it is already final (final_ids). When
+        nothing was added or removed and the metadata matches, the document is left untouched.
+        """
+        added = set(added_ids)
+        final = set(final_ids)
+        id_set = set(ids)
+        stale = [chunk_id for chunk_id in existing if chunk_id not in id_set]
+        metadatas = []
+        for index in range(len(ids)):
+            metadata = doc_metadata.copy()
+            if chunk_metadata:
+                metadata.update(chunk_metadata[index])
+            metadata["chunk_index"] = index
+            metadatas.append(metadata)
+        
+        changed = bool(added or stale) or any(
+            any(existing[chunk_id].get(key) != value for key, value in chunk_metadata.items() if key != "upload_date")
+            for chunk_id, chunk_metadata in zip(ids, metadatas) if chunk_id in existing
+        )
+        
+        if changed:
+            updates = [(chunk_id, chunk_metadata) for chunk_id, chunk_metadata in zip(ids, metadatas)
+                       if chunk_id not in final]
+            # Metadata-only updates do not re-embed
+            for i in range(0, len(updates), self.embed_batch_size):
+                batch = updates[i:i + self.embed_batch_size]
+                self.collection.update(ids=[item[0] for item in batch], metadatas=[item[1] for item in batch])
+            for i in range(0, len(stale), self.embed_batch_size):
+                self.delete_chunks(stale[i:i + self.embed_batch_size])
+        
+        if not existing:
+            document_status = "created"
+        else:
+            document_status = "updated" if changed else "unchanged"
+        
+        filename = doc_metadata["filename"]
+        if changed or not existing:
+            self.catalog.upsert(self.document_key(filename), doc_metadata, len(ids))
+        elif self.catalog.get(filename) is None:
+            # Unchanged chunks keep their original metadata (and upload date)
+            self.catalog.upsert(self.document_key(filename), existing[ids[0]], len(ids))
+        return {
+            "chunk_count": len(ids),
+            "added_chunks": len(added),
+            "unchanged_chunks": len(ids) - len(added),
+            "deleted_chunks": len(stale),
+            "document_status": document_status
+        }
+    
+    def add_segments_to_db(self, segments: Iterable[Union[str, Segment]], filename: str, metadata: Dict[str, Any] = None,
+                           progress: Callable[[Dict[str, Any]], None] = None, chunk_size: int = None,
+                           chunk_overlap: int = None) -> Dict[str, Any]:
+        """Chunk, embed and store text segments as a streaming pipeline.
+        
+        Chunk ids are derived from chunk content, so only chunks that are not already stored
+        for this filename are embedded; they are embedded in batches of embed_batch_size on
+        the embedding pool and written as soon as each batch is ready. Chunks that no longer
+        occur in the document are removed at the end. Returns the counts from finish_document
+        (chunk_count is 0 if no text was found). Raises on failure after removing any partial writes.
+        """
+        chunker = self.chunker(chunk_size, chunk_overlap)
+        doc_key = self.document_key(filename)
+        existing = self.get_document_chunks(filename)
+        
+        # Prepare metadata
+        doc_metadata = {
+            "filename": filename,
+            "upload_date": datetime.now().isoformat()
+        }
+        if metadata:
+            doc_metadata.update(metadata)
+        
+        state = {"segments": 0, "text_length": 0}
+        content_hash = hashlib.sha256()
+        ids = []
+        pages = []
+        occurrences = {}
+        written_ids = []
+        
+        def report():
+            if progress:
+                progress({"segments_processed": state["segments"], "chunks_processed": len(ids)})
+        
+        def write(batch):
+            batch_ids, documents, metadatas, future = batch
+            self.collection.add(
+                ids=batch_ids,
+                documents=documents,
+                metadatas=metadatas,
+                embeddings=future.result()
+            )
+            self.keyword_index.add(batch_ids, documents)
+            written_ids.extend(batch_ids)
+            report()
+        
+        pending = deque()
+        batch = ([], [], [])
         try:
-            # Clean the text
-            text = self.clean_text(text)
-            
-            if not text:
-                return False, 0
-            
-            # Create unique ID for the document
-            doc_id = hashlib.md5(f"{filename}_{datetime.now().isoformat()}".encode()).hexdigest()
-            
-            # Prepare metadata
-            doc_metadata = {
-                "filename": filename,
-                "upload_date": datetime.now().isoformat(),
-                "text_length": len(text)
-            }
-            if metadata:
-                doc_metadata.update(metadata)
-            
-            # Split text into chunks (adjust chunk_size as needed)
-            chunk_size = 1000  # Increased chunk size for better context
-            overlap = 100      # Add overlap between chunks
-            chunks = []
-            
-            for i in range(0, len(text), chunk_size - overlap):
-                chunk = text[i:i + chunk_size]
-                if chunk.strip():  # Only add non-empty chunks
-                    chunks.append(chunk.strip())
-            
-            # Add chunks to ChromaDB
-            documents = []
-            metadatas = []
-            ids = []
-            
-            for i, chunk in enumerate(chunks):
-                chunk_id = f"{doc_id}_chunk_{i}"
+            for chunk in chunker.chunks(self.hash_segments(segments, content_hash, state)):
+                chunk_id = self.chunk_id(doc_key, chunk.text, occurrences)
+                ids.append(chunk_id)
+                pages.append(self.page_metadata(chunk))
+                if chunk_id in existing:
+                    continue  # Already embedded by an earlier upload of this document
                 chunk_metadata = doc_metadata.copy()
-                chunk_metadata["chunk_index"] = i
-                chunk_metadata["total_chunks"] = len(chunks)
+                chunk_metadata.update(pages[-1])
+                chunk_metadata["chunk_index"] = len(ids) - 1
+                batch[0].append(chunk_id)
+                batch[1].append(chunk.text)
+                batch[2].append(chunk_metadata)
                 
-                documents.append(chunk)
-                metadatas.append(chunk_metadata)
-                ids.append(chunk_id)
+                if len(batch[0]) >= self.embed_batch_size:
+                    pending.append(batch + (self.embed_executor.submit(self.embed_texts, batch[1]),))
+                    batch = ([], [], [])
+                    # Bound the number of embedded-but-unwritten batches held in memory
+                    if len(pending) >= self.max_pending_batches:
+                        write(pending.popleft())
             
-            # Batch add to collection
-            if documents:
-                self.collection.add(
-                    documents=documents,
-                    metadatas=metadatas,
-                    ids=ids
-                )
+            if batch[0]:
+                pending.append(batch + (self.embed_executor.submit(self.embed_texts, batch[1]),))
+            while pending:
+                write(pending.popleft())
+            report()
+            
+            if not ids:
+                return {"chunk_count": 0, "added_chunks": 0, "unchanged_chunks": 0, "deleted_chunks": 0,
+                        "document_status": "empty"}
             
-            return True, len(chunks)
+            # Totals are only known once the stream is exhausted
+            doc_metadata.update({
+                "total_chunks": len(ids),
+                "text_length": state["text_length"],
+                "content_hash": content_hash.hexdigest()
+            })
+            return self.finish_document(ids, doc_metadata, existing, written_ids, chunk_metadata=pages)
         
+        except Exception:
+            for batch_left in pending:
+                batch_left[3].cancel()
+            # Remove partially written chunks so a failed upload leaves the previous version intact
+            if written_ids:
+                try:
+                    self.delete_chunks(written_ids)
+                except Exception as cleanup_error:
+                    print(f"Error removing partial upload of {filename}: {str(cleanup_error)}")
+            raise
+    
+    def chunk_document(self, source: FileSource, filename: str, metadata: Dict[str, Any] = None,
+                       chunk_size: int = None, chunk_overlap: int = None) -> Dict[str, Any]:
+        """Extract and chunk a whole document into ids/documents/metadatas ready to be written"""
+        chunker = self.chunker(chunk_size, chunk_overlap)
+        doc_key = self.document_key(filename)
+        content_hash = hashlib.sha256()
+        state = {"segments": 0, "text_length": 0}
+        segments = timed_iter("text_extraction", self.iter_segments(source, filename))
+        chunks = list(chunker.chunks(self.hash_segments(segments, content_hash, state)))
+        
+        doc_metadata = {
+            "filename": filename,
+            "upload_date": datetime.now().isoformat(),
+            "text_length": state["text_length"],
+            "total_chunks": len(chunks),
+            "content_hash": content_hash.hexdigest()
+        }
+        if metadata:
+            doc_metadata.update(metadata)
+        
+        metadatas = []
+        for i, chunk in enumerate(chunks):
+            chunk_metadata = doc_metadata.copy()
+            chunk_metadata.update(self.page_metadata(chunk))
+            chunk_metadata["chunk_index"] = i
+            metadatas.append(chunk_metadata)
+        
+        occurrences = {}
+        return {
+            "ids": [self.chunk_id(doc_key, chunk.text, occurrences) for chunk in chunks],
+            "documents": [chunk.text for chunk in chunks],
+            "metadatas": metadatas,
+            "document_metadata": doc_metadata,
+            "chunk_metadata": [self.page_metadata(chunk) for chunk in chunks]
+        }
+    
+    def write_chunks(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]) -> int:
+        """Embed chunks in parallel batches and store them with a single collection write"""
+        if not ids:
+            return 0
+        futures = [
+            self.embed_executor.submit(self.embed_texts, documents[i:i + self.embed_batch_size])
+            for i in range(0, len(documents), self.embed_batch_size)
+        ]
+        embeddings = []
+        for future in futures:
+            embeddings.extend(future.result())
+        self.collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+        self.keyword_index.add(ids, documents)
+        return len(ids)
+    
+    def ingest_document(self, source: FileSource, filename: str, metadata: Dict[str, Any] = None,
+                        progress: Callable[[Dict[str, Any]], None] = None, chunk_size: int = None,
+                        chunk_overlap: int = None) -> Dict[str, Any]:
+        """Extract, chunk, embed and store a file incrementally"""
+        segments = timed_iter("text_extraction", self.iter_segments(source, filename))
+        return self.add_segments_to_db(segments, filename, metadata, progress, chunk_size, chunk_overlap)
+    
+    def add_document_to_db(self, text: str, filename: str, metadata: Dict[str, Any] = None,
+                           chunk_size: int = None, chunk_overlap: int = None) -> Tuple[bool, int]:
+        """Add text document to ChromaDB with chunking"""
+        try:
+            result = self.add_segments_to_db([text], filename, metadata, chunk_size=chunk_size,
+                                             chunk_overlap=chunk_overlap)
+            return result["chunk_count"] > 0, result["chunk_count"]
         except Exception as e:
             print(f"Error adding document to ChromaDB: {str(e)}")
             traceback.print_exc()
             return False, 0
     
-    def search_documents(self, query: str, n_results: int = 5, metadata_filter: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Search for similar documents in ChromaDB"""
+    def search_documents(self, query: str, n_results: int = 5, metadata_filter: Dict[str, Any] = None,
+                         query_embedding: List[float] = None, hybrid: bool = None) -> Dict[str, Any]:
+        """Search for similar documents in ChromaDB.
+        
+        With hybrid search (the default when enabled on the manager) the vector ranking and
+        a BM25 keyword ranking are fused with reciprocal rank fusion, so exact terms such as
+        course codes or skill names surface even when their embedding is not the closest.
+        """
         try:
+            n_results = min(n_results, 10)
+            # Reuse a precomputed query embedding when the caller already has one
+            if query_embedding is None:
+                query_embedding = self.embed_texts([query])[0]
+            
+            use_hybrid = self.hybrid_search if hybrid is None else hybrid
+            if use_hybrid and len(self.keyword_index):
+                with timed("vector_query"):
+                    return self._hybrid_search(query, n_results, metadata_filter, query_embedding)
+            
             query_params = {
-                "query_texts": [query],
-                "n_results": min(n_results, 10)
+                "n_results": n_results,
+                "query_embeddings": [query_embedding]
             }
-            
             if metadata_filter:
                 query_params["where"] = metadata_filter
             
-            results = self.collection.query(**query_params)
+            with timed("vector_query"):
+                results = self.collection.query(**query_params)
             
             return {
                 "documents": results.get('documents', [[]])[0],
@@ -179,6 +531,116 @@ class ChromaDBManager:
                 "ids": []
             }
     
+    @staticmethod
+    def hybrid_depth(n_results: int) -> int:
+        """Candidates taken from each ranking before fusion"""
+        return max(n_results * 4, 20)
+    
+    def _hybrid_search(self, query: str, n_results: int, metadata_filter: Dict[str, Any],
+                       query_embedding: List[float], dense: Dict[str, List] = None) -> Dict[str, Any]:
+        """Fuse the top vector and BM25 candidates; distances are vector distances for every hit.
+        
+        keyword_ranks gives each hit's position in the BM25 ranking (None when it was only
+        found by the vector query), so callers can tell exact-term matches apart. dense is an already-run vector query for this query (ids/documents/metadatas/distances
+        lists, at least hybrid_depth deep); it is queried here when not given.
+        """
+        depth = self.hybrid_depth(n_results)
+        if dense is None:
+            query_params = {
+                "n_results": depth,
+                "query_embeddings": [query_embedding]
+            }
+            if metadata_filter:
+                query_params["where"] = metadata_filter
+            results = self.collection.query(**query_params)
+            dense = {key: results[key][0] for key in ("ids", "documents", "metadatas", "distances")}
+        
+        hits = {}
+        for chunk_id, document, metadata, distance in zip(dense["ids"][:depth], dense["documents"],
+                                                          dense["metadatas"], dense["distances"]):
+            hits[chunk_id] = (document, metadata, distance)
+        
+        keyword_ids = [chunk_id for chunk_id, _ in self.keyword_index.search(query, depth)]
+        if keyword_ids and metadata_filter:
+            allowed = set(self.collection.get(ids=keyword_ids, where=metadata_filter, include=[])["ids"])
+            keyword_ids = [chunk_id for chunk_id in keyword_ids if chunk_id in allowed]
+        
+        fused = reciprocal_rank_fusion([dense["ids"][:depth], keyword_ids])[:n_results]
+        keyword_ranks = {chunk_id: rank for rank, chunk_id in enumerate(keyword_ids)}
+        
+        # Keyword-only hits are fetched with their embeddings to report a comparable (squared L2) distance
+        missing = [chunk_id for chunk_id, _ in fused if chunk_id not in hits]
+        if missing:
+            extra = self.collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+            query_vector = np.asarray(query_embedding, dtype=np.float32)
+            for chunk_id, document, metadata, embedding in zip(extra["ids"], extra["documents"],
+                                                               extra["metadatas"], extra["embeddings"]):
+                distance = float(np.sum((np.asarray(embedding, dtype=np.float32) - query_vector) ** 2))
+                hits[chunk_id] = (document, metadata, distance)
+        
+        fused = [(chunk_id, score) for chunk_id, score in fused if chunk_id in hits]
+        return {
+            "documents": [hits[chunk_id][0] for chunk_id, _ in fused],
+            "metadatas": [hits[chunk_id][1] for chunk_id, _ in fused],
+            "distances": [hits[chunk_id][2] for chunk_id, _ in fused],
+            "ids": [chunk_id for chunk_id, _ in fused],
+            "fusion_scores": [round(score, 6) for _, score in fused],
+            "keyword_ranks": [keyword_ranks.get(chunk_id) for chunk_id, _ in fused]
+        }
+    
+    def search_documents_batch(self, queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Search many queries at once; returns one search_documents-style result per query, in order.
+        
+        queries are {"query", "n_results", "metadata_filter", "hybrid"} dicts. All query texts
+        are embedded in one batch, and queries sharing a metadata filter are answered by a
+        single collection.query over all their embeddings (deep enough for the largest
+        n_results, and for fusion when hybrid). Hybrid queries are then fused one by one
+        with their BM25 ranking.
+        """
+        results: List[Dict[str, Any]] = [None] * len(queries)
+        if not queries:
+            return results
+        embeddings = self.embed_texts([item["query"] for item in queries])
+        
+        groups: Dict[str, List[int]] = {}
+        for position, item in enumerate(queries):
+            key = json.dumps(item.get("metadata_filter") or {}, sort_keys=True)
+            groups.setdefault(key, []).append(position)
+        
+        for positions in groups.values():
+            metadata_filter = queries[positions[0]].get("metadata_filter")
+            plans = []
+            for position in positions:
+                n_results = min(queries[position].get("n_results", 5), 10)
+                hybrid = queries[position].get("hybrid")
+                use_hybrid = (self.hybrid_search if hybrid is None else hybrid) and len(self.keyword_index) > 0
+                plans.append((position, n_results, use_hybrid))
+            depth = max(self.hybrid_depth(n) if use_hybrid else n for _, n, use_hybrid in plans)
+            try:
+                query_params = {
+                    "n_results": depth,
+                    "query_embeddings": [embeddings[position] for position in positions]
+                }
+                if metadata_filter:
+                    query_params["where"] = metadata_filter
+                with timed("vector_query"):
+                    dense = self.collection.query(**query_params)
+                    for row, (position, n_results, use_hybrid) in enumerate(plans):
+                        ranked = {key: dense[key][row] for key in ("ids", "documents", "metadatas", "distances")}
+                        if use_hybrid:
+                            results[position] = self._hybrid_search(queries[position]["query"], n_results, metadata_filter,
+                                                                    embeddings[position], dense=ranked)
+                        else:
+                            results[position] = {key: values[:n_results] for key, values in ranked.items()}
+            except Exception as e:
+                print(f"Error searching ChromaDB: {str(e)}")
+                traceback.print_exc()
+                for position in positions:
+                    if results[position] is None:
+                        results[position] = {"error": f"Search failed: {str(e)}", "documents": [], "metadatas": [],
+                                             "distances": [], "ids": []}
+        return results
+    
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the collection"""
         try:
@@ -201,7 +663,8 @@ class ChromaDBManager:
             )
             
             if results['ids']:
-                self.collection.delete(ids=results['ids'])
+                self.delete_chunks(results['ids'])
+                self.catalog.remove(document_id)
                 return True
             return False
         
@@ -212,12 +675,116 @@ class ChromaDBManager:
     def reset_collection(self) -> bool:
         """Reset/clear the entire collection"""
         try:
-            self.chroma_client.delete_collection("documents")
+            self.chroma_client.delete_collection(self.collection_name)
             self.collection = self.chroma_client.get_or_create_collection(
-                name="documents",
+                name=self.collection_name,
                 metadata={"description": "Document embeddings for RAG"}
             )
+            self.keyword_index.clear()
+            self.catalog.clear()
             return True
         except Exception as e:
             print(f"Error resetting collection: {str(e)}")
             return False
+
+class ChromaCollections:
+    """Named collections in one ChromaDB store, one ChromaDBManager each.
+    
+    Separate collections (e.g. employer, student and freelancer knowledge bases) keep each
+    audience's index small, so queries scan fewer vectors and return more focused context.
+    All managers share the ChromaDB client, the embedder and the embedding pool. The
+    client and every manager, the default one included, are created on first use, since
+    opening the store and loading a collection's keyword index scale with its size. A
+    manager is built under its own lock, so loading one collection does not hold up
+    requests for the others, and names found missing are remembered for missing_ttl
+    seconds (or until created here) rather than listing the collections on every request.
+    """
+    
+    def __init__(self, persist_path: str = "./chroma_db", default_collection: str = DEFAULT_COLLECTION,
+                 embed_workers: int = 2, embedder: Embedder = None, missing_ttl: float = 30, **manager_options):
+        self.persist_path = persist_path
+        self.default_name = default_collection
+        self.missing_ttl = missing_ttl
+        self.manager_options = manager_options
+        self.embed_workers = embed_workers
+        self.embed_executor = ThreadPoolExecutor(max_workers=embed_workers, thread_name_prefix="embed")
+        self.embedder = embedder or Embedder(
+            OnnxMiniLMBackend(),
+            EmbeddingCache(os.path.join(persist_path, "embedding_cache.sqlite3"))
+        )
+        self._client = Lazy("chromadb", lambda: chromadb.PersistentClient(
+            path=self.persist_path,
+            settings=Settings(anonymized_telemetry=False, allow_reset=True)
+        ))
+        self._managers: Dict[str, ChromaDBManager] = {}
+        self._building: Dict[str, threading.Lock] = {}
+        # Collection name -> when it was found missing
+        self._missing: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def chroma_client(self):
+        return self._client.get()
+    
+    @property
+    def default(self) -> "ChromaDBManager":
+        manager = self._managers.get(self.default_name)
+        return manager if manager is not None else self.get(self.default_name, create=True)
+    
+    def loaded(self) -> List[str]:
+        """Names of the collections whose managers have been created"""
+        return sorted(self._managers)
+    
+    @staticmethod
+    def is_valid_name(name: str) -> bool:
+        return bool(name) and bool(COLLECTION_NAME_RE.match(name))
+    
+    def names(self) -> List[str]:
+        """Names of all collections in the store"""
+        return sorted(collection.name if hasattr(collection, "name") else str(collection)
+                      for collection in self.chroma_client.list_collections())
+    
+    def get(self, name: str = None, create: bool = False) -> "ChromaDBManager":
+        """Manager for a collection (the default one when name is empty).
+        
+        Raises KeyError for a collection that does not exist unless create is set (the
+        default collection is always created), and ValueError for an invalid name.
+        """
+        name = name or self.default_name
+        create = create or name == self.default_name
+        manager = self._managers.get(name)
+        if manager is not None:
+            return manager
+        if not self.is_valid_name(name):
+            raise ValueError(f"Invalid collection name '{name}'")
+        if not create and self._known_missing(name):
+            raise KeyError(name)
+        with self._lock:
+            building = self._building.setdefault(name, threading.Lock())
+        with building:
+            manager = self._managers.get(name)
+            if manager is not None:
+                return manager
+            if not create and name not in self.names():
+                with self._lock:
+                    self._missing[name] = time.monotonic()
+                raise KeyError(name)
+            with initializing(f"collection:{name}"):
+                manager = ChromaDBManager(persist_path=self.persist_path, embedder=self.embedder,
+                                          collection_name=name, chroma_client=self.chroma_client,
+                                          embed_executor=self.embed_executor,
+                                          embed_workers=self.embed_workers, **self.manager_options)
+            with self._lock:
+                self._managers[name] = manager
+                self._missing.pop(name, None)
+            return manager
+    
+    def _known_missing(self, name: str) -> bool:
+        with self._lock:
+            found_missing = self._missing.get(name)
+            if found_missing is None:
+                return False
+            if time.monotonic() - found_missing < self.missing_ttl:
+                return True
+            del self._missing[name]
+            return False
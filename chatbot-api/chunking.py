@@ -0,0 +1,127 @@
+"""
+Structure-aware chunking of extracted document text.
+
+Extraction yields Segments (a PDF page, a docx paragraph, a block of a text file or a
+CSV row). StructuredChunker breaks them into units at paragraph and sentence
+boundaries (a CSV row is a single unit) and packs whole units into chunks of up to
+chunk_size characters, so a chunk never starts or ends in the middle of a sentence
+unless that sentence alone is longer than a chunk. Each chunk starts with the trailing
+units of the previous one, up to overlap characters, and records the pages it spans.
+"""
+import re
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+# A sentence ends at . ! or ? followed by whitespace and something that starts a new one
+SENTENCE_BREAK_RE = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+
+MIN_CHUNK_SIZE = 100
+MAX_CHUNK_SIZE = 8000
+
+class Segment(NamedTuple):
+    text: str
+    page: Optional[int] = None  # 1-based page number, when the format has pages
+    kind: str = "text"          # "text", "page", "paragraph" or "row"
+
+class Chunk(NamedTuple):
+    text: str
+    page_start: Optional[int]
+    page_end: Optional[int]
+
+class _Unit(NamedTuple):
+    text: str
+    page: Optional[int]
+    separator: str  # Joins the unit to the one before it in a chunk
+
+def collapse_whitespace(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+class StructuredChunker:
+    """Packs paragraphs, sentences and rows into chunks of at most chunk_size characters"""
+
+    def __init__(self, chunk_size: int = 1000, overlap: int = 100, clean: Callable[[str], str] = None):
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE}")
+        if not 0 <= overlap <= chunk_size // 2:
+            raise ValueError("chunk_overlap must be between 0 and half of chunk_size")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.clean = clean or collapse_whitespace
+
+    def split_long(self, text: str) -> List[str]:
+        """Split text longer than chunk_size at word boundaries (or anywhere, for a single long word)"""
+        pieces = []
+        while len(text) > self.chunk_size:
+            cut = text.rfind(" ", 0, self.chunk_size + 1)
+            if cut <= 0:
+                cut = self.chunk_size
+            pieces.append(text[:cut].strip())
+            text = text[cut:].strip()
+        if text:
+            pieces.append(text)
+        return pieces
+
+    def units(self, segment: Segment) -> Iterator[_Unit]:
+        if segment.kind == "row":
+            paragraphs = [segment.text]
+        else:
+            paragraphs = PARAGRAPH_BREAK_RE.split(segment.text)
+        for paragraph in paragraphs:
+            # Lines within a paragraph are joined with spaces before cleaning
+            paragraph = self.clean(" ".join(paragraph.splitlines()))
+            if not paragraph:
+                continue
+            separator = "\n"
+            sentences = [paragraph] if segment.kind == "row" else SENTENCE_BREAK_RE.split(paragraph)
+            for sentence in sentences:
+                for piece in self.split_long(sentence):
+                    yield _Unit(piece, segment.page, separator)
+                    separator = " "
+
+    def _tail(self, units: List[_Unit]) -> List[_Unit]:
+        """Trailing units of a finished chunk that fit in the overlap"""
+        if not self.overlap:
+            return []
+        tail = []
+        length = 0
+        for unit in reversed(units):
+            length += len(unit.text) + (1 if tail else 0)
+            if length > self.overlap:
+                break
+            tail.insert(0, unit)
+        if not tail:
+            # The last unit alone is longer than the overlap: carry its final words instead
+            last = units[-1]
+            text = last.text[-self.overlap:]
+            if " " in text:
+                text = text.split(" ", 1)[1]
+            tail = [_Unit(text, last.page, " ")] if text else []
+        return tail
+
+    @staticmethod
+    def _chunk(units: List[_Unit]) -> Chunk:
+        text = units[0].text + "".join(unit.separator + unit.text for unit in units[1:])
+        pages = [unit.page for unit in units if unit.page is not None]
+        return Chunk(text, min(pages) if pages else None, max(pages) if pages else None)
+
+    def chunks(self, segments: Iterable[Union[str, Segment]]) -> Iterator[Chunk]:
+        """Chunk segments as they arrive; plain strings are treated as untyped text"""
+        current: List[_Unit] = []
+        length = 0
+        fresh = False  # Whether current holds anything beyond the previous chunk's overlap
+        for segment in segments:
+            if isinstance(segment, str):
+                segment = Segment(segment)
+            for unit in self.units(segment):
+                if current and length + len(unit.separator) + len(unit.text) > self.chunk_size:
+                    yield self._chunk(current)
+                    fresh = False
+                    current = self._tail(current)
+                    length = len(self._chunk(current).text) if current else 0
+                    if current and length + len(unit.separator) + len(unit.text) > self.chunk_size:
+                        current, length = [], 0
+                length += len(unit.text) + (len(unit.separator) if current else 0)
+                current.append(unit)
+                fresh = True
+        if current and fresh:
+            yield self._chunk(current)
@@ -0,0 +1,265 @@
+import logging
+import math
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Token counts fall back to a character-based estimate
+    tiktoken = None
+
+logger = logging.getLogger("flexwork-chatbot-api")
+
+CONTEXT_HEADER = "\n\nRelevant information from knowledge base:\n"
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant. Please use the following information to inform your responses when relevant: "
+SUMMARY_HEADER = "\n\nSummary of earlier conversation:\n"
+
+# Chat format overhead per message and for priming the reply (OpenAI's published counting recipe)
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+class TokenCounter:
+    """Counts tokens locally with tiktoken when installed, otherwise estimates ~4 characters per token.
+
+    tiktoken downloads its BPE files on first use; if that fails (offline, egress
+    firewall) the counter switches to the estimate rather than failing the request.
+    """
+
+    def __init__(self):
+        self._encodings: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.exact = tiktoken is not None
+
+    def _encoding(self, model: str):
+        """The model's tiktoken encoding, or None once tiktoken turned out to be unusable"""
+        with self._lock:
+            if not self.exact:
+                return None
+            if model not in self._encodings:
+                try:
+                    try:
+                        encoding = tiktoken.encoding_for_model(model)
+                    except (KeyError, ValueError):
+                        encoding = tiktoken.get_encoding("o200k_base")
+                except Exception as e:
+                    logger.warning(f"tiktoken encoding unavailable ({e}); estimating tokens from characters")
+                    self.exact = False
+                    return None
+                self._encodings[model] = encoding
+            return self._encodings[model]
+
+    def count(self, text: str, model: str) -> int:
+        if not text:
+            return 0
+        encoding = self._encoding(model)
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text) / 4)
+
+    def truncate(self, text: str, max_tokens: int, model: str) -> str:
+        """Cut text to at most max_tokens tokens"""
+        if max_tokens <= 0:
+            return ""
+        encoding = self._encoding(model)
+        if encoding is not None:
+            tokens = encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+        return text[:max_tokens * 4]
+
+    def count_message(self, message: Dict[str, Any], model: str) -> int:
+        return TOKENS_PER_MESSAGE + self.count(str(message.get("content") or ""), model)
+
+def merge_overlapping(first: str, second: str, max_overlap: int = 300) -> Optional[str]:
+    """Join two neighbouring chunks if the end of first repeats at the start of second"""
+    for size in range(min(max_overlap, len(first), len(second)), 20, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+def merge_neighbours(chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Drop repeated chunks and merge overlapping neighbours of the same file.
+
+    chunks are best first; a merged block keeps the rank of its best part and lists the
+    ids of all its parts. Returns the blocks (best first) and the number of chunks that
+    were folded into another.
+    """
+    seen_texts = set()
+    unique = []
+    for rank, chunk in enumerate(chunks):
+        text = chunk["text"].strip()
+        if not text or text in seen_texts:
+            continue
+        seen_texts.add(text)
+        metadata = chunk.get("metadata") or {}
+        unique.append({"ids": [chunk["id"]], "text": text, "rank": rank,
+                       "filename": metadata.get("filename"), "index": metadata.get("chunk_index")})
+
+    # Walk each file's chunks in document order and fold consecutive ones together
+    ordered = sorted(unique, key=lambda c: (str(c["filename"]), c["index"] if c["index"] is not None else -1))
+    merged = []
+    folded = 0
+    for chunk in ordered:
+        previous = merged[-1] if merged else None
+        if (previous is not None and chunk["index"] is not None and previous["index"] is not None
+                and previous["filename"] == chunk["filename"] and previous["index"] == chunk["index"] - 1):
+            joined = merge_overlapping(previous["text"], chunk["text"])
+            if joined is not None:
+                previous.update(text=joined, index=chunk["index"], rank=min(previous["rank"], chunk["rank"]))
+                previous["ids"].extend(chunk["ids"])
+                folded += 1
+                continue
+        merged.append(dict(chunk))
+    merged.sort(key=lambda c: c["rank"])
+    return merged, folded
+
+def format_context(blocks: List[Dict[str, Any]]) -> str:
+    if not blocks:
+        return ""
+    return CONTEXT_HEADER + "".join(f"Document {i + 1}: {block['text']}\n\n" for i, block in enumerate(blocks))
+
+def summarize_turns(turns: List[Dict[str, Any]], chars_per_turn: int = 160) -> List[str]:
+    """Extractive summary lines for old turns: the first sentence (or first chars) of each"""
+    lines = []
+    for message in turns:
+        content = re.sub(r"\s+", " ", str(message.get("content") or "")).strip()
+        if not content:
+            continue
+        sentence = re.split(r"(?<=[.!?])\s", content, maxsplit=1)[0]
+        if len(sentence) > chars_per_turn:
+            sentence = sentence[:chars_per_turn].rstrip() + "..."
+        lines.append(f"- {message.get('role', 'user')}: {sentence}")
+    return lines
+
+class ContextAssembler:
+    """Fits retrieved chunks and conversation history into a prompt token budget per model.
+
+    The system prompt and the latest user turn are always kept. Retrieved chunks are
+    de-duplicated, overlapping neighbours merged, and added best first up to
+    context_max_tokens; the remaining budget goes to history, newest turn first. Turns
+    that no longer fit are replaced by a short extractive summary when there is room.
+    """
+
+    def __init__(self, default_budget: int = 3000, model_budgets: Dict[str, int] = None,
+                 context_max_tokens: int = 1500, turn_max_tokens: int = 400, summary_max_tokens: int = 200):
+        self.default_budget = default_budget
+        self.model_budgets = model_budgets or {}
+        self.context_max_tokens = context_max_tokens
+        self.turn_max_tokens = turn_max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.counter = TokenCounter()
+
+    def budget_for(self, model: str) -> int:
+        return int(self.model_budgets.get(model, self.default_budget))
+
+    def assemble(self, messages: List[Dict[str, Any]], chunks: List[Dict[str, Any]], model: str,
+                 summary: str = "", context_last: bool = False) -> Tuple[List[Dict[str, Any]], str, List[str], Dict[str, Any]]:
+        """Build the prompt messages.
+
+        chunks are {"id", "text", "metadata"} dicts, best first. summary is a rolling
+        summary kept by the caller, always included ahead of any summary of dropped turns.
+        With context_last the retrieved context goes in a system message just before the
+        latest user turn instead of into the first system message, so the prompt prefix
+        (system prompt, summary, history) stays identical from turn to turn. Returns
+        (messages, context text, ids of the chunks used, token report).
+        """
+        count = lambda text: self.counter.count(text, model)
+        budget = self.budget_for(model)
+
+        # Leading system messages, the conversation so far, and the latest user turn
+        split = 0
+        while split < len(messages) and messages[split].get("role") == "system":
+            split += 1
+        system = [dict(m) for m in messages[:split]]
+        rest = messages[split:]
+        latest_index = max((i for i, m in enumerate(rest) if m.get("role") == "user"), default=len(rest))
+        history = rest[:latest_index]
+        tail = [dict(m) for m in rest[latest_index:]]
+
+        base_system = system[0]["content"] if system else DEFAULT_SYSTEM_PROMPT
+        fixed = (TOKENS_PER_REPLY + sum(self.counter.count_message(m, model) for m in system[1:] + tail)
+                 + TOKENS_PER_MESSAGE + count(base_system))
+        # The caller's summary is always kept, so it comes off the budget up front
+        kept_summary = summary.splitlines() if summary else []
+        remaining = budget - fixed - (count(SUMMARY_HEADER + summary) if summary else 0)
+
+        # Retrieved context: best chunks first within its own cap. Costs are counted per chunk,
+        # then overlapping neighbours are merged, which frees budget for another pass.
+        context_cap = min(self.context_max_tokens, remaining)
+        selected = []
+        context = ""
+        for _ in range(2):
+            for chunk in chunks:
+                if chunk in selected:
+                    continue
+                cost = count(f"Document {len(selected) + 1}: {chunk['text']}\n\n")
+                if count(context or CONTEXT_HEADER) + cost <= context_cap:
+                    selected.append(chunk)
+                    context = format_context(merge_neighbours(selected)[0])
+        blocks, folded = merge_neighbours(selected)
+        context = format_context(blocks)
+        context_tokens = count(context)
+        remaining -= context_tokens
+
+        # History, newest first; very long turns are trimmed
+        kept = []
+        history_tokens = 0
+        dropped = []
+        for position in range(len(history) - 1, -1, -1):
+            message = dict(history[position])
+            content = str(message.get("content") or "")
+            if count(content) > self.turn_max_tokens:
+                message["content"] = self.counter.truncate(content, self.turn_max_tokens, model) + " ..."
+            cost = self.counter.count_message(message, model)
+            if history_tokens + cost > remaining:
+                dropped = history[:position + 1]
+                break
+            kept.append(message)
+            history_tokens += cost
+        kept.reverse()
+        remaining -= history_tokens
+
+        # Turns that did not fit become one-line summaries, most recent ones first
+        allowance = min(self.summary_max_tokens, remaining)
+        lines = []
+        used = 0 if kept_summary else count(SUMMARY_HEADER)
+        for line in reversed(summarize_turns(dropped)):
+            cost = count(line + "\n")
+            if used + cost > allowance:
+                break
+            lines.append(line)
+            used += cost
+        summary = SUMMARY_HEADER + "\n".join(kept_summary + lines[::-1]) if lines or kept_summary else ""
+        summary_tokens = count(summary)
+
+        # A system message is only added when the client sent none if there is something to put in it
+        leading = summary if context_last else context + summary
+        if context_last and context:
+            tail = [{"role": "system", "content": context.lstrip()}] + tail
+            fixed += TOKENS_PER_MESSAGE
+        if system:
+            system[0]["content"] = base_system + leading
+            assembled = system + kept + tail
+        elif leading:
+            assembled = [{"role": "system", "content": DEFAULT_SYSTEM_PROMPT + leading}] + kept + tail
+        else:
+            assembled = kept + tail
+            fixed -= TOKENS_PER_MESSAGE + count(base_system)
+
+        used_ids = [chunk_id for block in blocks for chunk_id in block["ids"]]
+        prompt_tokens = fixed + context_tokens + history_tokens + summary_tokens
+        report = {
+            "budget": budget,
+            "prompt_tokens": prompt_tokens,
+            "context_tokens": context_tokens,
+            "history_tokens": history_tokens,
+            "summary_tokens": summary_tokens,
+            "chunks_used": len(used_ids),
+            "chunks_dropped": len(chunks) - len(selected),
+            "chunks_merged": folded,
+            "turns_kept": len(kept),
+            "turns_dropped": len(dropped),
+            "over_budget": prompt_tokens > budget,
+            "token_counter": "tiktoken" if self.counter.exact else "estimate"
+        }
+        return assembled, context, used_ids, report
@@ -0,0 +1,187 @@
+"""
+Server-side conversation state per chat session.
+
+Clients that send a sessionId and only the new user message get their history kept
+here: the session's system prompt, its recent turns and a rolling summary of older
+ones. Sessions live in a bounded in-process LRU and, when a path is configured, are
+written through to a local SQLite file so they survive restarts and are shared by
+worker processes on the same host (each checks the stored version before using its
+cached copy). When a session grows past max_turns messages, the oldest half is folded
+into the summary at once, so the prompt prefix (system prompt, summary and early turns)
+stays the same for many turns in a row. A continued conversation whose session is gone
+is reported as SessionMissing, and the client resends its recent turns (restore).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from context_assembly import summarize_turns
+from metrics import CACHE_REQUESTS
+
+class SessionMissing(Exception):
+    """A continued conversation whose session is not in the store (evicted, expired or kept by another host)"""
+
+def empty_state() -> Dict[str, Any]:
+    return {"system": None, "summary": "", "turns": [], "updated_at": 0.0}
+
+class ConversationStore:
+    """Bounded LRU of session state with an optional SQLite write-through store"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, max_sessions: int = 10000, max_turns: int = 20, summary_max_chars: int = 2000,
+                 ttl_seconds: float = 86400, path: str = None):
+        self.max_sessions = max_sessions
+        self.max_turns = max(2, max_turns)
+        self.summary_max_chars = summary_max_chars
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "folds": 0}
+        self._unpruned = 0
+        self._conn = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            with self._lock:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute("""
+                    CREATE TABLE IF NOT EXISTS conversations (
+                        session_id TEXT PRIMARY KEY,
+                        state TEXT NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                """)
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations (updated_at)")
+                self._conn.commit()
+
+    def _expired(self, state: Dict[str, Any]) -> bool:
+        return bool(self.ttl_seconds) and time.time() - state["updated_at"] > self.ttl_seconds
+
+    def _load(self, session_id: str) -> Dict[str, Any]:
+        """Session state from the LRU or the backing store (caller holds the lock)"""
+        state = self._sessions.get(session_id)
+        if state is not None and self._conn is not None:
+            # Another worker process sharing the store may have recorded a newer turn
+            row = self._conn.execute("SELECT updated_at FROM conversations WHERE session_id = ?",
+                                     (session_id,)).fetchone()
+            if row is None or row[0] != state["updated_at"]:
+                del self._sessions[session_id]
+                state = None
+        if state is not None:
+            self._sessions.move_to_end(session_id)
+            self._stats["hits"] += 1
+        elif self._conn is not None:
+            row = self._conn.execute("SELECT state FROM conversations WHERE session_id = ?", (session_id,)).fetchone()
+            if row:
+                state = json.loads(row[0])
+                self._stats["loads"] += 1
+                self._remember(session_id, state)
+            else:
+                self._stats["misses"] += 1
+        else:
+            self._stats["misses"] += 1
+        if state is None or self._expired(state):
+            return empty_state()
+        return state
+
+    def _remember(self, session_id: str, state: Dict[str, Any]) -> None:
+        self._sessions[session_id] = state
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """Copy of a session's state: system prompt, rolling summary and recent turns"""
+        with self._lock:
+            state = self._load(session_id)
+        CACHE_REQUESTS.inc(cache="conversation", result="hit" if state["updated_at"] else "miss")
+        return {"system": state["system"], "summary": state["summary"], "turns": [dict(turn) for turn in state["turns"]],
+                "updated_at": state["updated_at"]}
+
+    def _fold(self, state: Dict[str, Any]) -> None:
+        """Move the oldest half of the turns into the summary once there are too many"""
+        if len(state["turns"]) <= self.max_turns:
+            return
+        keep = self.max_turns // 2
+        # Keep whole exchanges: the kept turns start with a user message when possible
+        cut = len(state["turns"]) - keep
+        while cut < len(state["turns"]) and state["turns"][cut].get("role") != "user":
+            cut += 1
+        folded, state["turns"] = state["turns"][:cut], state["turns"][cut:]
+        lines = ([state["summary"]] if state["summary"] else []) + summarize_turns(folded)
+        summary = "\n".join(lines)
+        if len(summary) > self.summary_max_chars:
+            # Drop whole lines from the oldest end
+            summary = summary[-self.summary_max_chars:]
+            summary = summary[summary.find("\n") + 1:] if "\n" in summary else summary
+        state["summary"] = summary
+        self._stats["folds"] += 1
+
+    def record_turn(self, session_id: str, user_content: str, assistant_content: str, system: str = None) -> None:
+        """Append a user message and the answer to it (and set the system prompt when given)"""
+        with self._lock:
+            state = dict(self._load(session_id))
+            state["turns"] = state["turns"] + [{"role": "user", "content": user_content},
+                                               {"role": "assistant", "content": assistant_content}]
+            if system is not None:
+                state["system"] = system
+            self._fold(state)
+            state["updated_at"] = time.time()
+            self._remember(session_id, state)
+            self._write(session_id, state)
+
+    def restore(self, session_id: str, turns: List[Dict[str, Any]], system: str = None) -> Dict[str, Any]:
+        """Seed a session with turns resent by the client after the store lost it"""
+        with self._lock:
+            state = dict(empty_state(), system=system, turns=[{"role": turn["role"], "content": turn["content"]}
+                                                              for turn in turns])
+            self._fold(state)
+            state["updated_at"] = time.time()
+            self._remember(session_id, state)
+            self._write(session_id, state)
+        return {"system": state["system"], "summary": state["summary"], "turns": [dict(turn) for turn in state["turns"]],
+                "updated_at": state["updated_at"]}
+
+    def _write(self, session_id: str, state: Dict[str, Any]) -> None:
+        if self._conn is None:
+            return
+        self._conn.execute("INSERT OR REPLACE INTO conversations (session_id, state, updated_at) VALUES (?, ?, ?)",
+                           (session_id, json.dumps(state), state["updated_at"]))
+        self._unpruned += 1
+        # Expired sessions are deleted in batches rather than on every write
+        if self.ttl_seconds and self._unpruned >= self.PRUNE_EVERY:
+            self._unpruned = 0
+            self._conn.execute("DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+        self._conn.commit()
+
+    def reset(self, session_id: str) -> bool:
+        """Forget a session; returns whether it existed"""
+        with self._lock:
+            existed = self._sessions.pop(session_id, None) is not None
+            if self._conn is not None:
+                existed = self._conn.execute("DELETE FROM conversations WHERE session_id = ?",
+                                             (session_id,)).rowcount > 0 or existed
+                self._conn.commit()
+        return existed
+
+    def messages(self, state: Dict[str, Any], user_content: str, system: str = None) -> List[Dict[str, Any]]:
+        """Chat messages for a new user turn: system prompt, recent turns and the new message"""
+        system = system if system is not None else state["system"]
+        return ([{"role": "system", "content": system}] if system else []) + state["turns"] + \
+            [{"role": "user", "content": user_content}]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, sessions=len(self._sessions), max_sessions=self.max_sessions,
+                         max_turns=self.max_turns)
+            if self._conn is not None:
+                stats["stored_sessions"] = self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+                stats["path"] = self.path
+        return stats
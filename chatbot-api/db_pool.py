@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout"""
+
+class PooledConnection:
+    """Proxy around a pooled connection; close() hands it back to the pool"""
+
+    def __init__(self, pool: "ConnectionPool", entry: Dict[str, Any]):
+        self._pool = pool
+        self._entry = entry
+        self._released = False
+
+    @property
+    def raw(self):
+        return self._entry["conn"]
+
+    def __getattr__(self, name):
+        return getattr(self._entry["conn"], name)
+
+    def close(self):
+        """Return the connection to the pool instead of closing it"""
+        if not self._released:
+            self._released = True
+            self._pool._release(self._entry)
+
+    def discard(self):
+        """Close the underlying connection and drop it from the pool"""
+        if not self._released:
+            self._released = True
+            self._pool._release(self._entry, broken=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class ConnectionPool:
+    """Thread-safe bounded pool of DB-API connections.
+
+    Connections are created lazily up to max_size, idle ones are validated with
+    ping() before reuse once they have been idle for validate_after seconds, and
+    any connection older than recycle_seconds is closed and replaced.
+    """
+
+    def __init__(self, connect: Callable[[], Any], min_size: int = 1, max_size: int = 10,
+                 timeout: float = 5.0, recycle_seconds: float = 3600, validate_after: float = 30):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.recycle_seconds = recycle_seconds
+        self.validate_after = validate_after
+
+        self._idle = deque()
+        self._size = 0  # connections in use, idle or being created
+        self._in_use = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "recycled": 0,
+            "discarded": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0
+        }
+
+    def prefill(self) -> int:
+        """Open connections up to min_size; returns how many were created"""
+        created = 0
+        while True:
+            with self._cond:
+                if self._size >= min(self.min_size, self.max_size):
+                    return created
+                self._size += 1
+            try:
+                entry = self._create()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._idle.append(entry)
+                self._cond.notify()
+            created += 1
+
+    def _create(self) -> Dict[str, Any]:
+        conn = self._connect()
+        now = time.monotonic()
+        with self._cond:
+            self._stats["created"] += 1
+        return {"conn": conn, "created_at": now, "last_used": now}
+
+    def _close_quietly(self, entry: Dict[str, Any]) -> None:
+        try:
+            entry["conn"].close()
+        except Exception:
+            pass
+
+    def _is_usable(self, entry: Dict[str, Any]) -> bool:
+        """Check an idle connection before handing it out"""
+        now = time.monotonic()
+        if self.recycle_seconds and now - entry["created_at"] > self.recycle_seconds:
+            with self._cond:
+                self._stats["recycled"] += 1
+            return False
+        if now - entry["last_used"] > self.validate_after:
+            try:
+                entry["conn"].ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._stats["discarded"] += 1
+                return False
+        return True
+
+    def get(self) -> PooledConnection:
+        """Check out a connection, waiting up to the pool timeout"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        while True:
+            entry = None
+            create = False
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No database connection available within {self.timeout}s "
+                            f"({self._in_use} in use, max {self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    entry = self._idle.pop()  # LIFO keeps hot connections hot
+                else:
+                    create = True
+                    self._size += 1
+                self._in_use += 1
+
+            if create:
+                try:
+                    entry = self._create()
+                except Exception:
+                    self._give_back_slot()
+                    raise
+            elif not self._is_usable(entry):
+                # Drop the stale connection and try again with a fresh slot
+                self._close_quietly(entry)
+                self._give_back_slot()
+                continue
+
+            wait = time.monotonic() - started
+            with self._cond:
+                self._stats["checkouts"] += 1
+                if waited:
+                    self._stats["waits"] += 1
+                self._stats["total_wait_seconds"] += wait
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], wait)
+            return PooledConnection(self, entry)
+
+    def _give_back_slot(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._in_use -= 1
+            self._cond.notify()
+
+    def _release(self, entry: Dict[str, Any], broken: bool = False) -> None:
+        # pymysql marks connections that hit a fatal error as closed
+        if broken or not getattr(entry["conn"], "open", True):
+            self._close_quietly(entry)
+            with self._cond:
+                self._stats["discarded"] += 1
+            self._give_back_slot()
+            return
+
+        entry["last_used"] = time.monotonic()
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def close_all(self) -> None:
+        """Close every idle connection (in-use ones are closed when released)"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+        for entry in idle:
+            self._close_quietly(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool occupancy and checkout wait statistics"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+            stats["size"] = self._size
+        stats["min_size"] = self.min_size
+        stats["max_size"] = self.max_size
+        checkouts = stats["checkouts"]
+        stats["avg_wait_ms"] = round(stats["total_wait_seconds"] * 1000 / checkouts, 3) if checkouts else 0.0
+        stats["max_wait_ms"] = round(stats.pop("max_wait_seconds") * 1000, 3)
+        stats["total_wait_seconds"] = round(stats["total_wait_seconds"], 6)
+        return stats
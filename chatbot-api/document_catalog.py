@@ -0,0 +1,124 @@
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Chunk metadata keys written by ChromaDBManager itself; anything else is custom metadata
+BUILTIN_KEYS = ("filename", "upload_date", "chunk_index", "total_chunks", "text_length", "content_hash",
+                "page_start", "page_end")
+
+def encode_cursor(filename: str) -> str:
+    return base64.urlsafe_b64encode(filename.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+class DocumentCatalog:
+    """Document-level catalog kept next to the vector store in a SQLite file.
+
+    One row per document (filename, doc id, chunk count, upload date, content hash and
+    custom metadata), written whenever a document is added, updated or deleted, so the
+    document list can be paged by filename without scanning chunk metadata.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    filename TEXT PRIMARY KEY,
+                    doc_id TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    text_length INTEGER,
+                    content_hash TEXT,
+                    upload_date TEXT,
+                    custom_metadata TEXT NOT NULL DEFAULT '{}'
+                )
+            """)
+            self._conn.commit()
+
+    @staticmethod
+    def _row(doc_id: str, metadata: Dict[str, Any], chunk_count: int) -> Tuple:
+        custom = {key: value for key, value in metadata.items() if key not in BUILTIN_KEYS}
+        return (metadata["filename"], doc_id, chunk_count, metadata.get("text_length"),
+                metadata.get("content_hash"), metadata.get("upload_date"), json.dumps(custom, sort_keys=True))
+
+    def upsert(self, doc_id: str, metadata: Dict[str, Any], chunk_count: int) -> None:
+        """Record a document from its document-level metadata (as stored on each chunk)"""
+        self.upsert_many([(doc_id, metadata, chunk_count)])
+
+    def upsert_many(self, documents: Iterable[Tuple[str, Dict[str, Any], int]]) -> None:
+        rows = [self._row(doc_id, metadata, chunk_count) for doc_id, metadata, chunk_count in documents]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def remove(self, filename: str) -> bool:
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM documents WHERE filename = ?", (filename,)).rowcount
+            self._conn.commit()
+        return removed > 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.commit()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM documents LIMIT 1").fetchone() is None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def fingerprint(self) -> str:
+        """Hash of every document's name, content hash and chunk count; changes whenever the documents do"""
+        digest = hashlib.sha256()
+        with self._lock:
+            for row in self._conn.execute("SELECT filename, content_hash, chunk_count FROM documents ORDER BY filename"):
+                digest.update(json.dumps(row).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE filename = ?", (filename,)).fetchone()
+        return self._document(row) if row else None
+
+    @staticmethod
+    def _document(row: Tuple) -> Dict[str, Any]:
+        filename, doc_id, chunk_count, text_length, content_hash, upload_date, custom = row
+        return {
+            "filename": filename,
+            "doc_id": doc_id,
+            "chunk_count": chunk_count,
+            "text_length": text_length,
+            "content_hash": content_hash,
+            "upload_date": upload_date or "Unknown",
+            "custom_metadata": json.loads(custom)
+        }
+
+    def page(self, limit: int = 50, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Up to limit documents ordered by filename, starting after cursor; returns (documents, next cursor)"""
+        after = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            # Keyset paging on the primary key: each page is an index range scan
+            if after is None:
+                rows = self._conn.execute("SELECT * FROM documents ORDER BY filename LIMIT ?", (limit + 1,)).fetchall()
+            else:
+                rows = self._conn.execute("SELECT * FROM documents WHERE filename > ? ORDER BY filename LIMIT ?",
+                                          (after, limit + 1)).fetchall()
+        documents = [self._document(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(documents[-1]["filename"]) if len(rows) > limit else None
+        return documents, next_cursor
@@ -0,0 +1,283 @@
+import hashlib
+import importlib.metadata
+import importlib.util
+import os
+import sqlite3
+import threading
+from functools import cached_property
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from chromadb.utils.embedding_functions.onnx_mini_lm_l6_v2 import ONNXMiniLM_L6_V2
+
+from metrics import CACHE_REQUESTS
+from startup import initializing
+
+# chromadb internals the ONNX backend reuses (model location, download and normalization);
+# they are not public API, so chromadb is pinned in requirement.txt
+ONNX_BASE_ATTRIBUTES = ("MODEL_NAME", "DOWNLOAD_PATH", "EXTRACTED_FOLDER_NAME", "_download_model_if_not_exists",
+                        "_normalize")
+
+class OnnxMiniLMBackend(ONNXMiniLM_L6_V2):
+    """all-MiniLM-L6-v2 on the ONNX runtime (CPU), the model the collection was built with.
+
+    Compared with the chromadb default it caps intra-op threads, pads each batch to its
+    longest input instead of 256 tokens, and can load the model from a local directory
+    without ever downloading it.
+    """
+
+    def __init__(self, threads: int = 0, batch_size: int = 32, model_dir: str = None, allow_download: bool = True):
+        missing = [name for name in ONNX_BASE_ATTRIBUTES if not hasattr(ONNXMiniLM_L6_V2, name)]
+        if missing:
+            raise RuntimeError(f"The installed chromadb ({importlib.metadata.version('chromadb')}) lacks "
+                               f"{', '.join(missing)} used by the ONNX embedding backend; install the chromadb "
+                               f"version pinned in requirement.txt or set EMBEDDING_BACKEND=sentence-transformers")
+        # The base __init__ only imports onnxruntime and tokenizers; they are imported with the model instead
+        self._preferred_providers = ["CPUExecutionProvider"]
+        self.threads = threads
+        self.batch_size = batch_size
+        self.allow_download = allow_download
+        if model_dir:
+            self.DOWNLOAD_PATH = model_dir
+        self.model_name = f"onnx/{self.MODEL_NAME}"
+
+    @cached_property
+    def ort(self) -> Any:
+        return importlib.import_module("onnxruntime")
+
+    @cached_property
+    def Tokenizer(self) -> Any:
+        return importlib.import_module("tokenizers").Tokenizer
+
+    @cached_property
+    def tqdm(self) -> Any:
+        return importlib.import_module("tqdm").tqdm
+
+    @cached_property
+    def tokenizer(self) -> Any:
+        tokenizer = self.Tokenizer.from_file(os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=256)
+        # Pad to the longest input of the batch; attention masking makes the result identical
+        tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+        return tokenizer
+
+    @cached_property
+    def model(self) -> Any:
+        options = self.ort.SessionOptions()
+        options.log_severity_level = 3
+        options.graph_optimization_level = self.ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        with initializing("embedding_model"):
+            return self.ort.InferenceSession(
+                os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model.onnx"),
+                providers=["CPUExecutionProvider"],
+                sess_options=options
+            )
+
+    def _forward(self, documents: List[str], batch_size: int = 32) -> np.ndarray:
+        """Tokenize each batch together so it is padded to its longest document, then mean-pool"""
+        all_embeddings = []
+        for i in range(0, len(documents), batch_size):
+            encoded = self.tokenizer.encode_batch(documents[i:i + batch_size])
+            input_ids = np.array([e.ids for e in encoded], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+            last_hidden_state = self.model.run(None, {
+                "input_ids": input_ids,
+                "attention_mask": attention_mask,
+                "token_type_ids": np.zeros_like(input_ids)
+            })[0]
+            mask = np.expand_dims(attention_mask, -1).astype(np.float32)
+            embeddings = np.sum(last_hidden_state * mask, 1) / np.clip(mask.sum(1), a_min=1e-9, a_max=None)
+            all_embeddings.append(self._normalize(embeddings).astype(np.float32))
+        return np.concatenate(all_embeddings) if all_embeddings else np.zeros((0, 384), dtype=np.float32)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not self.allow_download:
+            model_path = os.path.join(self.DOWNLOAD_PATH, self.EXTRACTED_FOLDER_NAME, "model.onnx")
+            if not os.path.exists(model_path):
+                raise RuntimeError(f"Embedding model not found at {model_path} and downloads are disabled")
+        else:
+            self._download_model_if_not_exists()
+        return self._forward(texts, batch_size=self.batch_size)
+
+class SentenceTransformerBackend:
+    """Any sentence-transformers model (name or local path) on CPU; needs the optional sentence-transformers package.
+
+    torch and the model are loaded on the first embedding, not when the backend is created.
+    """
+
+    def __init__(self, model: str, threads: int = 0, batch_size: int = 32, allow_download: bool = True):
+        if importlib.util.find_spec("sentence_transformers") is None:
+            raise RuntimeError("The sentence-transformers embedding backend requires: pip install sentence-transformers")
+        self.model_path = model
+        self.threads = threads
+        self.allow_download = allow_download
+        self.batch_size = batch_size
+        self.model_name = f"sentence-transformers/{model}"
+
+    @cached_property
+    def model(self) -> Any:
+        with initializing("embedding_model"):
+            import torch
+            from sentence_transformers import SentenceTransformer
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            if not self.allow_download:
+                os.environ.setdefault("HF_HUB_OFFLINE", "1")
+            return SentenceTransformer(self.model_path, device="cpu")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                 convert_to_numpy=True, show_progress_bar=False)
+
+BACKENDS = {
+    "onnx": OnnxMiniLMBackend,
+    "sentence-transformers": SentenceTransformerBackend
+}
+
+class EmbeddingCache:
+    """Persistent SQLite cache of embeddings keyed by (model, sha256 of the text).
+
+    Vectors are stored as float32 blobs. When max_entries is set, the oldest entries are
+    pruned as new ones are added.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, max_entries: int = 0):
+        self.path = path
+        self.max_entries = max_entries
+        self._unpruned = self.PRUNE_EVERY
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL DEFAULT (julianday('now')),
+                    PRIMARY KEY (model, text_hash)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_created_at ON embeddings (created_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Return {text hash: vector} for the hashes that are cached"""
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 500):
+                batch = hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model] + batch
+                ).fetchall()
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float32)
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(set(hashes)) - len(found)
+        CACHE_REQUESTS.inc(len(found), cache="embedding", result="hit")
+        CACHE_REQUESTS.inc(len(set(hashes)) - len(found), cache="embedding", result="miss")
+        return found
+
+    def put_many(self, model: str, items: Dict[str, np.ndarray]) -> None:
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                [(model, text_hash, np.asarray(vector, dtype=np.float32).tobytes()) for text_hash, vector in items.items()]
+            )
+            self._stats["writes"] += len(items)
+            self._unpruned += len(items)
+            # Pruning scans the table, so only do it every PRUNE_EVERY writes
+            if self.max_entries and self._unpruned >= self.PRUNE_EVERY:
+                self._unpruned = 0
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["path"] = self.path
+        return stats
+
+class Embedder:
+    """Embeds texts with a backend, serving repeated texts from an optional EmbeddingCache.
+
+    Only cache misses reach the backend; they are deduplicated and sorted by length so
+    each inference batch pads as little as possible.
+    """
+
+    def __init__(self, backend, cache: Optional[EmbeddingCache] = None):
+        self.backend = backend
+        self.cache = cache
+        self.model_name = backend.model_name
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        hashes = [EmbeddingCache.text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, list(set(hashes))) if self.cache else {}
+
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in vectors:
+                missing.setdefault(text_hash, text)
+        if missing:
+            ordered = sorted(missing.items(), key=lambda item: len(item[1]))
+            embedded = self.backend.embed([text for _, text in ordered])
+            computed = {text_hash: np.asarray(vector, dtype=np.float32)
+                        for (text_hash, _), vector in zip(ordered, embedded)}
+            if self.cache:
+                self.cache.put_many(self.model_name, computed)
+            vectors.update(computed)
+
+        return [vectors[text_hash].tolist() for text_hash in hashes]
+
+    def warm_up(self) -> None:
+        """Load the model now with one uncached inference, rather than on the first new text"""
+        self.backend.embed(["warm up"])
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"model": self.model_name}
+        if self.cache:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+def create_embedder(backend: str = "onnx", model: str = None, threads: int = 0, batch_size: int = 32,
+                    cache_path: str = None, cache_max_entries: int = 0, model_dir: str = None,
+                    allow_download: bool = True) -> Embedder:
+    """Build an Embedder from configuration values (see the EMBEDDING_* settings in rag_backend.py)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    if backend == "onnx":
+        instance = OnnxMiniLMBackend(threads=threads, batch_size=batch_size, model_dir=model_dir,
+                                     allow_download=allow_download)
+    else:
+        instance = SentenceTransformerBackend(model_dir or model or "all-MiniLM-L6-v2", threads=threads, batch_size=batch_size,
+                                              allow_download=allow_download)
+    cache = EmbeddingCache(cache_path, max_entries=cache_max_entries) if cache_path else None
+    return Embedder(instance, cache)
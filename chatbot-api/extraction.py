@@ -0,0 +1,285 @@
+"""
+PDF and DOCX text extraction off the API process, with a cache keyed by file hash.
+
+Parsing PDFs and Word files is CPU-bound pure Python, so running it in a request
+thread holds the GIL and stalls every other request in the process. DocumentExtractor
+runs it on a process pool instead: PDFs are split into page ranges that are extracted
+in parallel (and yielded in page order as they finish), DOCX files are parsed in one
+worker. Results are cached by the SHA-256 of the file, so re-uploading the same file
+skips extraction entirely, and per-document page and time limits keep one huge or
+pathological upload from tying up the pool.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+from chunking import Segment
+from metrics import CACHE_REQUESTS
+from startup import initializing
+
+# Bump when extraction output changes so cached results are not reused
+EXTRACTOR_VERSION = "1"
+COPY_BLOCK_SIZE = 1024 * 1024
+
+# PyPDF2 and python-docx are imported on first use, which keeps them out of API startup
+
+def open_pdf(path: str):
+    import PyPDF2
+    return PyPDF2.PdfReader(path)
+
+def count_pdf_pages(path: str) -> int:
+    return len(open_pdf(path).pages)
+
+def extract_pdf_pages(path: str, start: int, end: int) -> List[str]:
+    """Text of pages [start, end) of a PDF"""
+    reader = open_pdf(path)
+    return [reader.pages[index].extract_text() or "" for index in range(start, end)]
+
+def extract_docx_paragraphs(path: str) -> List[str]:
+    import docx
+    return [paragraph.text for paragraph in docx.Document(path).paragraphs]
+
+class ExtractionCache:
+    """Persistent SQLite cache of extracted segments keyed by (extractor version, file sha256).
+
+    When max_entries is set, the oldest entries are pruned as new ones are added.
+    """
+
+    def __init__(self, path: str, max_entries: int = 0):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS extractions (
+                    version TEXT NOT NULL,
+                    file_hash TEXT NOT NULL,
+                    segments TEXT NOT NULL,
+                    created_at REAL DEFAULT (julianday('now')),
+                    PRIMARY KEY (version, file_hash)
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_extractions_created_at ON extractions (created_at)")
+            self._conn.commit()
+
+    def get(self, file_hash: str) -> Optional[List[Segment]]:
+        with self._lock:
+            row = self._conn.execute("SELECT segments FROM extractions WHERE version = ? AND file_hash = ?",
+                                     (EXTRACTOR_VERSION, file_hash)).fetchone()
+            self._stats["hits" if row else "misses"] += 1
+        CACHE_REQUESTS.inc(cache="extraction", result="hit" if row else "miss")
+        return [Segment(*segment) for segment in json.loads(row[0])] if row else None
+
+    def put(self, file_hash: str, segments: List[Segment]) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO extractions (version, file_hash, segments) VALUES (?, ?, ?)",
+                               (EXTRACTOR_VERSION, file_hash, json.dumps([list(segment) for segment in segments])))
+            self._stats["writes"] += 1
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM extractions WHERE rowid IN (SELECT rowid FROM extractions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM extractions")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._conn.execute("SELECT COUNT(*) FROM extractions").fetchone()[0]
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["path"] = self.path
+        return stats
+
+class _TimeBudget:
+    """Extraction time left for one document (unlimited when seconds is 0).
+
+    Only time spent extracting or waiting for workers is counted, not the time the
+    consumer spends chunking and embedding between segments.
+    """
+
+    def __init__(self, seconds: float, filename: str):
+        self.left = seconds or None
+        self.seconds = seconds
+        self.filename = filename
+
+    def _error(self) -> TimeoutError:
+        return TimeoutError(f"Extracting {self.filename} took longer than {self.seconds:g} seconds")
+
+    @contextmanager
+    def measure(self):
+        started = time.monotonic()
+        yield
+        if self.left is not None:
+            self.left -= time.monotonic() - started
+            if self.left <= 0:
+                raise self._error()
+
+    def wait(self, future) -> Any:
+        started = time.monotonic()
+        try:
+            return future.result(timeout=self.left)
+        except TimeoutError:
+            raise self._error()
+        finally:
+            if self.left is not None:
+                self.left = max(0.001, self.left - (time.monotonic() - started))
+
+class DocumentExtractor:
+    """Extracts PDF pages and DOCX paragraphs as Segments, on a process pool when processes > 0.
+
+    With processes=0 extraction runs in the calling thread (the time limit is then
+    checked between pages). Worker processes are forked where the platform allows it;
+    other start methods re-import the main module in each worker, so run the API under
+    uvicorn/gunicorn rather than `python rag_backend.py` if fork is unavailable.
+    """
+
+    def __init__(self, processes: int = 2, pages_per_task: int = 8, max_pages: int = 0,
+                 timeout_seconds: float = 0, cache: ExtractionCache = None, start_method: str = None):
+        self.processes = processes
+        self.pages_per_task = max(1, pages_per_task)
+        self.max_pages = max_pages
+        self.timeout_seconds = timeout_seconds
+        self.cache = cache
+        self.start_method = start_method or ("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                 mp_context=multiprocessing.get_context(self.start_method))
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a broken pool so the next extraction starts a fresh one"""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def start(self) -> None:
+        """Start the worker processes now (e.g. at startup) instead of on the first upload"""
+        if self.processes:
+            with initializing("extraction_pool"):
+                self._get_pool().submit(os.getpid).result()
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _check_pages(self, filename: str, pages: int) -> None:
+        if self.max_pages and pages > self.max_pages:
+            raise ValueError(f"{filename} has {pages} pages, more than the limit of {self.max_pages}")
+
+    @staticmethod
+    def _spool(source: Union[bytes, str, BinaryIO], stack: ExitStack, hashed: bool) -> Tuple[str, Optional[str]]:
+        """A file path for the source and the sha256 of its content (when hashed)"""
+        digest = hashlib.sha256() if hashed else None
+        if isinstance(source, str):
+            if digest:
+                with open(source, "rb") as stream:
+                    for block in iter(lambda: stream.read(COPY_BLOCK_SIZE), b""):
+                        digest.update(block)
+            return source, digest.hexdigest() if digest else None
+        fd, path = tempfile.mkstemp(prefix="extract-")
+        stack.callback(os.remove, path)
+        with os.fdopen(fd, "wb") as out:
+            blocks = [source] if isinstance(source, (bytes, bytearray)) else iter(lambda: source.read(COPY_BLOCK_SIZE), b"")
+            for block in blocks:
+                if digest:
+                    digest.update(block)
+                out.write(block)
+        return path, digest.hexdigest() if digest else None
+
+    def segments(self, source: Union[bytes, str, BinaryIO], filename: str) -> Iterator[Segment]:
+        """Yield the pages of a PDF or the paragraphs of a DOCX file, from the cache when possible"""
+        with ExitStack() as stack:
+            path, file_hash = self._spool(source, stack, hashed=self.cache is not None)
+            if self.cache:
+                cached = self.cache.get(file_hash)
+                if cached is not None:
+                    yield from cached
+                    return
+            budget = _TimeBudget(self.timeout_seconds, filename)
+            extract = self._extract_pdf if filename.lower().endswith(".pdf") else self._extract_docx
+            extracted = []
+            for segment in extract(path, filename, budget):
+                extracted.append(segment)
+                yield segment
+            if self.cache:
+                self.cache.put(file_hash, extracted)
+
+    def _extract_pdf(self, path: str, filename: str, budget: "_TimeBudget") -> Iterator[Segment]:
+        if not self.processes:
+            with budget.measure():
+                reader = open_pdf(path)
+                self._check_pages(filename, len(reader.pages))
+            for number, page in enumerate(reader.pages, start=1):
+                with budget.measure():
+                    text = page.extract_text() or ""
+                yield Segment(text, page=number, kind="page")
+            return
+
+        pool = self._get_pool()
+        futures = []
+        try:
+            pages = budget.wait(pool.submit(count_pdf_pages, path))
+            self._check_pages(filename, pages)
+            futures = [pool.submit(extract_pdf_pages, path, start, min(start + self.pages_per_task, pages))
+                       for start in range(0, pages, self.pages_per_task)]
+            number = 1
+            for future in futures:
+                for text in budget.wait(future):
+                    yield Segment(text, page=number, kind="page")
+                    number += 1
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise RuntimeError(f"An extraction worker died while processing {filename}")
+        finally:
+            # Ranges not started yet are dropped if the caller stops early or a limit was hit
+            for future in futures:
+                future.cancel()
+
+    def _extract_docx(self, path: str, filename: str, budget: "_TimeBudget") -> Iterator[Segment]:
+        if not self.processes:
+            with budget.measure():
+                paragraphs = extract_docx_paragraphs(path)
+        else:
+            pool = self._get_pool()
+            try:
+                paragraphs = budget.wait(pool.submit(extract_docx_paragraphs, path))
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                raise RuntimeError(f"An extraction worker died while processing {filename}")
+        for text in paragraphs:
+            yield Segment(text, kind="paragraph")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"processes": self.processes, "pages_per_task": self.pages_per_task, "max_pages": self.max_pages,
+                 "timeout_seconds": self.timeout_seconds}
+        if self.cache:
+            stats["cache"] = self.cache.stats()
+        return stats
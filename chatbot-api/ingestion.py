@@ -0,0 +1,392 @@
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional, Tuple
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2')
+COPY_BLOCK_SIZE = 1024 * 1024
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVE_SUFFIXES)
+
+def spool_stream(stream: BinaryIO, directory: str, suffix: str = "", max_bytes: int = None) -> Tuple[str, str, int]:
+    """Copy a stream to a temp file while hashing it; returns (path, sha256, size)"""
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(dir=directory, suffix=suffix)
+    with os.fdopen(fd, "wb") as out:
+        while True:
+            block = stream.read(COPY_BLOCK_SIZE)
+            if not block:
+                break
+            size += len(block)
+            if max_bytes and size > max_bytes:
+                raise ValueError(f"File exceeds the {max_bytes} byte limit")
+            digest.update(block)
+            out.write(block)
+    return path, digest.hexdigest(), size
+
+def _iter_archive_members(path: str, archive_name: str):
+    """Yield (member name, open stream) for regular files in a zip or tar archive"""
+    if archive_name.lower().endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as stream:
+                        yield info.filename, stream
+    else:
+        with tarfile.open(path, mode="r:*") as archive:
+            for member in archive:
+                if member.isfile():
+                    stream = archive.extractfile(member)
+                    if stream is not None:
+                        with stream:
+                            yield member.name, stream
+
+def expand_uploads(uploads: Iterable[Tuple[str, BinaryIO]], directory: str, supported_extensions: Tuple[str, ...],
+                   max_files: int = 5000, max_file_bytes: int = 200 * 1024 * 1024) -> List[Dict[str, Any]]:
+    """Spool uploaded files and archive members to disk, hashing each one.
+
+    Returns one entry per file with its path and content hash, or a "skipped" entry
+    (unsupported type, nested archive, over the size or count limit).
+    """
+    entries = []
+    spooled = {"count": 0}
+
+    def add(filename, stream, archive=None):
+        entry = {"filename": os.path.basename(filename), "archive": archive}
+        extension = filename.split('.')[-1].lower()
+        if spooled["count"] >= max_files:
+            entry.update(status="skipped", error=f"More than {max_files} files in one request")
+        elif extension not in supported_extensions:
+            entry.update(status="skipped", error=f"Unsupported file format: {extension}")
+        else:
+            try:
+                path, content_hash, size = spool_stream(stream, directory, f".{extension}", max_file_bytes)
+                entry.update(path=path, content_hash=content_hash, size=size)
+                spooled["count"] += 1
+            except ValueError as e:
+                entry.update(status="skipped", error=str(e))
+        entries.append(entry)
+
+    for filename, stream in uploads:
+        if not is_archive(filename):
+            add(filename, stream)
+            continue
+        archive_path, _, _ = spool_stream(stream, directory, ".archive")
+        try:
+            for member_name, member_stream in _iter_archive_members(archive_path, filename):
+                if is_archive(member_name):
+                    entries.append({"filename": os.path.basename(member_name), "archive": filename,
+                                    "status": "skipped", "error": "Nested archives are not supported"})
+                    continue
+                add(member_name, member_stream, archive=filename)
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            entries.append({"filename": filename, "status": "failed", "error": f"Invalid archive: {str(e)}"})
+        finally:
+            os.remove(archive_path)
+    return entries
+
+def ingest_files(chroma_manager, files: List[Dict[str, Any]], metadata: Dict[str, Any] = None,
+                 workers: int = 4, write_batch_size: int = 1024,
+                 progress: Callable[[Dict[str, Any]], None] = None,
+                 chunking: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Ingest many spooled files: dedupe by content hash, chunk concurrently, write in large batches.
+
+    Documents are extracted and chunked on a thread pool. Chunks already stored for the
+    same filename (same content-derived id) are reused; the rest are accumulated and
+    written with one collection write per write_batch_size chunks. A document's chunks
+    are never split between a successful and a failed write, and its stale chunks are
+    only removed once its new chunks are stored.
+    """
+    started = time.perf_counter()
+    results = []
+    to_process = []
+    seen_hashes = {}
+    seen_names = set()
+
+    for entry in files:
+        result = {key: entry.get(key) for key in ("filename", "archive", "content_hash", "status", "error")}
+        result["chunk_count"] = 0
+        results.append(result)
+        if "path" not in entry:
+            continue
+        if entry["content_hash"] in seen_hashes:
+            result.update(status="duplicate", duplicate_of=seen_hashes[entry["content_hash"]])
+            continue
+        if entry["filename"] in seen_names:
+            # Chunks are keyed by filename, so two different files with one name would overwrite each other
+            result.update(status="skipped", error="Another file with the same name is in this upload")
+            continue
+        seen_hashes[entry["content_hash"]] = entry["filename"]
+        seen_names.add(entry["filename"])
+        to_process.append((entry, result))
+
+    state = {"files_processed": 0, "chunks_written": 0, "chunks_deleted": 0}
+    buffer = {"ids": [], "documents": [], "metadatas": [], "owners": []}
+
+    def prepare(path, filename, doc_metadata):
+        records = chroma_manager.chunk_document(path, filename, doc_metadata, **(chunking or {}))
+        records["existing"] = chroma_manager.get_document_chunks(filename)
+        return records
+
+    def finish(result, records, added_ids):
+        counts = chroma_manager.finish_document(records["ids"], records["document_metadata"], records["existing"],
+                                                added_ids, final_ids=added_ids,
+                                                chunk_metadata=records["chunk_metadata"])
+        state["chunks_deleted"] += counts["deleted_chunks"]
+        result.update(counts)
+        result["status"] = "unchanged" if counts["document_status"] == "unchanged" else "success"
+
+    def report():
+        if progress:
+            progress({"files_total": len(to_process), "files_processed": state["files_processed"],
+                      "chunks_processed": state["chunks_written"]})
+
+    def flush():
+        if not buffer["ids"]:
+            return
+        written = []
+        try:
+            for i in range(0, len(buffer["ids"]), write_batch_size):
+                ids = buffer["ids"][i:i + write_batch_size]
+                chroma_manager.write_chunks(ids, buffer["documents"][i:i + write_batch_size],
+                                            buffer["metadatas"][i:i + write_batch_size])
+                written.extend(ids)
+            state["chunks_written"] += len(written)
+        except Exception as e:
+            traceback.print_exc()
+            if written:
+                try:
+                    chroma_manager.delete_chunks(written)
+                except Exception:
+                    traceback.print_exc()
+            for result, _, _ in buffer["owners"]:
+                result.update(status="failed", error=f"Failed to write chunks: {str(e)}", chunk_count=0)
+        else:
+            for result, records, added_ids in buffer["owners"]:
+                try:
+                    finish(result, records, added_ids)
+                except Exception as e:
+                    traceback.print_exc()
+                    result.update(status="failed", error=f"Failed to update stored chunks: {str(e)}")
+        for key in buffer:
+            buffer[key] = []
+        report()
+
+    def collect(future, result):
+        state["files_processed"] += 1
+        try:
+            records = future.result()
+        except Exception as e:
+            result.update(status="failed", error=str(e))
+            return
+        if not records["ids"]:
+            result.update(status="failed", error="No text could be extracted from the document")
+            return
+        result["chunk_count"] = len(records["ids"])
+        new = [i for i, chunk_id in enumerate(records["ids"]) if chunk_id not in records["existing"]]
+        added_ids = [records["ids"][i] for i in new]
+        if not new:
+            # Nothing to embed; reconcile metadata and stale chunks right away
+            try:
+                finish(result, records, added_ids)
+            except Exception as e:
+                traceback.print_exc()
+                result.update(status="failed", error=f"Failed to update stored chunks: {str(e)}")
+            return
+        for key in ("ids", "documents", "metadatas"):
+            buffer[key].extend(records[key][i] for i in new)
+        buffer["owners"].append((result, records, added_ids))
+        if len(buffer["ids"]) >= write_batch_size:
+            flush()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bulk-ingest") as pool:
+        queue = iter(to_process)
+        in_flight = {}
+        while True:
+            # Keep a bounded window of documents being chunked
+            while len(in_flight) < workers * 2:
+                item = next(queue, None)
+                if item is None:
+                    break
+                entry, result = item
+                doc_metadata = dict(metadata or {})
+                if entry.get("archive"):
+                    doc_metadata["archive"] = entry["archive"]
+                future = pool.submit(prepare, entry["path"], entry["filename"], doc_metadata)
+                in_flight[future] = result
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                collect(future, in_flight.pop(future))
+    flush()
+
+    elapsed = time.perf_counter() - started
+    summary = {"success": 0, "unchanged": 0, "duplicate": 0, "skipped": 0, "failed": 0}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {
+        "file_count": len(results),
+        "summary": summary,
+        "chunk_count": state["chunks_written"],
+        "deleted_chunks": state["chunks_deleted"],
+        "elapsed_seconds": round(elapsed, 3),
+        "docs_per_minute": round(summary["success"] * 60 / elapsed, 2) if elapsed else 0.0,
+        "chunks_per_second": round(state["chunks_written"] / elapsed, 2) if elapsed else 0.0,
+        "results": results
+    }
+
+class IngestionJobManager:
+    """Runs document ingestion in the background and tracks progress by job id.
+
+    Uploaded files are spooled to disk by the caller; a job extracts, chunks, embeds
+    and stores the file through ChromaDBManager.ingest_document and removes the spool
+    file when it finishes. Finished jobs are kept (up to max_jobs) so clients can poll.
+    The default chroma_manager may be given as a callable, which is only called for
+    jobs submitted without a manager of their own.
+    """
+
+    def __init__(self, chroma_manager, max_workers: int = 2, max_jobs: int = 500,
+                 on_success: Callable[[Dict[str, Any]], None] = None):
+        self.chroma_manager = chroma_manager
+        self.max_jobs = max_jobs
+        self.on_success = on_success
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _manager(self, chroma_manager):
+        if chroma_manager is not None:
+            return chroma_manager
+        return self.chroma_manager() if callable(self.chroma_manager) else self.chroma_manager
+
+    def submit(self, path: str, filename: str, metadata: Dict[str, Any] = None,
+               chroma_manager=None, chunking: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Queue a spooled file for ingestion (into chroma_manager's collection, default the job manager's)"""
+        chroma_manager = self._manager(chroma_manager)
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "kind": "document",
+            "collection": chroma_manager.collection_name,
+            "filename": filename,
+            "status": "queued",
+            "file_size": os.path.getsize(path),
+            "segments_processed": 0,
+            "chunks_processed": 0,
+            "chunk_count": None,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._evict_finished()
+        self._executor.submit(self._run, job_id, chroma_manager, path, filename, metadata or {}, chunking or {})
+        return dict(job)
+
+    def submit_bulk(self, spool_dir: str, files: List[Dict[str, Any]], metadata: Dict[str, Any] = None,
+                    workers: int = 4, write_batch_size: int = 1024, chroma_manager=None,
+                    chunking: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Queue a bulk ingestion of already-spooled files; spool_dir is removed afterwards"""
+        chroma_manager = self._manager(chroma_manager)
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "kind": "bulk",
+            "collection": chroma_manager.collection_name,
+            "status": "queued",
+            "files_total": len(files),
+            "files_processed": 0,
+            "chunks_processed": 0,
+            "result": None,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "started_at": None,
+            "finished_at": None
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._evict_finished()
+        self._executor.submit(self._run_bulk, job_id, chroma_manager, spool_dir, files, metadata or {},
+                              workers, write_batch_size, chunking or {})
+        return dict(job)
+
+    def _run_bulk(self, job_id: str, chroma_manager, spool_dir: str, files: List[Dict[str, Any]],
+                  metadata: Dict[str, Any], workers: int, write_batch_size: int, chunking: Dict[str, Any]) -> None:
+        self._update(job_id, status="running", started_at=datetime.now().isoformat())
+        try:
+            result = ingest_files(chroma_manager, files, metadata, workers, write_batch_size,
+                                  progress=lambda progress: self._update(job_id, **progress), chunking=chunking)
+            self._update(job_id, status="completed", result=result, finished_at=datetime.now().isoformat())
+            if self.on_success and result["summary"]["success"]:
+                self.on_success(self.get(job_id))
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+    def _evict_finished(self) -> None:
+        """Drop the oldest finished jobs beyond max_jobs (caller holds the lock)"""
+        excess = len(self._jobs) - self.max_jobs
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]["status"] in ("completed", "failed"):
+                del self._jobs[job_id]
+                excess -= 1
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+    def _run(self, job_id: str, chroma_manager, path: str, filename: str, metadata: Dict[str, Any],
+             chunking: Dict[str, Any]) -> None:
+        self._update(job_id, status="running", started_at=datetime.now().isoformat())
+        try:
+            result = chroma_manager.ingest_document(
+                path, filename, metadata,
+                progress=lambda progress: self._update(job_id, **progress),
+                **chunking
+            )
+            if not result["chunk_count"]:
+                raise ValueError("No text could be extracted from the document")
+            self._update(job_id, status="completed", chunks_processed=result["chunk_count"],
+                         finished_at=datetime.now().isoformat(), **result)
+            if self.on_success and result["document_status"] != "unchanged":
+                self.on_success(self.get(job_id))
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", error=str(e), finished_at=datetime.now().isoformat())
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a snapshot of a job, or None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Return snapshots of all tracked jobs, newest first"""
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
@@ -0,0 +1,374 @@
+"""
+Outbound gateway for chat completion calls.
+
+Every call to the LLM API goes through LLMGateway, from Flask threads and from the ASGI
+event loop alike:
+
+- Identical non-streaming requests that are in flight at the same time share one
+  upstream call (single-flight), so a burst of the same first question costs one
+  completion.
+- At most max_concurrency upstream calls run at once (a streamed completion holds its
+  slot until the stream is closed). Further calls wait in a first-come, first-served
+  queue; when max_queue calls are already waiting, or a call waits longer than
+  queue_timeout seconds, it fails fast with GatewayOverloaded instead of piling up
+  threads.
+- 429, 5xx and connection errors are retried up to max_retries times with jittered
+  exponential backoff (or the server's Retry-After, when shorter than backoff_max).
+  The slot is kept while backing off, so a rate-limited upstream also slows the queue.
+
+Clients can be passed ready-made or as factories, which are called on the first call
+that needs them so that creating a gateway costs nothing at startup.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from openai import APIConnectionError, APIStatusError
+
+import metrics
+from startup import Lazy
+
+class GatewayError(Exception):
+    """A call through the gateway failed without an upstream error to report"""
+
+class GatewayOverloaded(GatewayError):
+    """Raised instead of queueing a call when the gateway is saturated"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class _Waiter:
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.granted = False
+
+class FairLimiter:
+    """Counting semaphore with a bounded FIFO queue, usable from threads and coroutines.
+
+    A released slot is handed straight to the oldest waiter, so later arrivals cannot
+    overtake it. A waiter that was granted a slot owns it even if it gave up waiting at
+    the same moment, and must release it.
+    """
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._queue: "deque[_Waiter]" = deque()
+        self._lock = threading.Lock()
+
+    def _enqueue(self, waiter: _Waiter) -> bool:
+        """Take a free slot (True) or queue the waiter (False); raises GatewayOverloaded if the queue is full"""
+        with self._lock:
+            if self.active < self.limit and not self._queue:
+                self.active += 1
+                return True
+            if len(self._queue) >= self.max_queue:
+                raise GatewayOverloaded(f"LLM queue is full ({len(self._queue)} requests waiting)")
+            self._queue.append(waiter)
+            return False
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Take a waiter that stopped waiting out of the queue; returns whether it holds a slot anyway"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._queue.remove(waiter)
+            return False
+
+    def acquire(self, timeout: float = None) -> None:
+        waiter = _Waiter()
+        if self._enqueue(waiter):
+            return
+        if not waiter.event.wait(timeout) and not self._abandon(waiter):
+            raise GatewayOverloaded(f"Timed out after {timeout}s waiting for an LLM slot")
+
+    async def acquire_async(self, timeout: float = None) -> None:
+        waiter = _Waiter(asyncio.get_running_loop())
+        if self._enqueue(waiter):
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not self._abandon(waiter):
+                raise GatewayOverloaded(f"Timed out after {timeout}s waiting for an LLM slot")
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._queue:
+                self.active -= 1
+                return
+            waiter = self._queue.popleft()
+            waiter.granted = True
+        if waiter.event is not None:
+            waiter.event.set()
+        else:
+            waiter.loop.call_soon_threadsafe(lambda: waiter.future.done() or waiter.future.set_result(True))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"active": self.active, "queued": len(self._queue), "limit": self.limit, "max_queue": self.max_queue}
+
+class _GatedStream:
+    """A streamed completion that gives its slot back once exhausted or closed"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        try:
+            yield from self._stream
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            try:
+                self._stream.close()
+            finally:
+                release()
+
+class _AsyncGatedStream:
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self._stream:
+                yield chunk
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            try:
+                await self._stream.close()
+            finally:
+                release()
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+class LLMGateway:
+    def __init__(self, client=None, async_client=None, max_concurrency: int = 16, max_queue: int = 64,
+                 queue_timeout: float = 30, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 8, coalesce: bool = True, client_factory: Callable[[], Any] = None,
+                 async_client_factory: Callable[[], Any] = None, name: str = "openai"):
+        self._client = Lazy(f"{name}_client", client_factory)
+        self._async_client = Lazy(f"{name}_async_client", async_client_factory)
+        if client is not None:
+            self._client.set(client)
+        if async_client is not None:
+            self._async_client.set(async_client)
+        self.limiter = FairLimiter(max_concurrency, max_queue)
+        self.queue_timeout = queue_timeout or None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.coalesce = coalesce
+        self._flights: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"upstream": 0, "coalesced": 0, "retries": 0, "rejected": 0, "failed": 0}
+
+    @property
+    def client(self):
+        return self._client.get()
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client.set(client)
+
+    @property
+    def async_client(self):
+        return self._async_client.get()
+
+    @async_client.setter
+    def async_client(self, client) -> None:
+        self._async_client.set(client)
+
+    def warm_up(self) -> None:
+        """Create the clients now rather than on the first call"""
+        for lazy in (self._client, self._async_client):
+            if lazy.factory is not None:
+                lazy.get()
+
+    async def aclose(self) -> None:
+        """Close the async client if it was created"""
+        if self._async_client.ready:
+            await self._async_client.get().close()
+
+    def _count(self, outcome: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[outcome] += amount
+        metrics.LLM_REQUESTS.inc(amount, outcome=outcome)
+
+    @staticmethod
+    def flight_key(request: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _join(self, request: Dict[str, Any]) -> Tuple[Optional[str], Future, bool]:
+        """(key, flight, leader): the in-flight call for an identical request, or a new one to lead"""
+        if not self.coalesce:
+            return None, Future(), True
+        key = self.flight_key(request)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return key, flight, False
+            flight = self._flights[key] = Future()
+            return key, flight, True
+
+    def _land(self, key: Optional[str], flight: Future, result: Any = None, error: BaseException = None) -> None:
+        if key is not None:
+            with self._lock:
+                self._flights.pop(key, None)
+        if isinstance(error, BaseException) and not isinstance(error, Exception):
+            # A cancelled or interrupted leader must not hand CancelledError or KeyboardInterrupt
+            # to followers, whose callers only handle regular exceptions
+            cause, error = error, GatewayError(f"Shared call was interrupted ({type(error).__name__})")
+            error.__cause__ = cause
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
+
+    def _delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After when it is not longer than backoff_max"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            if retry_after is not None and 0 <= float(retry_after) <= self.backoff_max:
+                return float(retry_after)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _acquire(self) -> None:
+        started = time.perf_counter()
+        try:
+            self.limiter.acquire(self.queue_timeout)
+        except GatewayOverloaded:
+            self._count("rejected")
+            raise
+        finally:
+            metrics.observe_stage("llm_queue", time.perf_counter() - started)
+
+    async def _acquire_async(self) -> None:
+        started = time.perf_counter()
+        try:
+            await self.limiter.acquire_async(self.queue_timeout)
+        except GatewayOverloaded:
+            self._count("rejected")
+            raise
+        finally:
+            metrics.observe_stage("llm_queue", time.perf_counter() - started)
+
+    def _call(self, request: Dict[str, Any], stream: bool):
+        """One upstream call with retries; the caller holds a slot"""
+        attempt = 0
+        while True:
+            try:
+                self._count("upstream")
+                return self.client.chat.completions.create(**request, stream=stream)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._count("failed")
+                    raise
+                self._count("retries")
+                time.sleep(self._delay(attempt, e))
+                attempt += 1
+
+    async def _call_async(self, request: Dict[str, Any], stream: bool):
+        attempt = 0
+        while True:
+            try:
+                self._count("upstream")
+                return await self.async_client.chat.completions.create(**request, stream=stream)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    self._count("failed")
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self._delay(attempt, e))
+                attempt += 1
+
+    def complete(self, request: Dict[str, Any]) -> Tuple[Any, bool]:
+        """Chat completion for request; returns (completion, whether it was shared with an identical call)"""
+        key, flight, leader = self._join(request)
+        if not leader:
+            self._count("coalesced")
+            return flight.result(), True
+        try:
+            self._acquire()
+            try:
+                completion = self._call(request, stream=False)
+            finally:
+                self.limiter.release()
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, completion)
+        return completion, False
+
+    async def complete_async(self, request: Dict[str, Any]) -> Tuple[Any, bool]:
+        key, flight, leader = self._join(request)
+        if not leader:
+            self._count("coalesced")
+            # Shielded so that a follower giving up does not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(flight)), True
+        try:
+            await self._acquire_async()
+            try:
+                completion = await self._call_async(request, stream=False)
+            finally:
+                self.limiter.release()
+        except BaseException as e:
+            self._land(key, flight, error=e)
+            raise
+        self._land(key, flight, completion)
+        return completion, False
+
+    def stream(self, request: Dict[str, Any]) -> _GatedStream:
+        """Streamed chat completion; the slot is held until the returned stream is exhausted or closed"""
+        self._acquire()
+        try:
+            return _GatedStream(self._call(request, stream=True), self.limiter.release)
+        except BaseException:
+            self.limiter.release()
+            raise
+
+    async def stream_async(self, request: Dict[str, Any]) -> _AsyncGatedStream:
+        await self._acquire_async()
+        try:
+            return _AsyncGatedStream(await self._call_async(request, stream=True), self.limiter.release)
+        except BaseException:
+            self.limiter.release()
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats, in_flight=len(self._flights))
+        stats.update(self.limiter.stats())
+        stats.update(max_retries=self.max_retries, queue_timeout=self.queue_timeout, coalesce=self.coalesce)
+        return stats
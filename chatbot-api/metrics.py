@@ -0,0 +1,189 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition (no client library needed).
+
+Stages are timed with the `timed` context manager (or `observe_stage`), which feeds the
+chatbot_stage_seconds histogram and, when a request has enabled it, the per-request
+timings used for the Server-Timing response header.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in sorted(self._values.items())]
+        for key, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    "chatbot_stage_seconds", "Time spent in each processing stage", ["stage"]
+))
+HTTP_REQUEST_SECONDS = registry.register(Histogram(
+    "chatbot_http_request_seconds", "HTTP request latency until the response is returned", ["route", "method"]
+))
+HTTP_REQUESTS = registry.register(Counter(
+    "chatbot_http_requests_total", "HTTP requests by route, method and status", ["route", "method", "status"]
+))
+HTTP_ERRORS = registry.register(Counter(
+    "chatbot_http_errors_total", "HTTP responses with a 5xx status by route", ["route"]
+))
+TOKENS = registry.register(Counter(
+    "chatbot_tokens_total", "Prompt and completion tokens (local estimate or as reported by the API)", ["kind", "source"]
+))
+CACHE_REQUESTS = registry.register(Counter(
+    "chatbot_cache_requests_total", "Cache lookups by cache and result", ["cache", "result"]
+))
+LLM_REQUESTS = registry.register(Counter(
+    "chatbot_llm_requests_total",
+    "LLM gateway calls by outcome (upstream, coalesced, retries, rejected, failed)", ["outcome"]
+))
+ROUTE_REQUESTS = registry.register(Counter(
+    "chatbot_route_requests_total", "Chat turns by model route and the reasons it was chosen", ["route", "reason"]
+))
+ROUTE_SECONDS = registry.register(Histogram(
+    "chatbot_route_seconds", "LLM latency (queueing included) of completed turns by model route", ["route", "model"]
+))
+ROUTE_COST = registry.register(Counter(
+    "chatbot_route_cost_usd_total", "Estimated LLM cost in USD by model route", ["route", "model"]
+))
+RETRIEVAL_DECISIONS = registry.register(Counter(
+    "chatbot_retrieval_decisions_total", "Chat turns by retrieval decision", ["decision"]
+))
+STARTUP_SECONDS = registry.register(Histogram(
+    "chatbot_startup_seconds", "Import and lazy initialization time by component and what triggered it",
+    ["component", "trigger"]
+))
+
+# Per-request stage timings for the Server-Timing header; None when not collecting
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = \
+    contextvars.ContextVar("request_timings", default=None)
+
+def start_request_timings() -> List[Tuple[str, float]]:
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+def stop_request_timings() -> None:
+    _request_timings.set(None)
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+@contextmanager
+def timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+def timed_iter(stage: str, iterator):
+    """Yield from iterator, timing only the work done inside it (not the consumer's)"""
+    elapsed = 0.0
+    iterator = iter(iterator)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    finally:
+        observe_stage(stage, elapsed)
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float = None) -> str:
+    """Format timings as a Server-Timing header value (durations in milliseconds)"""
+    merged: Dict[str, float] = {}
+    for stage, seconds in timings:
+        merged[stage] = merged.get(stage, 0.0) + seconds
+    parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in merged.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
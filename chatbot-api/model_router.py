@@ -0,0 +1,137 @@
+"""
+Server-side model routing for chat turns.
+
+Routes form a ladder from the fastest, cheapest model to the largest one. Every turn
+starts on the first rung with a tight max_tokens; it climbs one rung when retrieval is
+weak (nothing relevant found, or the best chunk is beyond weak_distance) and one more
+when the question is long or complex (several questions, or words such as "compare",
+"explain" or "roadmap"). Small talk and questions close to a guided-flow or FAQ intent
+stay on the first rung unless they are complex. Latency and estimated cost are
+recorded per route so the thresholds can be tuned against real traffic.
+"""
+import re
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import metrics
+
+COMPLEX_QUESTION_RE = re.compile(
+    r"\b(compare|comparison|difference between|differences|versus|vs|why|explain|step by step|step-by-step|"
+    r"roadmap|plan|strategy|pros and cons|trade-?offs?|analy[sz]e|in detail|detailed|elaborate)\b"
+)
+
+class Route(NamedTuple):
+    name: str
+    model: str
+    max_tokens: int
+    input_cost_per_1k: float = 0.0   # USD per 1000 prompt tokens
+    output_cost_per_1k: float = 0.0  # USD per 1000 completion tokens
+    base_url: Optional[str] = None   # Another OpenAI-compatible endpoint for this route
+
+DEFAULT_ROUTES = [
+    {"name": "fast", "model": "gpt-4.1-nano", "max_tokens": 300,
+     "input_cost_per_1k": 0.0001, "output_cost_per_1k": 0.0004},
+    {"name": "standard", "model": "gpt-4.1-mini", "max_tokens": 800,
+     "input_cost_per_1k": 0.0004, "output_cost_per_1k": 0.0016},
+    {"name": "large", "model": "gpt-4.1", "max_tokens": 1024,
+     "input_cost_per_1k": 0.002, "output_cost_per_1k": 0.008},
+]
+
+def parse_routes(routes: List[Dict[str, Any]]) -> List[Route]:
+    if not routes:
+        raise ValueError("At least one model route is required")
+    parsed = []
+    for route in routes:
+        if not route.get("name") or not route.get("model") or not route.get("max_tokens"):
+            raise ValueError("Every model route needs a name, a model and max_tokens")
+        parsed.append(Route(**{field: route[field] for field in Route._fields if field in route}))
+    return parsed
+
+class ModelRouter:
+    """Picks a route for each turn from the ladder and keeps per-route latency and cost"""
+
+    def __init__(self, routes: List[Dict[str, Any]] = None, weak_distance: float = 0.8,
+                 long_question_words: int = 40, intent_score: Callable[[str], float] = None,
+                 intent_threshold: float = 0.5, enabled: bool = True):
+        self.routes = parse_routes(routes or DEFAULT_ROUTES)
+        self.weak_distance = weak_distance
+        self.long_question_words = long_question_words
+        self.intent_score = intent_score
+        self.intent_threshold = intent_threshold
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {route.name: {"requests": 0, "completed": 0, "seconds": 0.0, "prompt_tokens": 0,
+                                    "completion_tokens": 0, "cost_usd": 0.0} for route in self.routes}
+        self._reasons: Dict[str, int] = {}
+
+    def complexity(self, text: str) -> Optional[str]:
+        """Why a question counts as complex, or None"""
+        if len(text.split()) > self.long_question_words:
+            return "long_question"
+        if text.count("?") >= 2:
+            return "multiple_questions"
+        if COMPLEX_QUESTION_RE.search(text.lower()):
+            return "complex_question"
+        return None
+
+    def weak_retrieval(self, chunks: List[Dict[str, Any]], skip_reason: Optional[str]) -> Optional[str]:
+        if skip_reason == "no_relevant_chunks":
+            return "no_relevant_chunks"
+        if skip_reason:
+            return None
+        distances = [chunk["distance"] for chunk in chunks if chunk.get("distance") is not None]
+        if distances and min(distances) > self.weak_distance:
+            return "weak_retrieval"
+        return None
+
+    def choose(self, text: str, chunks: List[Dict[str, Any]], skip_reason: Optional[str]) -> Tuple[Route, List[str]]:
+        """(route, reasons) for a turn, given its retrieved chunks and why retrieval was skipped (if it was)"""
+        complex_reason = self.complexity(text or "")
+        escalations = []
+        if not complex_reason and skip_reason == "small_talk":
+            reasons = ["small_talk"]
+        elif not complex_reason and self.intent_score and self.intent_score(text) >= self.intent_threshold:
+            reasons = ["guided_flow_topic"]
+        else:
+            escalations = [reason for reason in (self.weak_retrieval(chunks, skip_reason), complex_reason) if reason]
+            reasons = escalations
+        # One rung up per reason to escalate
+        route = self.routes[min(len(escalations), len(self.routes) - 1)]
+        with self._lock:
+            self._stats[route.name]["requests"] += 1
+            for reason in reasons or ["simple"]:
+                self._reasons[reason] = self._reasons.get(reason, 0) + 1
+        metrics.ROUTE_REQUESTS.inc(route=route.name, reason="+".join(reasons) or "simple")
+        return route, reasons
+
+    def cost(self, route: Route, prompt_tokens: int, completion_tokens: int) -> float:
+        return (prompt_tokens * route.input_cost_per_1k + completion_tokens * route.output_cost_per_1k) / 1000
+
+    def record(self, route: Route, seconds: float, prompt_tokens: int, completion_tokens: int,
+               shared: bool = False) -> None:
+        """Latency and estimated cost of a completed turn (no cost when the call was shared with another turn)"""
+        cost = 0.0 if shared else self.cost(route, prompt_tokens, completion_tokens)
+        with self._lock:
+            stats = self._stats[route.name]
+            stats["completed"] += 1
+            stats["seconds"] += seconds
+            if not shared:
+                stats["prompt_tokens"] += prompt_tokens
+                stats["completion_tokens"] += completion_tokens
+                stats["cost_usd"] += cost
+        metrics.ROUTE_SECONDS.observe(seconds, route=route.name, model=route.model)
+        metrics.ROUTE_COST.inc(cost, route=route.name, model=route.model)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = []
+            for route in self.routes:
+                stats = dict(self._stats[route.name])
+                stats["mean_seconds"] = round(stats["seconds"] / stats["completed"], 4) if stats["completed"] else None
+                stats["cost_usd"] = round(stats["cost_usd"], 6)
+                stats["seconds"] = round(stats["seconds"], 3)
+                routes.append(dict(route._asdict(), **stats))
+            reasons = dict(self._reasons)
+        return {"enabled": self.enabled, "weak_distance": self.weak_distance,
+                "long_question_words": self.long_question_words, "intent_threshold": self.intent_threshold,
+                "routes": routes, "reasons": reasons}
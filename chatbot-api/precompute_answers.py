@@ -0,0 +1,32 @@
+"""
+Offline job that (re)generates the precomputed answers in faq_intents.json.
+
+Answers every intent whose stored answer is missing or was built from older documents,
+for each collection with documents (or the ones given), using the same settings as the
+API (.env):
+
+    python precompute_answers.py
+    python precompute_answers.py --collection student --force
+"""
+import argparse
+import json
+
+from rag_backend import answer_precomputer, get_collection
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", action="append", help="Collection to build (repeatable; default all)")
+    parser.add_argument("--force", action="store_true", help="Regenerate answers that are still current too")
+    args = parser.parse_args()
+
+    collections = None
+    if args.collection:
+        managers = [get_collection(name) for name in args.collection]
+        unknown = [name for name, manager in zip(args.collection, managers) if manager is None]
+        if unknown:
+            parser.error(f"Unknown collection(s): {', '.join(unknown)}")
+        collections = [manager.collection_name for manager in managers]
+    print(json.dumps(answer_precomputer.run(collections, force=args.force), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Precomputed answers for the guided-flow topics and frequent questions.
+
+The intents file (faq_intents.json) lists the questions the chat UI's guided flow leads
+to and the most frequent free-text questions, each with a few phrasings. An offline job
+(precompute_answers.py, or a background rebuild after documents change) answers every
+intent against each collection through the normal RAG pipeline and stores the answers
+in SQLite with a fingerprint of the collection's documents. At request time
+IntentMatcher maps a user message to an intent by word overlap, and a stored answer is
+served only while it matches the collection's current documents.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bm25_index import tokenize
+from metrics import CACHE_REQUESTS
+
+# Words that do not change what a question is about
+FILLER_WORDS = frozenset("""
+a an the please pls kindly can could would will shall you u me i my we our us to is are am be do does did
+for of on in at with through about tell know want like just also hi hello hey there
+""".split())
+
+def intent_terms(text: str) -> frozenset:
+    """Content words of a question, with plurals folded ("internships" -> "internship")"""
+    terms = set()
+    for term in tokenize(text):
+        if term in FILLER_WORDS:
+            continue
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.add(term)
+    return frozenset(terms)
+
+def load_intents(path: str) -> List[Dict[str, Any]]:
+    """Intents from a JSON file: [{"id", "question", "examples": [...], "collections": [...]}]"""
+    with open(path, "r", encoding="utf-8") as f:
+        intents = json.load(f)
+    seen = set()
+    for intent in intents:
+        if not isinstance(intent.get("id"), str) or not isinstance(intent.get("question"), str):
+            raise ValueError(f"Every intent in {path} needs a string id and question")
+        if intent["id"] in seen:
+            raise ValueError(f"Duplicate intent id '{intent['id']}' in {path}")
+        seen.add(intent["id"])
+    return intents
+
+class IntentMatcher:
+    """Maps a message to the intent with the most similar phrasing.
+
+    Each phrasing (the question and its examples) is reduced to its content words; a
+    message matches when the Dice overlap of its words with some phrasing reaches the
+    threshold. Candidates come from an inverted index over the words, so a lookup
+    touches only phrasings that share a word with the message.
+    """
+
+    def __init__(self, intents: List[Dict[str, Any]], threshold: float = 0.8):
+        self.intents = {intent["id"]: intent for intent in intents}
+        self.threshold = threshold
+        self._phrasings: List[Tuple[str, frozenset]] = []
+        self._postings: Dict[str, List[int]] = {}
+        for intent in intents:
+            for text in [intent["question"]] + list(intent.get("examples", [])):
+                terms = intent_terms(text)
+                if not terms:
+                    continue
+                for term in terms:
+                    self._postings.setdefault(term, []).append(len(self._phrasings))
+                self._phrasings.append((intent["id"], terms))
+
+    def applies_to(self, intent_id: str, collection: str) -> bool:
+        collections = self.intents[intent_id].get("collections")
+        return not collections or collection in collections
+
+    def match(self, text: str, collection: str = None) -> Tuple[Optional[str], float]:
+        """(intent id, score) of the best match at or above the threshold, else (None, best score)"""
+        terms = intent_terms(text)
+        if not terms:
+            return None, 0.0
+        shared = Counter(index for term in terms for index in self._postings.get(term, ()))
+        best_id, best_score = None, 0.0
+        for index, overlap in shared.items():
+            intent_id, phrasing = self._phrasings[index]
+            if collection is not None and not self.applies_to(intent_id, collection):
+                continue
+            score = 2 * overlap / (len(terms) + len(phrasing))
+            if score > best_score:
+                best_id, best_score = intent_id, score
+        if best_score < self.threshold:
+            return None, best_score
+        return best_id, best_score
+
+class PrecomputedAnswers:
+    """SQLite store of generated answers per (collection, intent), checked against the current documents.
+
+    fingerprint(collection) identifies a collection's documents; it is computed on first
+    use and again after invalidate(collection), so answers generated before a document
+    change stop being served until they are rebuilt.
+    """
+
+    def __init__(self, path: str, matcher: IntentMatcher, fingerprint: Callable[[str], str], enabled: bool = True):
+        self.path = path
+        self.matcher = matcher
+        self.fingerprint = fingerprint
+        self.enabled = enabled
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS precomputed_answers (
+                    collection TEXT NOT NULL,
+                    intent_id TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    chunk_ids TEXT NOT NULL,
+                    model TEXT,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (collection, intent_id)
+                )
+            """)
+            self._conn.commit()
+
+    def current_fingerprint(self, collection: str) -> str:
+        with self._lock:
+            fingerprint = self._fingerprints.get(collection)
+        if fingerprint is None:
+            fingerprint = self.fingerprint(collection)
+            with self._lock:
+                self._fingerprints[collection] = fingerprint
+        return fingerprint
+
+    def invalidate(self, collection: str = None) -> None:
+        """Forget the known fingerprint of a collection (all when None) after its documents change"""
+        with self._lock:
+            if collection is None:
+                self._fingerprints.clear()
+            else:
+                self._fingerprints.pop(collection, None)
+
+    def lookup(self, text: str, collection: str) -> Optional[Dict[str, Any]]:
+        """The stored answer for the intent a message matches, if it is up to date"""
+        if not self.enabled or not text:
+            return None
+        intent_id, score = self.matcher.match(text, collection)
+        result = "miss"
+        answer = None
+        if intent_id is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT fingerprint, answer, created_at FROM precomputed_answers WHERE collection = ? AND intent_id = ?",
+                    (collection, intent_id)).fetchone()
+            if row and row[0] == self.current_fingerprint(collection):
+                result = "hit"
+                answer = {"intent": intent_id, "score": round(score, 3), "answer": row[1], "created_at": row[2]}
+            elif row:
+                result = "stale"
+        with self._lock:
+            self._stats[{"hit": "hits", "miss": "misses", "stale": "stale"}[result]] += 1
+        CACHE_REQUESTS.inc(cache="precomputed", result=result)
+        return answer
+
+    def store(self, collection: str, intent_id: str, fingerprint: str, answer: str, chunk_ids: List[str],
+              model: str = None) -> None:
+        question = self.matcher.intents[intent_id]["question"]
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO precomputed_answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                               (collection, intent_id, fingerprint, question, answer, json.dumps(chunk_ids), model,
+                                time.time()))
+            self._conn.commit()
+
+    def outdated(self, collection: str) -> List[str]:
+        """Intents of a collection without an answer for its current documents"""
+        fingerprint = self.current_fingerprint(collection)
+        with self._lock:
+            current = {row[0] for row in self._conn.execute(
+                "SELECT intent_id FROM precomputed_answers WHERE collection = ? AND fingerprint = ?",
+                (collection, fingerprint))}
+        return [intent_id for intent_id in self.matcher.intents
+                if intent_id not in current and self.matcher.applies_to(intent_id, collection)]
+
+    def answers(self, collection: str) -> List[Dict[str, Any]]:
+        fingerprint = self.current_fingerprint(collection)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT intent_id, question, answer, chunk_ids, model, created_at, fingerprint "
+                "FROM precomputed_answers WHERE collection = ? ORDER BY intent_id", (collection,)).fetchall()
+        return [{"intent": intent_id, "question": question, "answer": answer, "chunk_ids": json.loads(chunk_ids),
+                 "model": model, "created_at": created_at, "current": stored == fingerprint}
+                for intent_id, question, answer, chunk_ids, model, created_at, stored in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["stored"] = self._conn.execute("SELECT COUNT(*) FROM precomputed_answers").fetchone()[0]
+        stats["enabled"] = self.enabled
+        stats["intents"] = len(self.matcher.intents)
+        stats["match_threshold"] = self.matcher.threshold
+        return stats
+
+class AnswerPrecomputer:
+    """Generates the missing or outdated answers, on demand or shortly after documents change.
+
+    generate(question, collection) returns (answer, chunk ids) or (None, []) when the
+    collection has nothing relevant, in which case the intent is left to the live
+    pipeline. Rebuilds run one at a time on a background thread; changes that arrive
+    within delay_seconds of each other share one rebuild.
+    """
+
+    def __init__(self, answers: PrecomputedAnswers, generate: Callable[[str, str], Tuple[Optional[str], List[str]]],
+                 collections: Callable[[], List[str]], model: str = None, delay_seconds: float = 60):
+        self.answers = answers
+        self.generate = generate
+        self.collections = collections
+        self.model = model
+        self.delay_seconds = delay_seconds
+        self._run_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._pending: set = set()
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def run(self, collections: List[str] = None, force: bool = False) -> Dict[str, Any]:
+        """Answer the outdated intents (all intents with force) of the given collections (default all)"""
+        with self._run_lock:
+            started = time.time()
+            summary = {"generated": 0, "skipped": 0, "failed": 0, "errors": []}
+            for collection in collections or self.collections():
+                fingerprint = self.answers.current_fingerprint(collection)
+                intent_ids = ([intent_id for intent_id in self.answers.matcher.intents
+                               if self.answers.matcher.applies_to(intent_id, collection)]
+                              if force else self.answers.outdated(collection))
+                for intent_id in intent_ids:
+                    question = self.answers.matcher.intents[intent_id]["question"]
+                    try:
+                        answer, chunk_ids = self.generate(question, collection)
+                    except Exception as e:
+                        summary["failed"] += 1
+                        summary["errors"].append({"collection": collection, "intent": intent_id, "error": str(e)})
+                        continue
+                    if not answer:
+                        summary["skipped"] += 1
+                        continue
+                    # Stored against the fingerprint taken before generation, so a document
+                    # change during the run leaves the answer outdated rather than wrongly current
+                    self.answers.store(collection, intent_id, fingerprint, answer, chunk_ids, self.model)
+                    summary["generated"] += 1
+            summary["seconds"] = round(time.time() - started, 3)
+            summary["finished_at"] = time.time()
+            self.last_run = summary
+            return summary
+
+    def schedule(self, collection: str = None) -> None:
+        """Rebuild a collection's answers (all collections when None) after the delay"""
+        with self._lock:
+            self._pending.add(collection)
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay_seconds, self._run_pending)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run_pending(self) -> None:
+        with self._lock:
+            pending, self._pending, self._timer = self._pending, set(), None
+        self.run(None if None in pending else sorted(pending))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            scheduled = self._timer is not None
+        return {"running": self._run_lock.locked(), "scheduled": scheduled, "delay_seconds": self.delay_seconds,
+                "last_run": self.last_run}
@@ -1,27 +1,53 @@
-from flask import Flask, request, jsonify
+import time
+# Start of the import, for the startup report
+IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import os
 import json
+import math
+import atexit
 import logging
 import sys
 import io
+import shutil
+import tempfile
+import threading
 import traceback
 import uuid
+from collections import OrderedDict
 from datetime import datetime
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI, OpenAIError
 import pymysql
 from pymysql.cursors import DictCursor
 
 # Import ChromaDBManager from local file
-from chromadb_manager import ChromaDBManager
+from chromadb_manager import ChromaDBManager, ChromaCollections
+from embeddings import create_embedder
+from extraction import DocumentExtractor, ExtractionCache
+from response_cache import ResponseCache
+from context_assembly import ContextAssembler
+from conversation_store import ConversationStore, SessionMissing
+from llm_gateway import GatewayOverloaded, LLMGateway
+from model_router import ModelRouter
+from precomputed_answers import AnswerPrecomputer, IntentMatcher, PrecomputedAnswers, load_intents
+from relevance_gate import RelevanceGate
+from db_pool import ConnectionPool, PoolTimeout
+from write_behind import WriteBehindBuffer
+from ingestion import IngestionJobManager, expand_uploads, ingest_files
+import metrics
+import startup
+from metrics import timed
 
 # Load environment variables
 load_dotenv()
 
 # Configure logging
 logging.basicConfig(
-    level=logging.WARNING,  # Changed from INFO to WARNING for production
+    # WARNING by default for production; LOG_LEVEL=INFO shows per-request retrieval and prompt details
+    level=getattr(logging, os.getenv('LOG_LEVEL', 'WARNING').upper(), logging.WARNING),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger("flexwork-chatbot-api")
@@ -39,6 +65,42 @@ CORS(app, resources={
     }
 })
 
+# Server-Timing breakdowns are added for every request when enabled, or when the client
+# sends an "X-Server-Timing: 1" request header
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+
+def server_timing_requested(headers):
+    return SERVER_TIMING_ENABLED or headers.get("X-Server-Timing", "").lower() in ("1", "true")
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.request_timings = metrics.start_request_timings() if server_timing_requested(request.headers) else None
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.get("request_started", time.perf_counter())
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.HTTP_REQUEST_SECONDS.observe(elapsed, route=route, method=request.method)
+    metrics.HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    if response.status_code >= 500:
+        metrics.HTTP_ERRORS.inc(route=route)
+    timings = g.get("request_timings")
+    if timings is not None:
+        # Streamed responses report the stages up to the first byte
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings, total=elapsed)
+        response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
+@app.teardown_request
+def stop_request_metrics(exc):
+    metrics.stop_request_timings()
+
+@app.route("/cb/api/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Stage timings, request, token and cache counters in Prometheus text format"""
+    return Response(metrics.registry.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
 @app.route("/cb/api/test", methods=["GET"])
 def test_connection():
     """Simple endpoint to test if the backend is accessible"""
@@ -50,10 +112,233 @@ def test_connection():
 
 # OpenAI API configuration
 API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=API_KEY)
+# Optional override so the API can be pointed at any OpenAI-compatible server (e.g. a local fake)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# All completion calls go through the gateway: identical in-flight requests share one
+# call, at most LLM_MAX_CONCURRENCY run at once and LLM_MAX_QUEUE more may wait (for up
+# to LLM_QUEUE_TIMEOUT_SECONDS) before requests are turned away with a 503. Its clients
+# are created on the first call; retries are done by the gateway, with backoff shared
+# across requests
+LLM_GATEWAY_OPTIONS = dict(
+    max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '16')),
+    max_queue=int(os.getenv('LLM_MAX_QUEUE', '64')),
+    queue_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT_SECONDS', '30')),
+    max_retries=int(os.getenv('LLM_MAX_RETRIES', '3')),
+    backoff_base=float(os.getenv('LLM_BACKOFF_BASE_SECONDS', '0.5')),
+    backoff_max=float(os.getenv('LLM_BACKOFF_MAX_SECONDS', '8')),
+    coalesce=os.getenv('LLM_COALESCE_ENABLED', 'true').lower() == 'true'
+)
+llm_gateway = LLMGateway(
+    client_factory=lambda: OpenAI(api_key=API_KEY, base_url=OPENAI_BASE_URL, max_retries=0),
+    async_client_factory=lambda: AsyncOpenAI(api_key=API_KEY, base_url=OPENAI_BASE_URL, max_retries=0),
+    **LLM_GATEWAY_OPTIONS
+)
+
+CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH', './chroma_db')
+INGEST_EMBED_WORKERS = int(os.getenv('INGEST_EMBED_WORKERS', '2'))
+
+# Local CPU embedding model with a persistent (model, text hash) cache; EMBEDDING_CACHE_PATH="" disables the cache
+embedder = create_embedder(
+    backend=os.getenv('EMBEDDING_BACKEND', 'onnx'),
+    model=os.getenv('EMBEDDING_MODEL') or None,
+    model_dir=os.getenv('EMBEDDING_MODEL_DIR') or None,
+    # By default split the cores between the parallel ingestion embedding workers
+    threads=int(os.getenv('EMBEDDING_THREADS', '0')) or max(1, (os.cpu_count() or 1) // INGEST_EMBED_WORKERS),
+    batch_size=int(os.getenv('EMBEDDING_BATCH_SIZE', '32')),
+    cache_path=os.getenv('EMBEDDING_CACHE_PATH', os.path.join(CHROMA_DB_PATH, 'embedding_cache.sqlite3')) or None,
+    cache_max_entries=int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', '0')),
+    allow_download=os.getenv('EMBEDDING_ALLOW_DOWNLOAD', 'true').lower() == 'true'
+)
+
+# PDF/DOCX extraction on a process pool (EXTRACTION_PROCESSES=0 extracts in the request
+# thread), with results cached by file hash; EXTRACTION_CACHE_PATH="" disables the cache.
+# The workers are started by warm_up() or the first upload
+extraction_cache_path = os.getenv('EXTRACTION_CACHE_PATH', os.path.join(CHROMA_DB_PATH, 'extraction_cache.sqlite3'))
+document_extractor = DocumentExtractor(
+    processes=int(os.getenv('EXTRACTION_PROCESSES', '2')),
+    pages_per_task=int(os.getenv('EXTRACTION_PAGES_PER_TASK', '8')),
+    max_pages=int(os.getenv('EXTRACTION_MAX_PAGES', '2000')),
+    timeout_seconds=float(os.getenv('EXTRACTION_TIMEOUT_SECONDS', '300')),
+    cache=ExtractionCache(extraction_cache_path, max_entries=int(os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', '500')))
+    if extraction_cache_path else None
+)
+atexit.register(document_extractor.shutdown)
+
+# Named ChromaDB collections (e.g. per audience); requests pick one with "collection",
+# and everything without one uses the default collection. Each is opened (and its
+# keyword index loaded) on first use or by warm_up()
+chroma_collections = ChromaCollections(
+    persist_path=CHROMA_DB_PATH,
+    default_collection=os.getenv('VECTOR_DB_DEFAULT_COLLECTION', 'documents'),
+    # How long a collection found missing is not looked up again (created here ends it early)
+    missing_ttl=float(os.getenv('COLLECTION_MISSING_TTL_SECONDS', '30')),
+    embed_batch_size=int(os.getenv('INGEST_EMBED_BATCH_SIZE', '64')),
+    embed_workers=INGEST_EMBED_WORKERS,
+    embedder=embedder,
+    hybrid_search=os.getenv('HYBRID_SEARCH_ENABLED', 'true').lower() == 'true',
+    # Default chunk size and overlap in characters; uploads can override them
+    chunk_size=int(os.getenv('CHUNK_SIZE', '1000')),
+    chunk_overlap=int(os.getenv('CHUNK_OVERLAP', '100')),
+    # CSV uploads are parsed this many rows at a time to bound memory
+    csv_row_group_size=int(os.getenv('CSV_ROW_GROUP_SIZE', '1000')),
+    extractor=document_extractor
+)
+
+# Chat retrieval goes to the collection of the user's type (as saved through
+# /cb/api/user-selections) when that collection has documents
+USER_TYPE_COLLECTIONS = json.loads(os.getenv('USER_TYPE_COLLECTIONS', json.dumps({
+    "Employer": "employer",
+    "Student/Fresher/Upskill": "student",
+    "Freelancer": "freelancer"
+})))
+
+def get_collection(name, create=False):
+    """Manager for a named collection (default when empty), or None if it is unknown or invalid"""
+    if not name or name == chroma_collections.default_name:
+        # The default collection is created on first use, like the baseline did at startup
+        return chroma_collections.default
+    try:
+        return chroma_collections.get(name, create=create)
+    except (KeyError, ValueError):
+        return None
+
+def unknown_collection(name):
+    return jsonify({"error": f"Unknown or invalid collection '{name}'"}), 404
+
+def parse_chunking_options(values, manager):
+    """chunk_size/chunk_overlap overrides from upload form fields; raises ValueError if invalid"""
+    chunking = {}
+    for field in ("chunk_size", "chunk_overlap"):
+        if values.get(field):
+            try:
+                chunking[field] = int(values[field])
+            except ValueError:
+                raise ValueError(f"{field} must be an integer")
+    manager.chunker(**chunking)
+    return chunking
+
+# Response cache in front of the chat completion call
+response_cache = ResponseCache(
+    max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000')),
+    ttl_seconds=float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '3600')),
+    similarity_threshold=float(os.getenv('RESPONSE_CACHE_SIMILARITY_THRESHOLD', '0.95')),
+    enabled=os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+)
+
+# Prompt token budgets: retrieved chunks and history are fitted into PROMPT_TOKEN_BUDGET
+# tokens (or a per-model value from the PROMPT_TOKEN_BUDGETS JSON object)
+context_assembler = ContextAssembler(
+    default_budget=int(os.getenv('PROMPT_TOKEN_BUDGET', '3000')),
+    model_budgets=json.loads(os.getenv('PROMPT_TOKEN_BUDGETS', '{}')),
+    context_max_tokens=int(os.getenv('RAG_CONTEXT_MAX_TOKENS', '1500')),
+    turn_max_tokens=int(os.getenv('HISTORY_TURN_MAX_TOKENS', '400')),
+    summary_max_tokens=int(os.getenv('HISTORY_SUMMARY_MAX_TOKENS', '200'))
+)
+# Server-side history for clients that send a sessionId and only the new "message";
+# CONVERSATION_STORE_PATH adds a SQLite write-through store ("" keeps it in memory only)
+conversation_store = ConversationStore(
+    max_sessions=int(os.getenv('CONVERSATION_MAX_SESSIONS', '10000')),
+    max_turns=int(os.getenv('CONVERSATION_MAX_TURNS', '20')),
+    summary_max_chars=int(os.getenv('CONVERSATION_SUMMARY_MAX_CHARS', '2000')),
+    ttl_seconds=float(os.getenv('CONVERSATION_TTL_SECONDS', '86400')),
+    path=os.getenv('CONVERSATION_STORE_PATH') or None
+)
+
+# Candidate chunks retrieved per turn; the assembler keeps the best ones that fit
+RAG_MAX_CHUNKS = int(os.getenv('RAG_MAX_CHUNKS', '6'))
+
+# Skip retrieval for small talk and drop chunks beyond a (squared L2) distance cutoff
+# or too far behind the best match
+relevance_gate = RelevanceGate(
+    max_distance=float(os.getenv('RAG_MAX_DISTANCE', '1.3')),
+    distance_margin=float(os.getenv('RAG_DISTANCE_MARGIN', '0.3')),
+    enabled=os.getenv('RAG_GATING_ENABLED', 'true').lower() == 'true'
+)
+
+# Precomputed answers for the guided-flow topics and frequent questions (faq_intents.json),
+# generated per collection by precompute_answers.py or a rebuild after documents change
+PRECOMPUTE_MODEL = os.getenv('PRECOMPUTE_MODEL', 'gpt-4.1-nano')
+PRECOMPUTE_AUTO_REBUILD = os.getenv('PRECOMPUTE_AUTO_REBUILD', 'true').lower() == 'true'
+PRECOMPUTE_SYSTEM_PROMPT = os.getenv('PRECOMPUTE_SYSTEM_PROMPT') or (
+    "You are Arth-AI, an expert assistant exclusively for Flexwork, a platform that connects freelancers, "
+    "employers, and students. Only answer questions related to Flexwork's services, features, pricing and "
+    "training programs, using only verified and known information; do not guess, invent, or assume anything. "
+    "Keep answers friendly, professional, and concise, with clear next steps."
+)
+
+def collection_fingerprint(name):
+    manager = get_collection(name)
+    return manager.catalog.fingerprint() if manager is not None else ""
 
-# Initialize ChromaDB manager
-chroma_manager = ChromaDBManager()
+def collections_with_documents():
+    managers = [get_collection(name) for name in chroma_collections.names()]
+    return [manager.collection_name for manager in managers if manager is not None and manager.catalog.count()]
+
+precomputed_answers = PrecomputedAnswers(
+    path=os.getenv('PRECOMPUTED_ANSWERS_PATH', os.path.join(CHROMA_DB_PATH, 'precomputed_answers.sqlite3')),
+    matcher=IntentMatcher(
+        load_intents(os.getenv('PRECOMPUTED_INTENTS_PATH',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'faq_intents.json'))),
+        threshold=float(os.getenv('PRECOMPUTED_MATCH_THRESHOLD', '0.8'))
+    ),
+    fingerprint=collection_fingerprint,
+    enabled=os.getenv('PRECOMPUTED_ANSWERS_ENABLED', 'true').lower() == 'true'
+)
+answer_precomputer = AnswerPrecomputer(
+    precomputed_answers,
+    generate=lambda question, collection: generate_precomputed_answer(question, collection),
+    collections=collections_with_documents,
+    model=PRECOMPUTE_MODEL,
+    # Uploads arriving close together share one rebuild
+    delay_seconds=float(os.getenv('PRECOMPUTE_REBUILD_DELAY_SECONDS', '60'))
+)
+
+# Server-side model routing: turns start on the first (fastest) route of the ladder and
+# move up for weak retrieval or long/complex questions; MODEL_ROUTES is a JSON list of
+# {"name", "model", "max_tokens", "input_cost_per_1k", "output_cost_per_1k", "base_url"}
+model_router = ModelRouter(
+    routes=json.loads(os.getenv('MODEL_ROUTES', '[]')) or None,
+    weak_distance=float(os.getenv('ROUTER_WEAK_DISTANCE', '0.8')),
+    long_question_words=int(os.getenv('ROUTER_LONG_QUESTION_WORDS', '40')),
+    # Questions close to a guided-flow or FAQ intent stay on the fastest route
+    intent_score=lambda text: precomputed_answers.matcher.match(text)[1],
+    intent_threshold=float(os.getenv('ROUTER_INTENT_THRESHOLD', '0.5')),
+    enabled=os.getenv('MODEL_ROUTING_ENABLED', 'true').lower() == 'true'
+)
+# Routes served by another endpoint get their own gateway (and concurrency limit)
+route_gateways = {
+    route.base_url: LLMGateway(
+        client_factory=lambda base_url=route.base_url: OpenAI(api_key=API_KEY, base_url=base_url, max_retries=0),
+        async_client_factory=lambda base_url=route.base_url: AsyncOpenAI(api_key=API_KEY, base_url=base_url,
+                                                                         max_retries=0),
+        name=f"openai_{route.name}", **LLM_GATEWAY_OPTIONS
+    )
+    for route in model_router.routes if route.base_url
+}
+
+def gateway_for(route):
+    return route_gateways[route.base_url] if route is not None and route.base_url else llm_gateway
+
+def documents_changed(collection=None):
+    """Drop answers built from a collection's old contents (all collections when None)"""
+    response_cache.invalidate()
+    precomputed_answers.invalidate(collection)
+    if PRECOMPUTE_AUTO_REBUILD and precomputed_answers.enabled:
+        answer_precomputer.schedule(collection)
+
+# Background document ingestion; cached answers are stale once a job lands
+ingestion_jobs = IngestionJobManager(
+    lambda: chroma_collections.default,
+    max_workers=int(os.getenv('INGEST_JOB_WORKERS', '2')),
+    on_success=lambda job: documents_changed(job["collection"])
+)
+
+# Bulk upload limits and parallelism
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', '5000'))
+BULK_UPLOAD_MAX_FILE_BYTES = int(os.getenv('BULK_UPLOAD_MAX_FILE_MB', '200')) * 1024 * 1024
+BULK_UPLOAD_WORKERS = int(os.getenv('BULK_UPLOAD_WORKERS', '4'))
+BULK_UPLOAD_WRITE_BATCH = int(os.getenv('BULK_UPLOAD_WRITE_BATCH', '1024'))
 
 # Database connection configuration
 DB_CONFIG = {
@@ -68,16 +353,60 @@ DB_CONFIG = {
     'write_timeout': 10
 }
 
+def create_db_connection():
+    """Open a new MySQL connection (used by the connection pool)"""
+    return pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=DictCursor
+    )
+
+# Bounded connection pool shared by all request threads
+db_pool = ConnectionPool(
+    create_db_connection,
+    min_size=int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+    max_size=int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    timeout=float(os.getenv('DB_POOL_TIMEOUT', '5')),
+    recycle_seconds=float(os.getenv('DB_POOL_RECYCLE_SECONDS', '3600')),
+    validate_after=float(os.getenv('DB_POOL_VALIDATE_AFTER', '30'))
+)
+
+# The tables are created (and the pool prefilled) on first use or by warm_up() rather
+# than at import, so a worker starts without waiting on MySQL; after a failure this is
+# retried at most every DB_INIT_RETRY_SECONDS
+DB_INIT_RETRY_SECONDS = float(os.getenv('DB_INIT_RETRY_SECONDS', '30'))
+database_ready = False
+database_retry_at = 0.0
+database_lock = threading.Lock()
+
+def ensure_database():
+    """Initialize the database once; returns whether it is initialized"""
+    global database_ready, database_retry_at
+    if database_ready or time.monotonic() < database_retry_at:
+        return database_ready
+    with database_lock:
+        if not database_ready and time.monotonic() >= database_retry_at:
+            try:
+                with startup.initializing("mysql"):
+                    if not init_database():
+                        raise RuntimeError("Database initialization failed")
+                database_ready = True
+            except RuntimeError:
+                database_retry_at = time.monotonic() + DB_INIT_RETRY_SECONDS
+                logger.warning("Database initialization failed - some features may not work")
+    return database_ready
+
 # Database connection function
 def get_db_connection():
+    """Check out a pooled connection (initializing the database first if needed); close() returns it to the pool"""
+    ensure_database()
+    return checkout_db_connection()
+
+def checkout_db_connection():
     try:
-        connection = pymysql.connect(
-            **DB_CONFIG,
-            cursorclass=DictCursor
-        )
-        # Test the connection
-        connection.ping(reconnect=True)
-        return connection
+        return db_pool.get()
+    except PoolTimeout as e:
+        logger.error(f"Database pool exhausted: {e}")
+        return None
     except pymysql.Error as e:
         logger.error(f"MySQL error: {e}")
         return None
@@ -89,7 +418,9 @@ def get_db_connection():
 def init_database():
     """Initialize database and create tables if they don't exist"""
     try:
-        conn = get_db_connection()
+        # Open the minimum number of pooled connections up front
+        db_pool.prefill()
+        conn = checkout_db_connection()
         if not conn:
             logger.error("Cannot initialize database - connection failed")
             return False
@@ -140,10 +471,6 @@ def init_database():
         logger.error(f"Database initialization error: {e}")
         return False
 
-# Initialize database on startup
-if not init_database():
-    logger.warning("Database initialization failed - some features may not work")
-    
 @app.route("/cb/api/health", methods=["GET"])
 def health_check():
     try:
@@ -161,17 +488,16 @@ def health_check():
         else:
             health_status["services"]["database"] = "unhealthy"
             health_status["status"] = "degraded"
+        health_status["database_pool"] = db_pool.stats()
+        if selection_writer:
+            health_status["write_behind"] = selection_writer.stats()
         
-        # Check ChromaDB
-        if chroma_manager and chroma_manager.collection:
-            try:
-                chroma_manager.collection.count()
-                health_status["services"]["chromadb"] = "healthy"
-            except Exception as e:
-                health_status["services"]["chromadb"] = f"unhealthy: {str(e)}"
-                health_status["status"] = "degraded"
-        else:
-            health_status["services"]["chromadb"] = "not initialized"
+        # Check ChromaDB (this opens the default collection if nothing has yet)
+        try:
+            chroma_collections.default.collection.count()
+            health_status["services"]["chromadb"] = "healthy"
+        except Exception as e:
+            health_status["services"]["chromadb"] = f"unhealthy: {str(e)}"
             health_status["status"] = "degraded"
         
         # Check OpenAI API key
@@ -192,76 +518,353 @@ def health_check():
             "timestamp": datetime.now().isoformat()
         }), 500
 
+def get_latest_user_message(messages):
+    """Return the content of the most recent user message, or an empty string"""
+    for msg in reversed(messages):
+        if msg.get("role") == "user":
+            return msg.get("content", "")
+    return ""
+
+def build_augmented_messages(messages, use_rag=True, model_name="gpt-4.1-nano", manager=None,
+                             summary="", context_last=False, router=None):
+    """Run the RAG lookup for the latest user turn and fit context and history into the prompt budget.
+    
+    Retrieval searches manager's collection (the default collection if not given).
+    summary and context_last are passed to the context assembler (see ContextAssembler.assemble). Returns
+    (augmented_messages, context, retrieval) where retrieval carries the ids of the chunks
+    used and the query embedding, both of which feed the response cache, and the token
+    report from the context assembler. With a router, the model is chosen from the
+    retrieval results (before the prompt is fitted to its budget) and retrieval["route"]
+    holds the route.
+    """
+    manager = manager or chroma_collections.default
+    # Extract the latest user message for RAG context retrieval
+    latest_user_message = get_latest_user_message(messages)
+    retrieval = {"chunk_ids": [], "query_embedding": None, "token_usage": None, "route": None}
+    
+    # Embed the user turn once; the vector query and the semantic cache share it
+    if latest_user_message and (use_rag or response_cache.enabled):
+        try:
+            retrieval["query_embedding"] = manager.embed_texts([latest_user_message])[0]
+        except Exception as e:
+            logger.warning(f"Error embedding user message: {e}")
+    
+    # Get candidate chunks from ChromaDB if RAG is enabled and the turn needs it
+    chunks = []
+    skip_reason = relevance_gate.needs_retrieval(latest_user_message, known_term=manager.keyword_index.has_term) \
+        if use_rag and latest_user_message else "disabled"
+    if not skip_reason:
+        try:
+            search_results = manager.search_documents(
+                query=latest_user_message,
+                n_results=RAG_MAX_CHUNKS,
+                query_embedding=retrieval["query_embedding"]
+            )
+            ids = search_results.get("ids", [])
+            chunks = relevance_gate.filter([
+                {"id": chunk_id, "text": document, "metadata": metadata, "distance": distance,
+                 "keyword_rank": keyword_rank}
+                for chunk_id, document, metadata, distance, keyword_rank in zip(
+                    ids,
+                    search_results.get("documents", []),
+                    search_results.get("metadatas", []),
+                    search_results.get("distances", []),
+                    search_results.get("keyword_ranks") or [None] * len(ids)
+                )
+            ])
+            if not chunks:
+                skip_reason = "no_relevant_chunks"
+        except Exception as e:
+            logger.warning(f"Error retrieving RAG context: {e}")
+            # Continue without RAG if there's an error
+    
+    route_reasons = None
+    if router is not None:
+        retrieval["route"], route_reasons = router.choose(latest_user_message, chunks, skip_reason)
+        model_name = retrieval["route"].model
+    
+    # Best chunks and newest turns first, within the model's prompt token budget
+    with timed("prompt_assembly"):
+        augmented_messages, context, chunk_ids, token_usage = context_assembler.assemble(
+            messages, chunks, model_name, summary=summary, context_last=context_last)
+    token_usage["retrieval"] = skip_reason or "retrieved"
+    token_usage["collection"] = manager.collection_name
+    if retrieval["route"] is not None:
+        token_usage.update(route=retrieval["route"].name, model=model_name, route_reasons=route_reasons)
+    metrics.RETRIEVAL_DECISIONS.inc(decision=token_usage["retrieval"])
+    retrieval["chunk_ids"] = chunk_ids
+    retrieval["token_usage"] = token_usage
+    if context:
+        logger.info(f"Retrieved {len(chunk_ids)} context documents for RAG")
+    logger.info(f"Prompt assembled with {token_usage['prompt_tokens']}/{token_usage['budget']} tokens "
+                f"({token_usage['context_tokens']} context, {token_usage['history_tokens']} history)")
+    
+    return augmented_messages, context, retrieval
+
+def format_sse(data, event=None):
+    """Format a JSON-serialisable payload as a Server-Sent Events frame"""
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data)}\n\n"
+
+def stream_chat_completion(completion, on_complete=None, done=None):
+    """Forward streamed completion deltas to the client as SSE frames; done is added to the final frame"""
+    started = time.perf_counter()
+    try:
+        parts = []
+        for chunk in completion:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield format_sse({"content": delta})
+        if on_complete:
+            on_complete("".join(parts))
+        yield format_sse({"done": True, **(done or {})}, event="done")
+    except Exception as e:
+        logger.error(f"Error while streaming chat completion: {e}")
+        yield format_sse({"error": str(e)}, event="error")
+    finally:
+        metrics.observe_stage("llm_stream", time.perf_counter() - started)
+        close = getattr(completion, "close", None)
+        if close:
+            close()
+
+def sse_response(frames):
+    """Wrap an iterator of SSE frames in a streaming response"""
+    return Response(
+        stream_with_context(frames),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
+        }
+    )
+
 # Groq chat endpoint with RAG integration
 @app.route("/cb/api/groq/chat", methods=["POST"])
 def chat_with_groq():
+    payload = request.json or {}
+    return handle_chat(payload, stream=isinstance(payload, dict) and bool(payload.get("stream", False)))
+
+# Streaming variant of the chat endpoint (Server-Sent Events)
+@app.route("/cb/api/groq/chat/stream", methods=["POST"])
+def chat_with_groq_stream():
+    return handle_chat(request.json or {}, stream=True)
+
+def resolve_chat_collection(payload):
+    """Collection for chat retrieval.
+    
+    An explicit "collection" wins; otherwise the user type ("user_type", or the one saved
+    for "sessionId") selects its audience collection. Falls back to the default
+    collection when the choice is unknown or still empty.
+    """
+    name = payload.get("collection")
+    if not name:
+        user_type = payload.get("user_type") or get_session_user_type(payload.get("sessionId"))
+        name = USER_TYPE_COLLECTIONS.get(user_type)
+    manager = get_collection(name) if name else None
+    if manager is None or not len(manager.keyword_index):
+        if payload.get("collection"):
+            logger.warning(f"Chat collection '{name}' is unknown or empty, using the default collection")
+        return chroma_collections.default
+    return manager
+
+def chat_payload_error(payload):
+    """Validation error for a chat payload, or None.
+    
+    A payload carries either the whole conversation in "messages", or a "sessionId" and
+    only the new user "message" when the server keeps the history. A client that was told
+    its session is missing resends the earlier turns in "history".
+    """
+    if not isinstance(payload, dict):
+        return "JSON body must be an object"
+    if payload.get("messages"):
+        return None
+    if not (isinstance(payload.get("message"), str) and payload["message"].strip()):
+        return "Messages are required"
+    if not payload.get("sessionId"):
+        return "sessionId is required when sending only the new message"
+    history = payload.get("history")
+    if history is not None and not (isinstance(history, list) and all(
+            isinstance(turn, dict) and turn.get("role") in ("user", "assistant") and isinstance(turn.get("content"), str)
+            for turn in history)):
+        return "history must be a list of user and assistant messages"
+    return None
+
+def prepare_chat(payload):
+    """Run retrieval and the response-cache lookup for a validated chat payload.
+    
+    Shared by the Flask views and the ASGI app (asgi_app.py). Returns a plan with the
+    completion request arguments, any cached answer, a callback that caches the
+    generated answer once it is complete, and one that records the turn in the session
+    history (called for cached answers too). A message that matches a precomputed intent
+    skips retrieval and is answered from the precomputed store. A continued session
+    ("continued": true) that the store no longer holds raises SessionMissing unless its
+    "history" is resent.
+    """
+    messages = payload.get("messages")
+    session_id = None
+    summary = ""
+    if not messages:
+        # Server-side history: the stored turns plus the new message
+        session_id = payload["sessionId"]
+        if payload.get("reset"):
+            conversation_store.reset(session_id)
+        state = conversation_store.get(session_id)
+        if not state["updated_at"] and payload.get("history"):
+            state = conversation_store.restore(session_id, payload["history"], payload.get("system"))
+        elif not state["updated_at"] and payload.get("continued"):
+            # Answering without the earlier turns (or the system prompt) would silently lose them
+            raise SessionMissing(f"Conversation {session_id} is not known to this server, resend its history")
+        messages = conversation_store.messages(state, payload["message"], payload.get("system"))
+        summary = state["summary"]
+    use_rag = payload.get("use_rag", True)  # Default to using RAG
+    model_name = payload.get("model_name", "gpt-4.1-nano")
+    temperature = payload.get("temperature", 0.7)
+    max_tokens = payload.get("max_tokens", 1024)
+
+    manager = resolve_chat_collection(payload)
+
+    def record_turn(content):
+        if session_id is not None:
+            conversation_store.record_turn(session_id, payload["message"], content, system=payload.get("system"))
+
+    # Guided-flow topics and frequent questions are answered from the precomputed store
+    precomputed = precomputed_answers.lookup(get_latest_user_message(messages), manager.collection_name) \
+        if use_rag else None
+    if precomputed is not None:
+        logger.info(f"Serving precomputed answer for intent '{precomputed['intent']}'")
+        return {
+            "request": None,
+            "context": "",
+            "token_usage": {"retrieval": "precomputed", "intent": precomputed["intent"],
+                            "match_score": precomputed["score"], "collection": manager.collection_name},
+            "cached_content": precomputed["answer"],
+            "cache_hit": "precomputed",
+            "on_complete": record_turn,
+            "record_turn": record_turn,
+            "gateway": llm_gateway
+        }
+
+    # The RAG lookup always runs before the first token is requested
+    augmented_messages, context, retrieval = build_augmented_messages(
+        messages, use_rag, model_name, manager, summary=summary, context_last=session_id is not None,
+        router=model_router if model_router.enabled else None)
+    route = retrieval["route"]
+    if route is not None:
+        # The route decides the model; the client's max_tokens can only lower its limit
+        model_name = route.model
+        max_tokens = min(max_tokens, route.max_tokens)
+
+    # Serve identical or near-identical questions from the response cache
+    cache_key, cache_bucket = response_cache.make_keys(
+        model_name, temperature, max_tokens, messages, retrieval["chunk_ids"], scope=manager.collection_name
+    )
+    cached_content, cache_hit = response_cache.get(
+        cache_key, cache_bucket, retrieval["query_embedding"]
+    )
+    if cached_content is not None:
+        logger.info(f"Serving chat response from cache ({cache_hit} hit)")
+    if response_cache.enabled:
+        metrics.CACHE_REQUESTS.inc(cache="response", result=cache_hit or "miss")
+    if cached_content is None:
+        metrics.TOKENS.inc(retrieval["token_usage"]["prompt_tokens"], kind="prompt", source="estimate")
+
+    def store_in_cache(content, shared=False):
+        completion_tokens = context_assembler.counter.count(content, model_name)
+        metrics.TOKENS.inc(completion_tokens, kind="completion", source="estimate")
+        response_cache.put(cache_key, cache_bucket, content, retrieval["query_embedding"])
+        record_turn(content)
+        if route is not None:
+            model_router.record(route, time.perf_counter() - llm_started, retrieval["token_usage"]["prompt_tokens"],
+                                completion_tokens, shared=shared)
+
+    # Route latency counts from here, so it includes any wait in the LLM gateway's queue
+    llm_started = time.perf_counter()
+
+    return {
+        "request": {
+            "model": model_name,
+            "messages": augmented_messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        },
+        "context": context,
+        "token_usage": retrieval["token_usage"],
+        "cached_content": cached_content,
+        "cache_hit": cache_hit,
+        "on_complete": store_in_cache,
+        "record_turn": record_turn,
+        "gateway": gateway_for(route)
+    }
+
+def with_api_usage(token_usage, completion):
+    """Add the token counts reported by the API (when present) to the local estimate"""
+    usage = getattr(completion, "usage", None)
+    if not usage:
+        return token_usage
+    metrics.TOKENS.inc(usage.prompt_tokens, kind="prompt", source="api")
+    metrics.TOKENS.inc(usage.completion_tokens, kind="completion", source="api")
+    return dict(token_usage, api_prompt_tokens=usage.prompt_tokens, api_completion_tokens=usage.completion_tokens)
+
+def cached_sse_frames(plan):
+    """SSE frames for a response served from the cache"""
+    return [
+        format_sse({"content": plan["cached_content"], "cached": plan["cache_hit"]}),
+        format_sse({"done": True, "token_usage": plan["token_usage"]}, event="done")
+    ]
+
+def overloaded_response(error):
+    return jsonify({"error": str(error), "status": "overloaded"}), 503, \
+        {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+
+def handle_chat(payload, stream=False):
     try:
-        payload = request.json or {}
-        messages = payload.get("messages")
-        use_rag = payload.get("use_rag", True)  # Default to using RAG
-        model_name = payload.get("model_name", "gpt-4.1-nano")
-        temperature = payload.get("temperature", 0.7)
-        max_tokens = payload.get("max_tokens", 1024)
-        
-        if not messages:
-            return jsonify({"error": "Messages are required"}), 400
-
-        # Extract the latest user message for RAG context retrieval
-        latest_user_message = ""
-        for msg in reversed(messages):
-            if msg.get("role") == "user":
-                latest_user_message = msg.get("content", "")
-                break
-        
-        # Get relevant context from ChromaDB if RAG is enabled
-        context = ""
-        if use_rag and latest_user_message:
-            try:
-                # Search for relevant documents
-                search_results = chroma_manager.search_documents(
-                    query=latest_user_message,
-                    n_results=3  # Retrieve top 3 most relevant chunks
-                )
-                
-                # Format the context from search results
-                if search_results and "documents" in search_results:
-                    context = "\n\nRelevant information from knowledge base:\n"
-                    for i, doc in enumerate(search_results["documents"]):
-                        context += f"Document {i+1}: {doc}\n\n"
-                    
-                    logger.info(f"Retrieved {len(search_results['documents'])} context documents for RAG",context)
-            except Exception as e:
-                logger.warning(f"Error retrieving RAG context: {e}")
-                # Continue without RAG if there's an error
-        
-        # Prepare messages with system instruction and context
-        augmented_messages = messages.copy()
-        
-        # If we have context and the first message is a system message, augment it
-        if context and augmented_messages and augmented_messages[0].get("role") == "system":
-            augmented_messages[0]["content"] = augmented_messages[0]["content"] + context
-        # If we have context but no system message, add one
-        elif context:
-            augmented_messages.insert(0, {
-                "role": "system",
-                "content": f"You are a helpful assistant. Please use the following information to inform your responses when relevant: {context}"
-            })
+        error = chat_payload_error(payload)
+        if error:
+            return jsonify({"error": error}), 400
+
+        plan = prepare_chat(payload)
+        if plan["cached_content"] is not None:
+            plan["record_turn"](plan["cached_content"])
+            if stream:
+                return sse_response(iter(cached_sse_frames(plan)))
+            return {"content": plan["cached_content"], "cached": plan["cache_hit"], "token_usage": plan["token_usage"]}
 
         # Call OpenAI ChatCompletion with augmented messages and user-specified parameters
-        resp = client.chat.completions.create(
-            model=model_name,
-            messages=augmented_messages,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
+        # (for streams this times the wait for the first response)
+        with timed("llm"):
+            if stream:
+                resp, coalesced = plan["gateway"].stream(plan["request"]), False
+            else:
+                resp, coalesced = plan["gateway"].complete(plan["request"])
         
         # Log the completion for debugging
-        logger.info(f"Generated response with{'out' if not context else ''} RAG context")
+        logger.info(f"Generated response with{'out' if not plan['context'] else ''} RAG context")
+        
+        if stream:
+            return sse_response(stream_chat_completion(
+                resp, on_complete=plan["on_complete"], done={"token_usage": plan["token_usage"]}
+            ))
         
-        # The API returns a dict; we can forward it directly
-        return {"content": resp.choices[0].message.content}
+        content = resp.choices[0].message.content
+        plan["on_complete"](content, shared=coalesced)
+        
+        # A completion shared with an identical in-flight request was already counted by that request
+        token_usage = dict(plan["token_usage"], coalesced=True) if coalesced else \
+            with_api_usage(plan["token_usage"], resp)
+        return {"content": content, "token_usage": token_usage}
+
+    except SessionMissing as e:
+        logger.info(str(e))
+        return jsonify({"error": str(e), "status": "session_missing"}), 409
 
-    except OpenAI.error.OpenAIError as oe:
+    except GatewayOverloaded as e:
+        logger.warning(f"LLM gateway overloaded: {e}")
+        return overloaded_response(e)
+
+    except OpenAIError as oe:
         logger.error(f"OpenAI API error: {oe}")
         return jsonify({"error": str(oe)}), 500
 
@@ -269,157 +872,235 @@ def chat_with_groq():
         logger.error(f"Error in chat_with_openai: {e}")
         return jsonify({"error": str(e)}), 500
 
+def generate_precomputed_answer(question, collection):
+    """Answer an intent's question against a collection; (None, []) when nothing relevant is retrieved"""
+    manager = get_collection(collection)
+    if manager is None:
+        return None, []
+    messages = [{"role": "system", "content": PRECOMPUTE_SYSTEM_PROMPT}, {"role": "user", "content": question}]
+    augmented_messages, context, retrieval = build_augmented_messages(messages, True, PRECOMPUTE_MODEL, manager)
+    if not retrieval["chunk_ids"]:
+        return None, []
+    with timed("llm"):
+        resp, _ = llm_gateway.complete({"model": PRECOMPUTE_MODEL, "messages": augmented_messages,
+                                        "temperature": 0.2, "max_tokens": 1024})
+    return resp.choices[0].message.content, retrieval["chunk_ids"]
+
+# Columns written for each user selection record, in statement order
+USER_SELECTION_COLUMNS = [
+    "session_id", "user_type", "name", "email", "phone", "role", "work_mode",
+    "skills", "employer_headcount_consultant", "employer_project_size_consultant",
+    "employer_service", "employer_start_time_consultant", "employer_work_mode_consultant",
+    "student_option", "student_training", "freelancer_category", "chat_transcript"
+]
+
+# Single round trip: insert a new session or update the existing row on the unique session_id.
+# LAST_INSERT_ID(id) makes lastrowid return the existing row id on the update path too.
+UPSERT_USER_SELECTION_QUERY = f"""
+INSERT INTO user_selections (
+    {", ".join(USER_SELECTION_COLUMNS)},
+    verified, created_at
+) VALUES ({", ".join(["%s"] * len(USER_SELECTION_COLUMNS))}, FALSE, NOW())
+ON DUPLICATE KEY UPDATE
+    id = LAST_INSERT_ID(id),
+    {", ".join(f"{column} = VALUES({column})" for column in USER_SELECTION_COLUMNS[1:])},
+    updated_at = NOW()
+"""
+
+def build_user_selection_record(session_id, user_selections):
+    """Map the UI's userSelections payload onto user_selections columns"""
+    # Extract common fields from userSelections
+    name = user_selections.get("name")
+    email = user_selections.get("email")
+    phone = user_selections.get("phone")
+    role = user_selections.get("role")
+    
+    # Determine user type based on role selection
+    user_type = "Student/Fresher/Upskill"  # Default
+    if role == "Employer":
+        user_type = "Employer"
+    elif role == "Freelancer":
+        user_type = "Freelancer"
+    
+    # Extract work mode based on user type
+    work_mode = user_selections.get("work_mode")
+    
+    # Initialize all possible fields with None
+    # Employer fields
+    skills = None
+    employer_headcount_consultant = None
+    employer_project_size_consultant = None
+    employer_service = None
+    employer_start_time_consultant = None
+    employer_work_mode_consultant = None
+    
+    # Student fields
+    student_option = None
+    student_training = None
+    
+    # Freelancer fields
+    freelancer_category = None
+    freelancer_availability = None
+    
+    # Extract fields based on user type
+    if user_type == "Employer":
+        skills = user_selections.get("skills")
+        employer_headcount_consultant = user_selections.get("employer_headcount_consultant")
+        employer_project_size_consultant = user_selections.get("employer_project_size_consultant")
+        employer_service = user_selections.get("employer_service")
+        employer_start_time_consultant = user_selections.get("employer_start_time_consultant")
+        employer_work_mode_consultant = user_selections.get("employer_work_mode_consultant")
+        # If work_mode is not set, use the specific employer work mode
+        if not work_mode:
+            work_mode = (
+                employer_work_mode_consultant or
+                user_selections.get("employer_work_mode_trainer") or
+                user_selections.get("employer_work_mode_panel") or
+                user_selections.get("employer_work_mode_multi")
+            )
+    
+    elif user_type == "Student/Fresher/Upskill":
+        student_option = user_selections.get("student_option")
+        student_training = user_selections.get("student_training")
+        
+    elif user_type == "Freelancer":
+        freelancer_category = user_selections.get("freelancer_category")
+        freelancer_availability = user_selections.get("freelancer_availability")
+        # If work_mode is not set, use freelancer availability
+        if not work_mode:
+            work_mode = freelancer_availability
+    
+    # Create a chat transcript from messages if available
+    chat_transcript = None
+    if 'messages' in user_selections:
+        chat_transcript = json.dumps(user_selections.get('messages'))
+    
+    return {
+        "session_id": session_id,
+        "user_type": user_type,
+        "name": name,
+        "email": email,
+        "phone": phone,
+        "role": role,
+        "work_mode": work_mode,
+        "skills": skills,
+        "employer_headcount_consultant": employer_headcount_consultant,
+        "employer_project_size_consultant": employer_project_size_consultant,
+        "employer_service": employer_service,
+        "employer_start_time_consultant": employer_start_time_consultant,
+        "employer_work_mode_consultant": employer_work_mode_consultant,
+        "student_option": student_option,
+        "student_training": student_training,
+        "freelancer_category": freelancer_category,
+        "chat_transcript": chat_transcript
+    }
+
+def upsert_user_selection(record):
+    """Write a user selection record in one statement; returns the row id"""
+    conn = get_db_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    
+    cursor = conn.cursor()
+    try:
+        with timed("mysql_write"):
+            cursor.execute(
+                UPSERT_USER_SELECTION_QUERY,
+                tuple(record[column] for column in USER_SELECTION_COLUMNS)
+            )
+        return cursor.lastrowid
+    finally:
+        cursor.close()
+        conn.close()
+
+# Optional write-behind: the UI saves after every step of the flow, so repeated saves
+# for the same session inside the window are coalesced into a single write
+USER_SELECTIONS_WRITE_BEHIND_SECONDS = float(os.getenv('USER_SELECTIONS_WRITE_BEHIND_SECONDS', '0'))
+selection_writer = None
+if USER_SELECTIONS_WRITE_BEHIND_SECONDS > 0:
+    selection_writer = WriteBehindBuffer(upsert_user_selection, window_seconds=USER_SELECTIONS_WRITE_BEHIND_SECONDS)
+    atexit.register(selection_writer.stop)
+
+# user_type of recent sessions, so chat retrieval can be routed without a database read
+SESSION_USER_TYPES_MAX = 10000
+session_user_types = OrderedDict()
+session_user_types_lock = threading.Lock()
+
+def remember_session_user_type(session_id, user_type):
+    with session_user_types_lock:
+        session_user_types[session_id] = user_type
+        session_user_types.move_to_end(session_id)
+        while len(session_user_types) > SESSION_USER_TYPES_MAX:
+            session_user_types.popitem(last=False)
+
+def get_session_user_type(session_id):
+    """user_type saved for a session (from memory, else from user_selections), or None"""
+    if not session_id:
+        return None
+    with session_user_types_lock:
+        if session_id in session_user_types:
+            session_user_types.move_to_end(session_id)
+            return session_user_types[session_id]
+    
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT user_type FROM user_selections WHERE session_id = %s", (session_id,))
+            row = cursor.fetchone()
+    except Exception as e:
+        logger.warning(f"Error looking up user type for session {session_id}: {e}")
+        return None
+    finally:
+        conn.close()
+    # Misses are remembered too: chat turns with server-side history all carry a sessionId,
+    # and saving selections later replaces the entry
+    user_type = row["user_type"] if row else None
+    remember_session_user_type(session_id, user_type)
+    return user_type
+
+def persist_user_selection(record):
+    """Save (or queue) a user selection record; returns (response body, status code)"""
+    remember_session_user_type(record["session_id"], record["user_type"])
+    if selection_writer:
+        selection_writer.submit(record["session_id"], record)
+        return {
+            "message": "User selections queued for saving",
+            "sessionId": record["session_id"],
+            "insertId": None,
+            "userType": record["user_type"],
+            "queued": True
+        }, 202
+    
+    try:
+        insert_id = upsert_user_selection(record)
+    except RuntimeError:
+        return {"error": "Database connection failed"}, 500
+    
+    return {
+        "message": "User selections saved successfully",
+        "sessionId": record["session_id"],
+        "insertId": insert_id,
+        "userType": record["user_type"]
+    }, 200
+
 # Save user selections
 @app.route("/cb/api/user-selections", methods=["POST"])
 def save_user_selections():
     try:
         data = request.json
-        user_selections = data.get("userSelections")
+        user_selections = data.get("userSelections") if isinstance(data, dict) else None
         
         if not user_selections:
             return jsonify({"error": "User selections data is required"}), 400
         
         # Generate a session ID if not provided
         session_id = data.get("sessionId") or str(uuid.uuid4())
-        
-        # Extract common fields from userSelections
-        name = user_selections.get("name")
-        email = user_selections.get("email")
-        phone = user_selections.get("phone")
-        role = user_selections.get("role")
-        
-        # Determine user type based on role selection
-        user_type = "Student/Fresher/Upskill"  # Default
-        if role == "Employer":
-            user_type = "Employer"
-        elif role == "Freelancer":
-            user_type = "Freelancer"
-        
-        # Extract work mode based on user type
-        work_mode = user_selections.get("work_mode")
-        
-        # Initialize all possible fields with None
-        # Employer fields
-        skills = None
-        employer_headcount_consultant = None
-        employer_project_size_consultant = None
-        employer_service = None
-        employer_start_time_consultant = None
-        employer_work_mode_consultant = None
-        
-        # Student fields
-        student_option = None
-        student_training = None
-        
-        # Freelancer fields
-        freelancer_category = None
-        freelancer_availability = None
-        
-        # Extract fields based on user type
-        if user_type == "Employer":
-            skills = user_selections.get("skills")
-            employer_headcount_consultant = user_selections.get("employer_headcount_consultant")
-            employer_project_size_consultant = user_selections.get("employer_project_size_consultant")
-            employer_service = user_selections.get("employer_service")
-            employer_start_time_consultant = user_selections.get("employer_start_time_consultant")
-            employer_work_mode_consultant = user_selections.get("employer_work_mode_consultant")
-            # If work_mode is not set, use the specific employer work mode
-            if not work_mode:
-                work_mode = (
-                    employer_work_mode_consultant or
-                    user_selections.get("employer_work_mode_trainer") or
-                    user_selections.get("employer_work_mode_panel") or
-                    user_selections.get("employer_work_mode_multi")
-                )
-        
-        elif user_type == "Student/Fresher/Upskill":
-            student_option = user_selections.get("student_option")
-            student_training = user_selections.get("student_training")
-            
-        elif user_type == "Freelancer":
-            freelancer_category = user_selections.get("freelancer_category")
-            freelancer_availability = user_selections.get("freelancer_availability")
-            # If work_mode is not set, use freelancer availability
-            if not work_mode:
-                work_mode = freelancer_availability
-        
-        # Store remaining selections as JSON
-        selections_json = json.dumps(user_selections)
-        
-        # Get database connection
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
-        
-        cursor = conn.cursor()
-        
-        try:
-            # Create a chat transcript from messages if available
-            chat_transcript = None
-            if 'messages' in user_selections:
-                chat_transcript = json.dumps(user_selections.get('messages'))
-            
-            # Check if this session_id already exists
-            check_query = "SELECT id FROM user_selections WHERE session_id = %s"
-            cursor.execute(check_query, (session_id,))
-            existing_record = cursor.fetchone()
-            
-            if existing_record:
-                # Update existing record
-                update_query = """
-                UPDATE user_selections SET 
-                    user_type = %s, name = %s, email = %s, phone = %s, role = %s, work_mode = %s,
-                    skills = %s, employer_headcount_consultant = %s, employer_project_size_consultant = %s,
-                    employer_service = %s, employer_start_time_consultant = %s, employer_work_mode_consultant = %s,
-                    student_option = %s, student_training = %s, freelancer_category = %s, chat_transcript = %s,
-                    updated_at = NOW()
-                WHERE session_id = %s
-                """
-                
-                cursor.execute(
-                    update_query, 
-                    (user_type, name, email, phone, role, work_mode,
-                     skills, employer_headcount_consultant, employer_project_size_consultant,
-                     employer_service, employer_start_time_consultant, employer_work_mode_consultant,
-                     student_option, student_training, freelancer_category, chat_transcript,
-                     session_id)
-                )
-                
-
-            else:
-                # Insert new record
-                insert_query = """
-                INSERT INTO chat_user_captures (
-                    session_id, user_type, name, email, phone, role, work_mode,
-                    skills, employer_headcount_consultant, employer_project_size_consultant,
-                    employer_service, employer_start_time_consultant, employer_work_mode_consultant,
-                    student_option, student_training, freelancer_category, chat_transcript,
-                    verified, created_at
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, FALSE, NOW())
-                """
-                
-                cursor.execute(
-                    insert_query, 
-                    (session_id, user_type, name, email, phone, role, work_mode,
-                     skills, employer_headcount_consultant, employer_project_size_consultant,
-                     employer_service, employer_start_time_consultant, employer_work_mode_consultant,
-                     student_option, student_training, freelancer_category, chat_transcript)
-                )
-                
-
-            
-            # Get the insert ID
-            insert_id = cursor.lastrowid
-            
-            return jsonify({
-                "message": "User selections saved successfully",
-                "sessionId": session_id,
-                "insertId": insert_id,
-                "userType": user_type
-            })
-        finally:
-            cursor.close()
-            conn.close()
+        body, status_code = persist_user_selection(
+            build_user_selection_record(session_id, user_selections)
+        )
+        return jsonify(body), status_code
             
     except Exception as e:
         logger.error(f"Error saving user selections: {e}")
@@ -431,27 +1112,56 @@ def save_user_selections():
 def vector_db_status():
     """Get the status of the vector database"""
     try:
+        collection_name = request.args.get("collection")
+        manager = get_collection(collection_name)
+        if manager is None:
+            return unknown_collection(collection_name)
+        
         # Check if ChromaDB is initialized
-        if not chroma_manager or not chroma_manager.collection:
+        if not manager.collection:
             return jsonify({"status": "error", "message": "ChromaDB not initialized"}), 500
         
         # Get collection info
-        collection_count = chroma_manager.collection.count()
+        collection_count = manager.collection.count()
         
         return jsonify({
             "status": "success",
             "message": "ChromaDB is operational",
             "collection_count": collection_count,
-            "collection_name": chroma_manager.collection.name
+            "collection_name": manager.collection.name
         })
     except Exception as e:
         logger.error(f"Error checking vector DB status: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route("/cb/api/vector-db/collections", methods=["GET"])
+def list_collections():
+    """List the named collections with their chunk counts"""
+    try:
+        collections = []
+        for name in chroma_collections.names():
+            manager = get_collection(name)
+            if manager is not None:
+                collections.append({"name": name, "chunk_count": manager.collection.count(),
+                                    "default": name == chroma_collections.default_name})
+        return jsonify({
+            "status": "success",
+            "collections": collections,
+            "user_type_collections": USER_TYPE_COLLECTIONS
+        })
+    except Exception as e:
+        logger.error(f"Error listing collections: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/cb/api/vector-db/upload", methods=["POST"])
 def upload_document():
     """Upload a document to the vector database"""
     try:
+        collection_name = request.values.get("collection")
+        manager = get_collection(collection_name, create=True)
+        if manager is None:
+            return unknown_collection(collection_name)
+        
         if 'file' not in request.files:
             return jsonify({"error": "No file part"}), 400
             
@@ -467,30 +1177,56 @@ def upload_document():
             except json.JSONDecodeError:
                 return jsonify({"error": "Invalid metadata format"}), 400
         
-        # Read file content
-        file_content = file.read()
-        
         try:
-            # Extract text from file
-            text = chroma_manager.extract_text_from_file(file_content, file.filename)
+            chunking = parse_chunking_options(request.values, manager)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Background mode: spool the file to disk and return a job id immediately
+        if request.values.get("async", "false").lower() == "true":
+            extension = file.filename.split('.')[-1].lower()
+            if extension not in ChromaDBManager.SUPPORTED_EXTENSIONS:
+                return jsonify({"error": f"Unsupported file format: {extension}"}), 400
             
-            # Add document to ChromaDB
-            success, chunk_count = chroma_manager.add_document_to_db(
-                text=text,
-                filename=file.filename,
-                metadata=custom_metadata
+            fd, spool_path = tempfile.mkstemp(prefix="upload-", suffix=f".{extension}")
+            os.close(fd)
+            file.save(spool_path)
+            job = ingestion_jobs.submit(spool_path, file.filename, custom_metadata, chroma_manager=manager,
+                                        chunking=chunking)
+            return jsonify({
+                "status": "accepted",
+                "message": "Document queued for processing",
+                "filename": file.filename,
+                "job_id": job["job_id"],
+                "progress_url": f"/cb/api/vector-db/jobs/{job['job_id']}"
+            }), 202
+        
+        try:
+            # Extract, chunk and embed the upload stream page by page
+            result = manager.ingest_document(
+                file.stream,
+                file.filename,
+                metadata=custom_metadata,
+                **chunking
             )
         except Exception as e:
             logger.error(f"Error processing document: {e}")
             traceback.print_exc()
             return jsonify({"error": str(e), "status": "error"}), 500
         
-        if success:
+        if result["chunk_count"]:
+            if result["document_status"] == "unchanged":
+                message = f"Document unchanged, all {result['chunk_count']} chunks already indexed"
+            else:
+                # Cached answers may have been built from the old collection contents
+                documents_changed(manager.collection_name)
+                message = (f"Document uploaded and processed into {result['chunk_count']} chunks "
+                           f"({result['added_chunks']} embedded, {result['deleted_chunks']} removed)")
             return jsonify({
                 "status": "success",
-                "message": f"Document uploaded and processed into {chunk_count} chunks",
+                "message": message,
                 "filename": file.filename,
-                "chunk_count": chunk_count
+                **result
             })
         else:
             return jsonify({"error": "Failed to add document to vector database"}), 500
@@ -499,114 +1235,261 @@ def upload_document():
         logger.error(f"Error uploading document: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/cb/api/vector-db/upload/bulk", methods=["POST"])
+def bulk_upload_documents():
+    """Upload many files and/or zip/tar archives to the vector database in one request"""
+    spool_dir = None
+    try:
+        collection_name = request.values.get("collection")
+        manager = get_collection(collection_name, create=True)
+        if manager is None:
+            return unknown_collection(collection_name)
+        
+        uploads = request.files.getlist('files') + request.files.getlist('file')
+        uploads = [file for file in uploads if file.filename]
+        if not uploads:
+            return jsonify({"error": "No files provided"}), 400
+        
+        custom_metadata = {}
+        if 'metadata' in request.form:
+            try:
+                custom_metadata = json.loads(request.form['metadata'])
+            except json.JSONDecodeError:
+                return jsonify({"error": "Invalid metadata format"}), 400
+        
+        try:
+            chunking = parse_chunking_options(request.values, manager)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Spool every file (and archive member) to disk, hashing as we go
+        spool_dir = tempfile.mkdtemp(prefix="bulk-upload-")
+        files = expand_uploads(
+            ((file.filename, file.stream) for file in uploads),
+            spool_dir,
+            ChromaDBManager.SUPPORTED_EXTENSIONS,
+            max_files=BULK_UPLOAD_MAX_FILES,
+            max_file_bytes=BULK_UPLOAD_MAX_FILE_BYTES
+        )
+        
+        if request.values.get("async", "false").lower() == "true":
+            job = ingestion_jobs.submit_bulk(spool_dir, files, custom_metadata,
+                                             workers=BULK_UPLOAD_WORKERS, write_batch_size=BULK_UPLOAD_WRITE_BATCH,
+                                             chroma_manager=manager, chunking=chunking)
+            spool_dir = None  # Owned by the job from here on
+            return jsonify({
+                "status": "accepted",
+                "message": f"{len(files)} files queued for processing",
+                "job_id": job["job_id"],
+                "progress_url": f"/cb/api/vector-db/jobs/{job['job_id']}"
+            }), 202
+        
+        result = ingest_files(manager, files, custom_metadata,
+                              workers=BULK_UPLOAD_WORKERS, write_batch_size=BULK_UPLOAD_WRITE_BATCH,
+                              chunking=chunking)
+        if result["summary"]["success"]:
+            documents_changed(manager.collection_name)
+        
+        return jsonify({
+            "status": "success",
+            "message": (f"Processed {result['summary']['success']} of {result['file_count']} files into "
+                        f"{result['chunk_count']} new chunks ({result['summary']['unchanged']} unchanged)"),
+            **result
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in bulk upload: {e}")
+        traceback.print_exc()
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if spool_dir:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+
+@app.route("/cb/api/vector-db/jobs/<job_id>", methods=["GET"])
+def get_ingestion_job(job_id):
+    """Progress of a background upload"""
+    job = ingestion_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": f"Job '{job_id}' not found"}), 404
+    return jsonify({"status": "success", "job": job})
+
+@app.route("/cb/api/vector-db/jobs", methods=["GET"])
+def list_ingestion_jobs():
+    """All tracked background uploads, newest first"""
+    jobs = ingestion_jobs.list()
+    return jsonify({"status": "success", "job_count": len(jobs), "jobs": jobs})
+
+def apply_relevancy_threshold(results, relevancy_threshold):
+    """Add similarity scores to search results and drop hits below relevancy_threshold"""
+    # Filter results by relevancy threshold if specified
+    if relevancy_threshold > 0.0 and "distances" in results and results["distances"]:
+        # In ChromaDB, lower distance means higher relevance
+        # Convert distances to similarity scores (1 - distance) for more intuitive filtering
+        # Assuming distances are normalized between 0 and 1
+        similarity_scores = [1 - min(dist, 1.0) for dist in results["distances"]]
+        
+        # Create filtered results based on threshold
+        filtered_indices = [i for i, score in enumerate(similarity_scores) if score >= relevancy_threshold]
+        
+        if not filtered_indices:
+            # Return empty results if nothing meets the threshold
+            return {
+                "documents": [],
+                "metadatas": [],
+                "distances": [],
+                "ids": [],
+                "similarity_scores": [],
+                "filtered_count": len(results["distances"]) - len(filtered_indices)
+            }
+        
+        # Filter all result arrays
+        filtered_results = {
+            "documents": [results["documents"][i] for i in filtered_indices],
+            "metadatas": [results["metadatas"][i] for i in filtered_indices],
+            "distances": [results["distances"][i] for i in filtered_indices],
+            "ids": [results["ids"][i] for i in filtered_indices],
+            "similarity_scores": [similarity_scores[i] for i in filtered_indices],
+            "filtered_count": len(results["distances"]) - len(filtered_indices)
+        }
+        
+        return filtered_results
+    
+    # If no threshold or no filtering needed, return original results
+    # Add similarity scores for consistency
+    if "distances" in results and results["distances"]:
+        results["similarity_scores"] = [1 - min(dist, 1.0) for dist in results["distances"]]
+        results["filtered_count"] = 0
+    return results
+
+def search_params_error(item, where=""):
+    """Validation error for a search query's parameters, or None"""
+    if not item.get("query") or not isinstance(item["query"], str):
+        return f"Query is required{where}"
+    n_results = item.get("n_results")
+    if isinstance(n_results, bool) or not isinstance(n_results, int) or n_results < 1:
+        return f"n_results must be a positive integer{where}"
+    threshold = item.get("relevancy_threshold")
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+        return f"relevancy_threshold must be a number{where}"
+    return None
+
 @app.route("/cb/api/vector-db/search", methods=["POST"])
 def search_vector_db():
     """Search the vector database with relevancy filtering"""
     try:
         payload = request.json or {}
+        manager = get_collection(payload.get("collection"))
+        if manager is None:
+            return unknown_collection(payload.get("collection"))
         query = payload.get("query")
         n_results = payload.get("n_results", 5)
         metadata_filter = payload.get("metadata_filter")
         relevancy_threshold = payload.get("relevancy_threshold", 0.0)  # Default to no filtering
+        hybrid = payload.get("hybrid")  # None uses the server default
         
-        if not query:
-            return jsonify({"error": "Query is required"}), 400
+        error = search_params_error({"query": query, "n_results": n_results, "relevancy_threshold": relevancy_threshold})
+        if error:
+            return jsonify({"error": error}), 400
             
         # Search documents
-        results = chroma_manager.search_documents(
+        results = manager.search_documents(
             query=query,
             n_results=n_results,
-            metadata_filter=metadata_filter
+            metadata_filter=metadata_filter,
+            hybrid=hybrid
         )
         
-        # Filter results by relevancy threshold if specified
-        if relevancy_threshold > 0.0 and "distances" in results and results["distances"]:
-            # In ChromaDB, lower distance means higher relevance
-            # Convert distances to similarity scores (1 - distance) for more intuitive filtering
-            # Assuming distances are normalized between 0 and 1
-            similarity_scores = [1 - min(dist, 1.0) for dist in results["distances"]]
-            
-            # Create filtered results based on threshold
-            filtered_indices = [i for i, score in enumerate(similarity_scores) if score >= relevancy_threshold]
-            
-            if not filtered_indices:
-                # Return empty results if nothing meets the threshold
-                return jsonify({
-                    "documents": [],
-                    "metadatas": [],
-                    "distances": [],
-                    "ids": [],
-                    "similarity_scores": [],
-                    "filtered_count": len(results["distances"]) - len(filtered_indices)
-                })
-            
-            # Filter all result arrays
-            filtered_results = {
-                "documents": [results["documents"][i] for i in filtered_indices],
-                "metadatas": [results["metadatas"][i] for i in filtered_indices],
-                "distances": [results["distances"][i] for i in filtered_indices],
-                "ids": [results["ids"][i] for i in filtered_indices],
-                "similarity_scores": [similarity_scores[i] for i in filtered_indices],
-                "filtered_count": len(results["distances"]) - len(filtered_indices)
-            }
-            
-            return jsonify(filtered_results)
-        
-        # If no threshold or no filtering needed, return original results
-        # Add similarity scores for consistency
-        if "distances" in results and results["distances"]:
-            results["similarity_scores"] = [1 - min(dist, 1.0) for dist in results["distances"]]
-            results["filtered_count"] = 0
-            
-        return jsonify(results)
+        return jsonify(apply_relevancy_threshold(results, relevancy_threshold))
         
     except Exception as e:
         logger.error(f"Error searching vector DB: {e}")
         return jsonify({"error": str(e)}), 500
 
+# Upper bound on queries per batch search request
+SEARCH_BATCH_MAX_QUERIES = int(os.getenv('SEARCH_BATCH_MAX_QUERIES', '256'))
+
+@app.route("/cb/api/vector-db/search/batch", methods=["POST"])
+def search_vector_db_batch():
+    """Search many queries in one request; results are returned in query order.
+    
+    Each query takes the same fields as /cb/api/vector-db/search (query, n_results,
+    metadata_filter, relevancy_threshold, hybrid); top-level values of those fields
+    apply to every query that does not set its own.
+    """
+    try:
+        payload = request.json or {}
+        manager = get_collection(payload.get("collection"))
+        if manager is None:
+            return unknown_collection(payload.get("collection"))
+        queries = payload.get("queries")
+        if not isinstance(queries, list) or not queries:
+            return jsonify({"error": "queries must be a non-empty list"}), 400
+        if len(queries) > SEARCH_BATCH_MAX_QUERIES:
+            return jsonify({"error": f"At most {SEARCH_BATCH_MAX_QUERIES} queries per request"}), 400
+        
+        defaults = {
+            "n_results": payload.get("n_results", 5),
+            "metadata_filter": payload.get("metadata_filter"),
+            "relevancy_threshold": payload.get("relevancy_threshold", 0.0),
+            "hybrid": payload.get("hybrid")
+        }
+        items = []
+        for position, query in enumerate(queries):
+            if not isinstance(query, (str, dict)):
+                return jsonify({"error": f"Each query must be a string or an object (queries[{position}])"}), 400
+            item = dict(defaults, **({"query": query} if isinstance(query, str) else query))
+            error = search_params_error(item, f" (queries[{position}])")
+            if error:
+                return jsonify({"error": error}), 400
+            items.append(item)
+        
+        results = manager.search_documents_batch(items)
+        return jsonify({
+            "query_count": len(items),
+            "results": [
+                dict(apply_relevancy_threshold(result, item["relevancy_threshold"]), query=item["query"])
+                for item, result in zip(items, results)
+            ]
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in batch vector DB search: {e}")
+        return jsonify({"error": str(e)}), 500
+
+# Page size for the document list; clients page on with the returned next_cursor
+DOCUMENTS_PAGE_SIZE = int(os.getenv('DOCUMENTS_PAGE_SIZE', '100'))
+DOCUMENTS_MAX_PAGE_SIZE = 1000
+
 @app.route("/cb/api/vector-db/documents", methods=["GET"])
 def list_documents():
-    """List all documents in the vector database"""
+    """List documents from the document catalog, one page at a time (ordered by filename)"""
     try:
+        collection_name = request.args.get("collection")
+        manager = get_collection(collection_name)
+        if manager is None:
+            return unknown_collection(collection_name)
+        
         try:
-            # Get all documents from collection
-            results = chroma_manager.collection.get(
-                include=["metadatas"],  # Removed embeddings to reduce response size
-                limit=100  # Limit to prevent large responses
-            )
-        except Exception as e:
-            logger.error(f"Error getting documents from collection: {e}")
-            traceback.print_exc()
-            return jsonify({"error": str(e), "status": "error"}), 500
+            limit = min(max(int(request.args.get("limit", DOCUMENTS_PAGE_SIZE)), 1), DOCUMENTS_MAX_PAGE_SIZE)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer", "status": "error"}), 400
         
-        # Process results to group by filename
-        documents = {}
-        if results and "metadatas" in results:
-            for i, metadata in enumerate(results["metadatas"]):
-                if metadata and "filename" in metadata:
-                    filename = metadata["filename"]
-                    if filename not in documents:
-                        documents[filename] = {
-                            "filename": filename,
-                            "chunk_count": 0,
-                            "upload_date": metadata.get("upload_date", "Unknown"),
-                            "custom_metadata": {}
-                        }
-                    
-                    # Update chunk count
-                    documents[filename]["chunk_count"] += 1
-                    
-                    # Add any custom metadata from the first chunk
-                    if documents[filename]["chunk_count"] == 1:
-                        for key, value in metadata.items():
-                            if key not in ["filename", "upload_date", "chunk_index", "total_chunks", "text_length"]:
-                                documents[filename]["custom_metadata"][key] = value
+        try:
+            documents, next_cursor = manager.catalog.page(limit=limit, cursor=request.args.get("cursor"))
+        except ValueError as e:
+            return jsonify({"error": str(e), "status": "error"}), 400
         
-        return jsonify({
+        response = {
             "status": "success",
             "document_count": len(documents),
-            "documents": list(documents.values())
-        })
+            "documents": documents,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None
+        }
+        # Counting every document is a full catalog scan, so it is opt-in
+        if request.args.get("include_total", "false").lower() == "true":
+            response["total_documents"] = manager.catalog.count()
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
@@ -616,8 +1499,13 @@ def list_documents():
 def delete_document(filename):
     """Delete a document from the vector database"""
     try:
+        collection_name = request.args.get("collection")
+        manager = get_collection(collection_name)
+        if manager is None:
+            return unknown_collection(collection_name)
+        
         # Get all document IDs with matching filename
-        results = chroma_manager.collection.get(
+        results = manager.collection.get(
             where={"filename": filename},
             include=[]
         )
@@ -626,7 +1514,9 @@ def delete_document(filename):
             return jsonify({"error": f"Document '{filename}' not found"}), 404
             
         # Delete all chunks of the document
-        chroma_manager.collection.delete(ids=results["ids"])
+        manager.delete_chunks(results["ids"])
+        manager.catalog.remove(filename)
+        documents_changed(manager.collection_name)
         
         return jsonify({
             "status": "success",
@@ -642,8 +1532,15 @@ def delete_document(filename):
 def reset_vector_db():
     """Reset the vector database"""
     try:
+        collection_name = request.values.get("collection")
+        manager = get_collection(collection_name)
+        if manager is None:
+            return unknown_collection(collection_name)
+        
         # Reset collection
-        chroma_manager.collection.delete()
+        if not manager.reset_collection():
+            return jsonify({"error": "Failed to reset vector database"}), 500
+        documents_changed(manager.collection_name)
         
         return jsonify({
             "status": "success",
@@ -654,6 +1551,118 @@ def reset_vector_db():
         logger.error(f"Error resetting vector DB: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/cb/api/cache/stats", methods=["GET"])
+def cache_stats():
+    """Hit/miss counters for the chat response cache and the embedding cache, and retrieval gating counts"""
+    return jsonify({"status": "success", "cache": response_cache.stats(), "embeddings": embedder.stats(),
+                    "extraction": document_extractor.stats(), "conversations": conversation_store.stats(),
+                    "precomputed": precomputed_answers.stats(), "llm_gateway": llm_gateway.stats(),
+                    "relevance_gate": relevance_gate.stats()})
+
+@app.route("/cb/api/conversations/<session_id>", methods=["DELETE"])
+def delete_conversation(session_id):
+    """Forget the server-side history of a chat session"""
+    if not conversation_store.reset(session_id):
+        return jsonify({"error": f"Conversation '{session_id}' not found"}), 404
+    return jsonify({"status": "success", "message": f"Conversation '{session_id}' deleted"})
+
+@app.route("/cb/api/precomputed", methods=["GET"])
+def list_precomputed_answers():
+    """Stored answers of a collection (default collection unless "collection" is given) and the rebuild state"""
+    collection_name = request.args.get("collection")
+    manager = get_collection(collection_name)
+    if manager is None:
+        return unknown_collection(collection_name)
+    return jsonify({"status": "success", "collection": manager.collection_name,
+                    "answers": precomputed_answers.answers(manager.collection_name),
+                    "outdated": precomputed_answers.outdated(manager.collection_name),
+                    "stats": precomputed_answers.stats(), "rebuild": answer_precomputer.stats()})
+
+@app.route("/cb/api/precomputed/rebuild", methods=["POST"])
+def rebuild_precomputed_answers():
+    """Generate the outdated precomputed answers (all of them with "force") in the background"""
+    payload = request.json or {}
+    collections = None
+    if payload.get("collection"):
+        manager = get_collection(payload["collection"])
+        if manager is None:
+            return unknown_collection(payload["collection"])
+        collections = [manager.collection_name]
+    threading.Thread(target=answer_precomputer.run, args=(collections, bool(payload.get("force"))),
+                     daemon=True).start()
+    return jsonify({"status": "accepted", "message": "Rebuilding precomputed answers"}), 202
+
+@app.route("/cb/api/model-routes", methods=["GET"])
+def model_routes():
+    """The model routing ladder and policy, with requests, latency and estimated cost per route"""
+    return jsonify({"status": "success", **model_router.stats()})
+
+@app.route("/cb/api/cache/clear", methods=["POST"])
+def clear_cache():
+    """Manually invalidate the chat response cache"""
+    response_cache.invalidate()
+    return jsonify({"status": "success", "message": "Response cache cleared"})
+
+def warm_up():
+    """Initialize everything that is otherwise created on first use, ahead of traffic.
+    
+    Opens the default and audience collections (loading their keyword indexes), loads
+    the embedding model, creates the OpenAI clients, initializes the database and starts
+    the extraction workers. A step that fails is reported and left to first use.
+    """
+    def open_collections():
+        chroma_collections.default
+        for name in USER_TYPE_COLLECTIONS.values():
+            get_collection(name)
+
+    def create_clients():
+        for gateway in [llm_gateway, *route_gateways.values()]:
+            gateway.warm_up()
+
+    def initialize_database():
+        if not ensure_database():
+            raise RuntimeError("database unavailable")
+
+    started = time.perf_counter()
+    steps = [
+        ("collections", open_collections),
+        ("embedding_model", embedder.warm_up),
+        ("openai", create_clients),
+        ("mysql", initialize_database),
+        ("extraction_pool", document_extractor.start)
+    ]
+    results = {}
+    with startup.warming_up():
+        for name, step in steps:
+            try:
+                step()
+                results[name] = "ok"
+            except Exception as e:
+                logger.warning(f"Warm-up step {name} failed: {e}")
+                results[name] = f"failed: {e}"
+    summary = {"steps": results, "seconds": round(time.perf_counter() - started, 3), "finished_at": time.time()}
+    startup.record_warmup(summary)
+    return summary
+
+@app.route("/cb/api/warmup", methods=["POST"])
+def warmup():
+    """Run the warm-up now (e.g. from a readiness hook) and return what it did"""
+    return jsonify({"status": "success", **warm_up()})
+
+@app.route("/cb/api/startup", methods=["GET"])
+def startup_report():
+    """Import time, and how long each lazily created service took to initialize and what triggered it"""
+    return jsonify({"status": "success", "pid": os.getpid(), "collections_loaded": chroma_collections.loaded(),
+                    "database_ready": database_ready, **startup.report()})
+
+startup.record_import("rag_backend", time.perf_counter() - IMPORT_STARTED)
+logger.info(f"rag_backend imported in {time.perf_counter() - IMPORT_STARTED:.3f}s")
+
+# WARMUP_ON_START warms each worker up in the background right after import, so it can
+# take requests immediately and the first ones do not pay for the initialization
+if os.getenv('WARMUP_ON_START', 'false').lower() == 'true':
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
 if __name__ == "__main__":
     # Bind to 0.0.0.0 to make the server accessible externally
     # This is important for ngrok to be able to forward requests
@@ -0,0 +1,173 @@
+"""
+Streaming readers for tabular and structured files (CSV, JSON and JSON Lines).
+
+Each reader yields one compact "header: value; header: value" record per row, array
+element or object member while reading the file in bounded pieces, so memory stays
+proportional to one row group (CSV) or one record (JSON/JSONL) rather than the whole
+file. Nested values are flattened to dotted keys ("address.city: Pune").
+"""
+import io
+import json
+import re
+from typing import Any, BinaryIO, Iterator, List, Tuple
+
+CSV_ROW_GROUP_SIZE = 1000
+JSON_READ_SIZE = 64 * 1024
+WHITESPACE_RE = re.compile(r"\s*")
+
+def flatten(value: Any, prefix: str = "") -> List[Tuple[str, str]]:
+    """(dotted key, text) pairs for the scalars in a JSON value; lists of scalars are joined with commas"""
+    if isinstance(value, dict):
+        pairs = []
+        for key, item in value.items():
+            pairs.extend(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+        return pairs
+    if isinstance(value, list):
+        if all(not isinstance(item, (dict, list)) for item in value):
+            return [(prefix, ", ".join(str(item) for item in value if item is not None))] if value else []
+        pairs = []
+        for index, item in enumerate(value):
+            pairs.extend(flatten(item, f"{prefix}.{index}" if prefix else str(index)))
+        return pairs
+    if value is None or value == "":
+        return []
+    return [(prefix, str(value))]
+
+def format_record(pairs: List[Tuple[str, str]]) -> str:
+    return "; ".join(f"{key}: {value}" if key else value for key, value in pairs if value != "")
+
+def iter_csv_records(stream: BinaryIO, row_group_size: int = CSV_ROW_GROUP_SIZE) -> Iterator[str]:
+    """One record per CSV row, parsed row_group_size rows at a time; empty cells are left out"""
+    # Imported here: pandas is only needed for CSV uploads and adds noticeably to startup
+    import pandas as pd
+    # Keep every cell as the text in the file (no float conversion of ids or "NA" guessing)
+    reader = pd.read_csv(stream, chunksize=row_group_size, dtype=str, keep_default_na=False)
+    with reader:
+        for group in reader:
+            columns = [str(column) for column in group.columns]
+            for row in group.itertuples(index=False, name=None):
+                record = format_record(list(zip(columns, row)))
+                if record:
+                    yield record
+
+def iter_jsonl_records(stream: BinaryIO) -> Iterator[str]:
+    """One record per non-empty line of a JSON Lines file"""
+    text = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON on line {number}: {e.msg}")
+            record = format_record(flatten(value))
+            if record:
+                yield record
+    finally:
+        # Leave the underlying stream to its owner
+        text.detach()
+
+class _JsonStream:
+    """Incremental decoding of JSON values from a text stream, one value at a time"""
+
+    def __init__(self, text: io.TextIOBase, read_size: int = JSON_READ_SIZE):
+        self.text = text
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0  # Everything before pos has been consumed
+        self.eof = False
+
+    def _fill(self, size: int = 0) -> bool:
+        if self.eof:
+            return False
+        block = self.text.read(max(size, self.read_size))
+        if not block:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + block
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at the end of the stream), consuming the whitespace"""
+        while True:
+            self.pos = WHITESPACE_RE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Invalid JSON: expected one of {characters!r}, found {character or 'end of file'!r}")
+        self.pos += 1
+        return character
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # Most likely a value cut off at the end of the buffer; read more (doubling) and retry
+                if not self._fill(len(self.buffer) - self.pos):
+                    raise ValueError(f"Invalid JSON: {e.msg}")
+                continue
+            # A number at the very end of the buffer may continue in the next block
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+def _array_records(reader: _JsonStream, prefix: str = "") -> Iterator[str]:
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.expect("]")
+        return
+    while True:
+        record = format_record(flatten(reader.value(), prefix))
+        if record:
+            yield record
+        if reader.expect(",]") == "]":
+            return
+
+def iter_json_records(stream: BinaryIO, read_size: int = JSON_READ_SIZE) -> Iterator[str]:
+    """One record per element of a top-level array or member of a top-level object.
+
+    Arrays at the top level or directly under a top-level key ({"items": [...]}) are
+    read one element at a time from read_size blocks, so only the current element is
+    held in memory; any other top-level value is a single record.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8")
+    try:
+        reader = _JsonStream(text, read_size)
+        first = reader.peek()
+        if first == "[":
+            yield from _array_records(reader)
+        elif first == "{":
+            reader.expect("{")
+            if reader.peek() == "}":
+                reader.expect("}")
+            else:
+                while True:
+                    key = reader.value()
+                    if not isinstance(key, str):
+                        raise ValueError("Invalid JSON: object keys must be strings")
+                    reader.expect(":")
+                    if reader.peek() == "[":
+                        yield from _array_records(reader, key)
+                    else:
+                        record = format_record(flatten(reader.value(), key))
+                        if record:
+                            yield record
+                    if reader.expect(",}") == "}":
+                        break
+        elif first:
+            record = format_record(flatten(reader.value()))
+            if record:
+                yield record
+        if reader.peek():
+            raise ValueError("Invalid JSON: unexpected data after the top-level value")
+    finally:
+        text.detach()
@@ -0,0 +1,103 @@
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from bm25_index import tokenize
+
+# Whole-message small talk: greetings, thanks, acknowledgements, farewells
+SMALL_TALK_PATTERNS = [
+    r"(hi+|hey+|hello+|hiya|yo|howdy|greetings)( there| bot| all| team)?",
+    r"good (morning|afternoon|evening|day|night)",
+    r"(thanks?|thank you|thank u|thx|ty|cheers|much appreciated|appreciate it)( (so|very) much| a lot| again)?",
+    r"(ok(ay)?|k+|cool|great|nice|awesome|perfect|got it|understood|sure|alright|fine|noted|yes|yeah|yep|no|nope)",
+    r"(bye+|goodbye|see (you|ya)( later| soon)?|take care|have a (good|nice|great) (day|one))",
+    r"how are (you|u)( doing)?( today)?",
+    r"(who|what) are (you|u)",
+    r"(lol|haha+|hmm+|wow)",
+]
+SMALL_TALK_RE = re.compile(r"^(?:(?:" + "|".join(SMALL_TALK_PATTERNS) + r")[\s,.!?]*)+$")
+
+def term_variants(term: str) -> List[str]:
+    """A BM25 token and its likely inflections ("fees" -> "fee", "pricing" -> "price")
+
+    The keyword index stores tokens unstemmed, so a term counts as known when any
+    variant is indexed.
+    """
+    variants = [term, term + "s"]
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        variants.append(term[:-1])
+        if term.endswith("ies"):
+            variants.append(term[:-3] + "y")
+        elif term.endswith("es"):
+            variants.append(term[:-2])
+    for suffix in ("ing", "ed"):
+        stem = term[:-len(suffix)]
+        if term.endswith(suffix) and len(stem) > 2:
+            variants += [stem, stem + "e"]
+    return variants
+
+class RelevanceGate:
+    """Decides whether a chat turn needs retrieval and which retrieved chunks are relevant enough.
+
+    A cheap rule-based classifier skips the vector query for small talk ("hi", "thanks",
+    "ok") and for very short turns that share no term, inflections included, with the
+    keyword index of the collection being searched (known_term). Retrieved
+    chunks are then cut at an absolute distance and, adaptively, at a margin above the
+    best match, so weak hits never pad the prompt. Hybrid search keyword hits (with a
+    "keyword_rank") are exempt from the margin, since exact-term matches are often
+    further from the query in embedding space than paraphrases.
+    """
+
+    def __init__(self, max_distance: float = 1.3, distance_margin: float = 0.3, min_query_terms: int = 3,
+                 enabled: bool = True):
+        self.max_distance = max_distance
+        self.distance_margin = distance_margin
+        self.min_query_terms = min_query_terms
+        self.enabled = enabled
+        self._stats = {"small_talk": 0, "no_known_terms": 0, "retrieved": 0, "no_relevant_chunks": 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_small_talk(text: str) -> bool:
+        normalized = re.sub(r"[^\w\s,.!?']", " ", (text or "").lower())
+        normalized = re.sub(r"\s+", " ", normalized).strip()
+        return not normalized or bool(SMALL_TALK_RE.match(normalized))
+
+    def needs_retrieval(self, text: str, known_term: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """Return None when retrieval should run, otherwise the reason it is skipped"""
+        if not self.enabled:
+            return None
+        reason = None
+        terms = tokenize(text)
+        if self.is_small_talk(text):
+            reason = "small_talk"
+        elif known_term and len(terms) < self.min_query_terms and \
+                not any(known_term(variant) for term in terms for variant in term_variants(term)):
+            reason = "no_known_terms"
+        if reason:
+            with self._lock:
+                self._stats[reason] += 1
+        return reason
+
+    def filter(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep chunks (best first, each with a "distance") within the cutoff and margin of the best.
+
+        Chunks with a BM25 "keyword_rank" only need to be within the absolute cutoff.
+        """
+        if not self.enabled:
+            return chunks
+        distances = [chunk["distance"] for chunk in chunks if chunk.get("distance") is not None]
+        if not distances:
+            return chunks
+        cutoff = min(self.max_distance, min(distances) + self.distance_margin)
+        kept = [chunk for chunk in chunks if chunk.get("distance") is None or chunk["distance"] <= cutoff
+                or (chunk.get("keyword_rank") is not None and chunk["distance"] <= self.max_distance)]
+        with self._lock:
+            self._stats["retrieved" if kept else "no_relevant_chunks"] += 1
+        return kept
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        return dict(stats, enabled=self.enabled, max_distance=self.max_distance,
+                    distance_margin=self.distance_margin)
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+class ResponseCache:
+    """TTL + LRU cache of chat completions with an exact and a semantic lookup path.
+
+    Exact hits are keyed on (model, temperature, max_tokens, normalized messages,
+    retrieved chunk ids). On an exact miss the embedding of the last user message is
+    compared against cached entries that share the same model settings and earlier
+    conversation, and the closest one above the similarity threshold is served.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600,
+                 similarity_threshold: float = 0.95, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """Lower-case and collapse whitespace so trivial differences share a key"""
+        return re.sub(r'\s+', ' ', str(text or '')).strip().lower()
+
+    def _split_messages(self, messages: List[Dict[str, Any]]) -> Tuple[List[List[str]], str]:
+        """Return (normalized earlier messages, normalized last user message)"""
+        normalized = [[m.get("role", ""), self._normalize(m.get("content", ""))] for m in messages]
+        for i in range(len(normalized) - 1, -1, -1):
+            if normalized[i][0] == "user":
+                return normalized[:i] + normalized[i + 1:], normalized[i][1]
+        return normalized, ""
+
+    @staticmethod
+    def _hash(value: Any) -> str:
+        return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def make_keys(self, model_name: str, temperature: float, max_tokens: int,
+                  messages: List[Dict[str, Any]], chunk_ids: List[str], scope: str = "") -> Tuple[str, str]:
+        """Return (exact key, semantic bucket) for a request; scope separates answers from different knowledge bases"""
+        prior_messages, last_user_message = self._split_messages(messages)
+        settings = [model_name, temperature, max_tokens, scope]
+        bucket = self._hash([settings, prior_messages])
+        key = self._hash([settings, prior_messages, last_user_message, sorted(chunk_ids or [])])
+        return key, bucket
+
+    def _is_expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def get(self, key: str, bucket: str, embedding: List[float] = None) -> Tuple[Optional[str], Optional[str]]:
+        """Look up a cached response; returns (content, "exact" | "semantic") or (None, None)"""
+        if not self.enabled:
+            return None, None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_expired(entry, now):
+                    del self._entries[key]
+                else:
+                    self._entries.move_to_end(key)
+                    self._stats["exact_hits"] += 1
+                    return entry["content"], "exact"
+
+            if embedding is not None and self.similarity_threshold < 1.0:
+                best_key, best_score = self._nearest(bucket, embedding, now)
+                if best_key is not None and best_score >= self.similarity_threshold:
+                    self._entries.move_to_end(best_key)
+                    self._stats["semantic_hits"] += 1
+                    return self._entries[best_key]["content"], "semantic"
+
+            self._stats["misses"] += 1
+            return None, None
+
+    def _nearest(self, bucket: str, embedding: List[float], now: float) -> Tuple[Optional[str], float]:
+        """Find the most similar live entry in the bucket (caller holds the lock)"""
+        candidates = []
+        expired = []
+        for key, entry in self._entries.items():
+            if self._is_expired(entry, now):
+                expired.append(key)
+            elif entry["bucket"] == bucket and entry["embedding"] is not None:
+                candidates.append(key)
+        for key in expired:
+            del self._entries[key]
+
+        if not candidates:
+            return None, 0.0
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return None, 0.0
+        matrix = np.stack([self._entries[key]["embedding"] for key in candidates])
+        # Stored embeddings are unit-normalised on insert
+        scores = matrix @ (query / query_norm)
+        best = int(np.argmax(scores))
+        return candidates[best], float(scores[best])
+
+    def put(self, key: str, bucket: str, content: str, embedding: List[float] = None) -> None:
+        """Store a response, evicting the least recently used entries beyond max_entries"""
+        if not self.enabled or not content:
+            return
+
+        vector = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            vector = vector / norm if norm else None
+
+        with self._lock:
+            self._entries[key] = {
+                "content": content,
+                "bucket": bucket,
+                "embedding": vector,
+                "created_at": time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self) -> None:
+        """Drop every cached response (called whenever the document collection changes)"""
+        with self._lock:
+            self._entries.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        stats["enabled"] = self.enabled
+        stats["max_entries"] = self.max_entries
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["similarity_threshold"] = self.similarity_threshold
+        return stats
@@ -0,0 +1,117 @@
+"""
+Cold-start bookkeeping: lazily created services and the startup-time report.
+
+Importing the API only reads its settings. The ChromaDB store and keyword index, the
+embedding model, the OpenAI clients, the MySQL pool and tables and the extraction
+process pool are created on first use (Lazy), so a freshly forked worker is ready as
+soon as its imports finish. A warm-up (rag_backend.warm_up) creates them ahead of
+traffic instead. Every initialization is timed and recorded with what triggered it,
+"warmup" or "first_use", and report() returns the timings for GET /cb/api/startup.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+import metrics
+
+T = TypeVar("T")
+
+_trigger: contextvars.ContextVar[str] = contextvars.ContextVar("startup_trigger", default="first_use")
+_lock = threading.Lock()
+_components: Dict[str, Dict[str, Any]] = {}
+_imports: Dict[str, float] = {}
+_warmup: Optional[Dict[str, Any]] = None
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (interpreter startup included), or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/stat") as f:
+            # The start time is field 22, counted after the parenthesised command name
+            started_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - started_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+def record_import(name: str, seconds: float) -> None:
+    """Time taken to import a module (its module-level setup included), and the process age at that point"""
+    age = process_age()
+    with _lock:
+        _imports[name] = round(seconds, 4)
+        if age is not None:
+            _imports["process_age"] = round(age, 2)
+    metrics.STARTUP_SECONDS.observe(seconds, component=f"import:{name}", trigger="import")
+
+@contextmanager
+def initializing(name: str):
+    """Time the initialization of a component and record it (also when it fails)"""
+    trigger = _trigger.get()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        with _lock:
+            entry = _components.setdefault(name, {"attempts": 0})
+            entry.update(attempts=entry["attempts"] + 1, seconds=round(seconds, 4), trigger=trigger,
+                         ok=error is None, error=error, at=time.time())
+        metrics.STARTUP_SECONDS.observe(seconds, component=name, trigger=trigger)
+
+@contextmanager
+def warming_up():
+    """Initializations in this block are reported as triggered by the warm-up"""
+    token = _trigger.set("warmup")
+    try:
+        yield
+    finally:
+        _trigger.reset(token)
+
+def record_warmup(summary: Dict[str, Any]) -> None:
+    global _warmup
+    with _lock:
+        _warmup = summary
+
+class Lazy(Generic[T]):
+    """A value built by factory() on first get(), once, under a lock.
+
+    A factory that raises leaves the value unset, so the next get() tries again.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self.factory = factory
+        self._value: Optional[T] = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def set(self, value: T) -> None:
+        """Use a value created elsewhere (nothing is recorded)"""
+        with self._lock:
+            self._value = value
+            self._ready = True
+
+    def get(self) -> T:
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    with initializing(self.name):
+                        self._value = self.factory()
+                    self._ready = True
+        return self._value
+
+def report() -> Dict[str, Any]:
+    with _lock:
+        return {"imports": dict(_imports), "components": {name: dict(entry) for name, entry in _components.items()},
+                "warmup": dict(_warmup) if _warmup else None}
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The API modules are flat files in chatbot-api/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def backend(tmp_path_factory):
+    """rag_backend imported against an empty scratch ChromaDB store"""
+    os.environ["CHROMA_DB_PATH"] = str(tmp_path_factory.mktemp("chroma_db"))
+    os.environ["WARMUP_ON_START"] = "false"
+    import rag_backend
+    return rag_backend
+
+@pytest.fixture
+def client(backend):
+    return backend.app.test_client()
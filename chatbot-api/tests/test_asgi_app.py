@@ -0,0 +1,25 @@
+import asyncio
+
+import httpx
+import pytest
+
+@pytest.fixture
+def asgi_app(backend):
+    import asgi_app
+    return asgi_app.app
+
+@pytest.mark.parametrize("path", ["/cb/api/groq/chat", "/cb/api/groq/chat/stream", "/cb/api/user-selections"])
+@pytest.mark.parametrize("body", ["[]", '"hi"', "3", "not json"])
+def test_non_object_bodies_are_rejected(asgi_app, path, body):
+    async def post():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, content=body, headers={"content-type": "application/json"})
+
+    response = asyncio.run(post())
+    assert response.status_code == 400
+    assert "error" in response.json()
+
+@pytest.mark.parametrize("path", ["/cb/api/groq/chat", "/cb/api/groq/chat/stream", "/cb/api/user-selections"])
+def test_flask_routes_reject_non_object_bodies(client, path):
+    assert client.post(path, json=["hi"]).status_code == 400
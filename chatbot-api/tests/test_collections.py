@@ -0,0 +1,12 @@
+def test_status_on_an_empty_store_opens_the_default_collection(backend, client):
+    response = client.get("/cb/api/vector-db/status")
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == "success"
+    assert body["collection_name"] == backend.chroma_collections.default_name
+    assert body["collection_count"] == 0
+
+def test_unknown_collections_are_still_rejected(client):
+    response = client.get("/cb/api/vector-db/status?collection=no_such_collection")
+    assert response.status_code == 404
@@ -0,0 +1,109 @@
+import pytest
+
+from context_assembly import CONTEXT_HEADER, SUMMARY_HEADER, ContextAssembler, merge_neighbours
+
+MODEL = "gpt-4.1-nano"
+
+@pytest.fixture
+def assembler():
+    assembler = ContextAssembler(default_budget=400, context_max_tokens=150, turn_max_tokens=60,
+                                 summary_max_tokens=60)
+    # Deterministic ~4 characters per token, whether or not tiktoken is installed
+    assembler.counter.exact = False
+    return assembler
+
+def chunk(chunk_id, text, filename="a.txt", index=0):
+    return {"id": chunk_id, "text": text, "metadata": {"filename": filename, "chunk_index": index}}
+
+def conversation(turns, latest="What does the trainer programme cost?"):
+    history = []
+    for number in range(turns):
+        history += [{"role": "user", "content": f"Question {number} about freelancing on Flexwork?"},
+                    {"role": "assistant", "content": f"Answer {number}. Flexwork connects freelancers with employers."}]
+    return [{"role": "system", "content": "You are Arth-AI."}] + history + [{"role": "user", "content": latest}]
+
+def test_prompt_stays_within_budget_and_keeps_system_and_latest_turn(assembler):
+    messages = conversation(12)
+    chunks = [chunk(f"c{i}", f"Fact {i}: " + "trainer fees and schedules " * 8, index=i * 10) for i in range(6)]
+    assembled, context, used_ids, report = assembler.assemble(messages, chunks, MODEL)
+
+    assert not report["over_budget"]
+    assert report["prompt_tokens"] <= report["budget"] == 400
+    assert assembled[0]["role"] == "system" and assembled[0]["content"].startswith("You are Arth-AI.")
+    assert assembled[-1] == messages[-1]
+    # Context is capped on its own and filled best first
+    assert report["context_tokens"] <= 150
+    assert used_ids == [f"c{i}" for i in range(len(used_ids))]
+    assert report["chunks_used"] + report["chunks_dropped"] == len(chunks)
+    assert context.startswith(CONTEXT_HEADER)
+
+def test_old_turns_are_dropped_newest_first(assembler):
+    messages = conversation(30)
+    assembled, _, _, report = assembler.assemble(messages, [], MODEL)
+
+    assert report["turns_dropped"] > 0
+    assert report["turns_kept"] + report["turns_dropped"] == 60
+    kept = assembled[1:-1]
+    assert kept == messages[-1 - len(kept):-1]
+    assert report["prompt_tokens"] <= 400
+
+def test_dropped_turns_are_summarised_when_there_is_room(assembler):
+    messages = [{"role": "system", "content": "You are Arth-AI."},
+                {"role": "user", "content": "I am a corporate trainer. " + "Details follow. " * 100},
+                {"role": "assistant", "content": "Welcome!"},
+                {"role": "user", "content": "What are the fees?"}]
+    full = assembler.assemble(messages, [], MODEL)[3]["prompt_tokens"]
+    # Room for everything except the long (trimmed) first turn
+    assembler.default_budget = full - 30
+    assembled, _, _, report = assembler.assemble(messages, [], MODEL)
+
+    assert report["turns_dropped"] == 1 and report["turns_kept"] == 1
+    assert assembled[0]["content"] == "You are Arth-AI." + SUMMARY_HEADER + "- user: I am a corporate trainer."
+    assert report["prompt_tokens"] <= assembler.default_budget
+
+def test_long_turns_are_trimmed(assembler):
+    messages = [{"role": "user", "content": "word " * 400}, {"role": "assistant", "content": "ok"},
+                {"role": "user", "content": "And then?"}]
+    assembled, _, _, report = assembler.assemble(messages, [], MODEL)
+
+    assert report["turns_kept"] == 2
+    assert assembled[0]["content"].endswith(" ...")
+    assert assembler.counter.count(assembled[0]["content"], MODEL) <= 62
+
+def test_context_last_keeps_the_prefix_stable(assembler):
+    messages = conversation(1)
+    chunks = [chunk("c0", "Trainer fees are listed per course.")]
+    assembled, _, _, _ = assembler.assemble(messages, chunks, MODEL, summary="- user: hello", context_last=True)
+
+    assert assembled[0]["content"] == "You are Arth-AI." + SUMMARY_HEADER + "- user: hello"
+    assert assembled[-2]["role"] == "system" and "Trainer fees" in assembled[-2]["content"]
+    assert assembled[-1] == messages[-1]
+
+def test_overlapping_neighbours_are_merged():
+    first = chunk("c0", "Flexwork trainers are paid per session, and the rates depend on the course level.", index=0)
+    second = chunk("c1", "the rates depend on the course level. Corporate batches are invoiced monthly.", index=1)
+    blocks, folded = merge_neighbours([second, first, dict(first, id="dup")])
+
+    assert folded == 1
+    assert len(blocks) == 1 and blocks[0]["ids"] == ["c0", "c1"]
+    assert blocks[0]["text"].count("the rates depend on the course level.") == 1
+
+def test_counter_falls_back_to_the_estimate_when_tiktoken_cannot_load(monkeypatch):
+    import context_assembly
+
+    class Offline:
+        @staticmethod
+        def encoding_for_model(model):
+            raise ConnectionError("BPE download failed")
+
+        get_encoding = encoding_for_model
+
+    monkeypatch.setattr(context_assembly, "tiktoken", Offline)
+    assembler = ContextAssembler()
+    assembler.counter.exact = True
+
+    assert assembler.counter.count("x" * 40, MODEL) == 10
+    assert not assembler.counter.exact
+    assert assembler.counter.truncate("x" * 40, 2, MODEL) == "x" * 8
+    assembled, _, _, report = assembler.assemble(conversation(2), [chunk("c0", "Trainer fees.")], MODEL)
+    assert report["token_counter"] == "estimate" and assembled[-1]["content"].startswith("What does")
@@ -0,0 +1,64 @@
+from conversation_store import ConversationStore
+
+def test_unknown_session_is_empty():
+    store = ConversationStore()
+    state = store.get("missing")
+    assert state == {"system": None, "summary": "", "turns": [], "updated_at": 0.0}
+
+def test_record_turn_and_messages():
+    store = ConversationStore()
+    store.record_turn("s", "Hi?", "Hello!", system="You are Arth-AI.")
+    store.record_turn("s", "Fees?", "They vary.")
+    state = store.get("s")
+
+    assert state["system"] == "You are Arth-AI."
+    assert [turn["content"] for turn in state["turns"]] == ["Hi?", "Hello!", "Fees?", "They vary."]
+    messages = store.messages(state, "Trainers?")
+    assert messages[0] == {"role": "system", "content": "You are Arth-AI."}
+    assert messages[-1] == {"role": "user", "content": "Trainers?"}
+    # A system prompt sent with the turn replaces the stored one
+    assert store.messages(state, "Trainers?", system="New prompt")[0]["content"] == "New prompt"
+
+def test_old_turns_fold_into_the_summary():
+    store = ConversationStore(max_turns=4)
+    for number in range(3):
+        store.record_turn("s", f"Question {number}?", f"Answer {number}.")
+    state = store.get("s")
+
+    assert [turn["content"] for turn in state["turns"]] == ["Question 2?", "Answer 2."]
+    assert state["summary"].splitlines() == ["- user: Question 0?", "- assistant: Answer 0.",
+                                             "- user: Question 1?", "- assistant: Answer 1."]
+    assert store.stats()["folds"] == 1
+
+def test_lru_eviction_ttl_and_reset():
+    store = ConversationStore(max_sessions=1)
+    store.record_turn("a", "u", "a")
+    store.record_turn("b", "u", "a")
+    assert store.get("a")["turns"] == []
+    assert store.reset("b") and not store.reset("b")
+
+    expired = ConversationStore(ttl_seconds=-1)
+    expired.record_turn("a", "u", "a")
+    assert expired.get("a")["turns"] == []
+
+def test_restore_seeds_a_lost_session():
+    store = ConversationStore(max_turns=4)
+    turns = [{"role": "user", "content": f"q{number}"} if number % 2 == 0 else
+             {"role": "assistant", "content": f"a{number}"} for number in range(6)]
+    state = store.restore("s", turns, system="You are Arth-AI.")
+
+    assert state["updated_at"] and store.get("s") == state
+    assert state["system"] == "You are Arth-AI."
+    assert [turn["content"] for turn in state["turns"]] == ["q4", "a5"]
+    assert "- user: q0" in state["summary"]
+
+def test_sqlite_store_survives_restarts_and_is_shared(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    first = ConversationStore(path=path)
+    second = ConversationStore(path=path)
+    first.record_turn("s", "Hi?", "Hello!", system="S")
+    assert second.get("s")["turns"][0]["content"] == "Hi?"
+    # A turn recorded by another worker replaces the cached copy
+    second.record_turn("s", "Fees?", "They vary.")
+    assert len(first.get("s")["turns"]) == 4
+    assert ConversationStore(path=path).get("s")["system"] == "S"
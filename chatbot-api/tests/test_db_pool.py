@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.open = True
+        self.pings = 0
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if not self.open:
+            raise ConnectionError("gone away")
+
+    def close(self):
+        self.open = False
+
+class Connector:
+    def __init__(self):
+        self.created = []
+
+    def __call__(self):
+        self.created.append(FakeConnection(len(self.created)))
+        return self.created[-1]
+
+@pytest.fixture
+def connector():
+    return Connector()
+
+def test_checkout_and_return_reuse_the_connection(connector):
+    pool = ConnectionPool(connector, max_size=2)
+    with pool.get() as conn:
+        first = conn.raw
+        assert pool.stats()["in_use"] == 1
+    with pool.get() as conn:
+        assert conn.raw is first
+    stats = pool.stats()
+    assert (stats["checkouts"], stats["created"], stats["in_use"], stats["idle"]) == (2, 1, 0, 1)
+    assert first.open
+
+def test_prefill_opens_min_size_connections(connector):
+    pool = ConnectionPool(connector, min_size=2, max_size=4)
+    assert pool.prefill() == 2
+    assert pool.prefill() == 0
+    assert pool.stats()["idle"] == 2
+
+def test_exhausted_pool_times_out(connector):
+    pool = ConnectionPool(connector, max_size=1, timeout=0.05)
+    held = pool.get()
+    with pytest.raises(PoolTimeout):
+        pool.get()
+    assert pool.stats()["timeouts"] == 1
+    held.close()
+    pool.get().close()
+
+def test_waiter_gets_a_returned_connection(connector):
+    pool = ConnectionPool(connector, max_size=1, timeout=5)
+    held = pool.get()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.get()))
+    waiter.start()
+    threading.Timer(0.05, held.close).start()
+    waiter.join(5)
+    assert got and got[0].raw is held.raw
+    assert pool.stats()["waits"] == 1
+
+def test_broken_connections_are_replaced(connector):
+    pool = ConnectionPool(connector, max_size=1, validate_after=0)
+    conn = pool.get()
+    # pymysql marks a connection that hit a fatal error as closed
+    conn.raw.open = False
+    conn.close()
+    replacement = pool.get()
+    assert replacement.raw is not connector.created[0]
+    replacement.discard()
+    assert not connector.created[1].open
+    assert pool.stats()["discarded"] == 2 and pool.stats()["size"] == 0
+
+def test_idle_connections_that_fail_ping_or_are_too_old_are_replaced(connector):
+    pool = ConnectionPool(connector, max_size=1, validate_after=0)
+    pool.get().close()
+    connector.created[0].open = False
+    assert pool.get().raw is connector.created[1]
+
+    old = ConnectionPool(connector, max_size=1, recycle_seconds=-1)
+    old.get().close()
+    assert old.get().raw is not connector.created[2]
+    assert old.stats()["recycled"] == 1
+
+def test_health_reports_pool_stats(backend, client, connector, monkeypatch):
+    monkeypatch.setattr(backend, "db_pool", ConnectionPool(connector, max_size=3))
+    monkeypatch.setattr(backend, "database_ready", True)
+    body = client.get("/cb/api/health").get_json()
+
+    assert body["services"]["database"] == "healthy"
+    pool = body["database_pool"]
+    assert (pool["checkouts"], pool["in_use"], pool["idle"], pool["max_size"]) == (1, 0, 1, 3)
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+from llm_gateway import GatewayError, GatewayOverloaded, LLMGateway
+
+REQUEST = {"model": "gpt-4.1-nano", "messages": [{"role": "user", "content": "Fees?"}]}
+
+def api_error(status):
+    response = httpx.Response(status, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    return openai.APIStatusError(f"status {status}", response=response, body=None)
+
+class FakeCompletions:
+    """Completions endpoint that replays outcomes (exceptions are raised) and can hold calls until released"""
+
+    def __init__(self, outcomes=None):
+        self.outcomes = list(outcomes or [])
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def _next(self, request):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else f"answer to {request['messages'][-1]['content']}"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def create(self, **request):
+        self.started.set()
+        self.release.wait(5)
+        return self._next(request)
+
+class FakeClient:
+    def __init__(self, completions):
+        self.chat = type("Chat", (), {"completions": completions})()
+
+class FakeAsyncCompletions(FakeCompletions):
+    async def create(self, **request):
+        self.started.set()
+        while not self.release.is_set():
+            await asyncio.sleep(0.01)
+        return self._next(request)
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+def test_identical_requests_share_one_upstream_call():
+    completions = FakeCompletions()
+    completions.release.clear()
+    gateway = LLMGateway(client=FakeClient(completions), backoff_base=0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gateway.complete(REQUEST))) for _ in range(5)]
+    threads[0].start()
+    assert completions.started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: gateway.stats()["coalesced"] == 4)
+    completions.release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert completions.calls == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {completion for completion, _ in results} == {"answer to Fees?"}
+    assert gateway.stats()["in_flight"] == 0
+
+def test_coalescing_can_be_disabled():
+    completions = FakeCompletions()
+    gateway = LLMGateway(client=FakeClient(completions), coalesce=False)
+    assert gateway.complete(REQUEST) == ("answer to Fees?", False)
+    assert gateway.complete(REQUEST) == ("answer to Fees?", False)
+    assert completions.calls == 2
+
+def test_retryable_errors_are_retried():
+    completions = FakeCompletions([api_error(429), api_error(503)])
+    gateway = LLMGateway(client=FakeClient(completions), backoff_base=0)
+    assert gateway.complete(REQUEST) == ("answer to Fees?", False)
+    stats = gateway.stats()
+    assert (stats["upstream"], stats["retries"], stats["failed"]) == (3, 2, 0)
+
+def test_client_errors_and_exhausted_retries_fail():
+    completions = FakeCompletions([api_error(400)])
+    gateway = LLMGateway(client=FakeClient(completions), backoff_base=0)
+    with pytest.raises(openai.APIStatusError):
+        gateway.complete(REQUEST)
+    assert completions.calls == 1
+
+    completions = FakeCompletions([api_error(500)] * 3)
+    gateway = LLMGateway(client=FakeClient(completions), max_retries=2, backoff_base=0)
+    with pytest.raises(openai.APIStatusError):
+        gateway.complete(REQUEST)
+    assert completions.calls == 3 and gateway.stats()["failed"] == 1
+
+def test_full_queue_is_rejected():
+    completions = FakeCompletions()
+    completions.release.clear()
+    gateway = LLMGateway(client=FakeClient(completions), max_concurrency=1, max_queue=0, coalesce=False)
+    leader = threading.Thread(target=gateway.complete, args=(REQUEST,))
+    leader.start()
+    assert completions.started.wait(5)
+    with pytest.raises(GatewayOverloaded):
+        gateway.complete(REQUEST)
+    completions.release.set()
+    leader.join(5)
+    assert gateway.stats()["rejected"] == 1 and gateway.limiter.active == 0
+
+def test_cancelled_async_leader_fails_followers_with_a_gateway_error():
+    completions = FakeAsyncCompletions()
+    completions.release.clear()
+    gateway = LLMGateway(async_client=FakeClient(completions))
+    follower_errors = []
+
+    def follow():
+        try:
+            gateway.complete(REQUEST)
+        except Exception as e:
+            follower_errors.append(e)
+
+    async def scenario():
+        leader = asyncio.ensure_future(gateway.complete_async(REQUEST))
+        while not completions.started.is_set():
+            await asyncio.sleep(0.01)
+        follower = threading.Thread(target=follow)
+        follower.start()
+        async_follower = asyncio.ensure_future(gateway.complete_async(REQUEST))
+        while gateway.stats()["coalesced"] < 2:
+            await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(GatewayError):
+            await async_follower
+        await asyncio.get_running_loop().run_in_executor(None, follower.join, 5)
+
+    asyncio.run(scenario())
+    assert len(follower_errors) == 1 and isinstance(follower_errors[0], GatewayError)
+    assert isinstance(follower_errors[0].__cause__, asyncio.CancelledError)
+    assert gateway.stats()["in_flight"] == 0 and gateway.limiter.active == 0
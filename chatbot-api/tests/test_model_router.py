@@ -0,0 +1,62 @@
+import pytest
+
+from model_router import ModelRouter, parse_routes
+
+GOOD = [{"id": "a", "distance": 0.3}]
+WEAK = [{"id": "a", "distance": 1.1}]
+
+@pytest.fixture
+def router():
+    return ModelRouter(weak_distance=0.8, long_question_words=40)
+
+def choose(router, text, chunks=GOOD, skip_reason=None):
+    route, reasons = router.choose(text, chunks, skip_reason)
+    return route.name, reasons
+
+def test_simple_turns_stay_on_the_first_rung(router):
+    assert choose(router, "What are the trainer fees?") == ("fast", [])
+    assert choose(router, "hi", chunks=[], skip_reason="small_talk") == ("fast", ["small_talk"])
+
+def test_weak_retrieval_climbs_one_rung(router):
+    assert choose(router, "What are the trainer fees?", chunks=WEAK) == ("standard", ["weak_retrieval"])
+    assert choose(router, "What are the trainer fees?", chunks=[], skip_reason="no_relevant_chunks") == \
+        ("standard", ["no_relevant_chunks"])
+
+@pytest.mark.parametrize("text, reason", [
+    ("Can you explain how payments work", "complex_question"),
+    ("What are the fees? And the schedule?", "multiple_questions"),
+    (" ".join(["word"] * 41), "long_question"),
+])
+def test_complex_questions_climb_one_rung(router, text, reason):
+    assert choose(router, text) == ("standard", [reason])
+
+def test_weak_and_complex_reach_the_top_rung(router):
+    assert choose(router, "Compare the SAP and React trainings", chunks=WEAK) == \
+        ("large", ["weak_retrieval", "complex_question"])
+
+def test_escalation_stops_at_the_last_rung():
+    router = ModelRouter(routes=[{"name": "only", "model": "gpt-4.1-nano", "max_tokens": 300}])
+    assert choose(router, "Compare the SAP and React trainings", chunks=WEAK)[0] == "only"
+
+def test_guided_flow_topics_stay_cheap_unless_complex():
+    router = ModelRouter(intent_score=lambda text: 0.9, intent_threshold=0.5)
+    assert choose(router, "How do I join as a trainer", chunks=WEAK) == ("fast", ["guided_flow_topic"])
+    assert choose(router, "Explain how I join as a trainer", chunks=WEAK)[0] == "large"
+
+def test_record_keeps_latency_and_cost_per_route(router):
+    route, _ = router.choose("What are the trainer fees?", GOOD, None)
+    router.record(route, 0.5, prompt_tokens=1000, completion_tokens=1000)
+    router.record(route, 1.5, prompt_tokens=1000, completion_tokens=1000, shared=True)
+    fast = router.stats()["routes"][0]
+
+    assert fast["requests"] == 1 and fast["completed"] == 2
+    assert fast["mean_seconds"] == 1.0
+    # The shared completion adds no tokens or cost
+    assert fast["prompt_tokens"] == 1000
+    assert fast["cost_usd"] == pytest.approx(0.0005)
+
+def test_routes_need_a_name_model_and_max_tokens():
+    with pytest.raises(ValueError):
+        parse_routes([])
+    with pytest.raises(ValueError):
+        parse_routes([{"name": "fast", "model": "gpt-4.1-nano"}])
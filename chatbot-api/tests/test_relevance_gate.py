@@ -0,0 +1,97 @@
+import pytest
+
+from relevance_gate import RelevanceGate, term_variants
+
+VOCABULARY = {"fee", "price", "course", "study", "trainer", "sap"}
+
+@pytest.fixture
+def gate():
+    return RelevanceGate(min_query_terms=3)
+
+@pytest.mark.parametrize("text", ["hi", "Hello there!", "thanks a lot :)", "ok", "bye, see you", "How are you?", ""])
+def test_small_talk_skips_retrieval(gate, text):
+    assert gate.needs_retrieval(text, known_term=VOCABULARY.__contains__) == "small_talk"
+
+@pytest.mark.parametrize("text", ["fees?", "pricing", "courses", "studies", "trainers?", "SAP"])
+def test_short_turns_with_inflected_known_terms_retrieve(gate, text):
+    assert gate.needs_retrieval(text, known_term=VOCABULARY.__contains__) is None
+
+def test_short_turns_without_known_terms_skip(gate):
+    assert gate.needs_retrieval("quantum physics?", known_term=VOCABULARY.__contains__) == "no_known_terms"
+    # Long enough turns always retrieve
+    assert gate.needs_retrieval("tell me about quantum physics", known_term=VOCABULARY.__contains__) is None
+    # Without a vocabulary lookup only small talk is skipped
+    assert gate.needs_retrieval("quantum physics?") is None
+
+def test_lookup_uses_the_given_collection_only(gate):
+    student_terms = {"internship"}
+    assert gate.needs_retrieval("fees?", known_term=student_terms.__contains__) == "no_known_terms"
+    assert gate.needs_retrieval("internships?", known_term=student_terms.__contains__) is None
+
+def test_disabled_gate_and_stats():
+    gate = RelevanceGate(enabled=False)
+    assert gate.needs_retrieval("hi") is None
+    enabled = RelevanceGate()
+    enabled.needs_retrieval("thanks")
+    enabled.needs_retrieval("zzz", known_term=VOCABULARY.__contains__)
+    stats = enabled.stats()
+    assert stats["small_talk"] == 1 and stats["no_known_terms"] == 1
+
+def test_term_variants():
+    assert "fee" in term_variants("fees")
+    assert "study" in term_variants("studies")
+    assert "price" in term_variants("pricing")
+    assert "price" in term_variants("priced")
+    assert "fees" in term_variants("fee")
+    assert "clas" not in term_variants("class")
+
+def test_filter_cuts_at_distance_and_margin():
+    gate = RelevanceGate(max_distance=1.0, distance_margin=0.3)
+    chunks = [{"id": "a", "distance": 0.4}, {"id": "b", "distance": 0.6}, {"id": "c", "distance": 0.8},
+              {"id": "d", "distance": None}]
+    assert [chunk["id"] for chunk in gate.filter(chunks)] == ["a", "b", "d"]
+    assert gate.filter([{"id": "far", "distance": 1.2}]) == []
+
+def test_keyword_hits_are_exempt_from_the_margin_but_not_the_cutoff():
+    gate = RelevanceGate(max_distance=1.0, distance_margin=0.3)
+    chunks = [{"id": "a", "distance": 0.1, "keyword_rank": None},
+              {"id": "exact", "distance": 0.8, "keyword_rank": 0},
+              {"id": "paraphrase", "distance": 0.8, "keyword_rank": None},
+              {"id": "far", "distance": 1.2, "keyword_rank": 1}]
+    assert [chunk["id"] for chunk in gate.filter(chunks)] == ["a", "exact"]
+
+class KeywordFakeBackend:
+    """Puts texts about S4HANA far from the query in embedding space and everything else next to it"""
+
+    model_name = "fake"
+
+    def embed(self, texts):
+        return [[0.6, 0.8, 0.0] if "s4hana" in text.lower() else [1.0, 0.0, 0.0] for text in texts]
+
+def test_hybrid_keyword_only_hit_survives_the_gate(tmp_path):
+    import chromadb
+    from chromadb.config import Settings
+
+    from chromadb_manager import ChromaDBManager
+    from embeddings import Embedder
+
+    manager = ChromaDBManager(persist_path=str(tmp_path), embedder=Embedder(KeywordFakeBackend()),
+                              collection_name="hybrid_test", chroma_client=chromadb.PersistentClient(
+                                  path=str(tmp_path), settings=Settings(anonymized_telemetry=False)))
+    documents = [f"Pasta recipe number {number} with tomato sauce." for number in range(8)] + \
+        ["The SAP S4HANA certification course covers finance."]
+    manager.write_chunks([f"c{number}" for number in range(len(documents))], documents,
+                         [{"filename": "docs.txt", "chunk_index": number} for number in range(len(documents))])
+
+    results = manager.search_documents("S4HANA", n_results=3, hybrid=True, query_embedding=[1.0, 0.0, 0.0])
+    position = results["ids"].index("c8")
+    # Only the keyword ranking found it, at a distance well past the margin
+    assert results["keyword_ranks"][position] == 0
+    assert results["distances"][position] == pytest.approx(0.8) and min(results["distances"]) == pytest.approx(0.0)
+
+    gate = RelevanceGate(max_distance=1.3, distance_margin=0.3)
+    chunks = [{"id": chunk_id, "distance": distance, "keyword_rank": keyword_rank}
+              for chunk_id, distance, keyword_rank in zip(results["ids"], results["distances"],
+                                                          results["keyword_ranks"])]
+    assert "c8" in [chunk["id"] for chunk in gate.filter(chunks)]
+    assert "c8" not in [chunk["id"] for chunk in gate.filter([dict(chunk, keyword_rank=None) for chunk in chunks])]
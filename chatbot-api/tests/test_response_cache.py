@@ -0,0 +1,55 @@
+from response_cache import ResponseCache
+
+MESSAGES = [{"role": "system", "content": "You are Arth-AI."}, {"role": "user", "content": "What are the fees?"}]
+
+def keys(cache, messages=MESSAGES, chunk_ids=("a", "b"), scope="documents"):
+    return cache.make_keys("gpt-4.1-nano", 0.7, 1024, messages, list(chunk_ids), scope=scope)
+
+def test_exact_hit_ignores_case_whitespace_and_chunk_order():
+    cache = ResponseCache()
+    key, bucket = keys(cache)
+    cache.put(key, bucket, "answer")
+    variant = [MESSAGES[0], {"role": "user", "content": "  what are   the FEES? "}]
+    assert keys(cache, variant, chunk_ids=("b", "a")) == (key, bucket)
+    assert cache.get(key, bucket) == ("answer", "exact")
+
+def test_scope_and_retrieved_chunks_change_the_key():
+    cache = ResponseCache()
+    key, bucket = keys(cache)
+    assert keys(cache, scope="student")[0] != key
+    assert keys(cache, chunk_ids=("a", "c"))[0] != key
+    # Same conversation and settings: same semantic bucket
+    assert keys(cache, chunk_ids=("a", "c"))[1] == bucket
+
+def test_semantic_hit_needs_the_threshold_and_the_same_bucket():
+    cache = ResponseCache(similarity_threshold=0.9)
+    key, bucket = keys(cache)
+    cache.put(key, bucket, "answer", embedding=[1.0, 0.0])
+    assert cache.get("other", bucket, embedding=[0.99, 0.05]) == ("answer", "semantic")
+    assert cache.get("other", bucket, embedding=[0.0, 1.0]) == (None, None)
+    assert cache.get("other", "other-bucket", embedding=[1.0, 0.0]) == (None, None)
+
+def test_lru_eviction_and_ttl():
+    cache = ResponseCache(max_entries=2)
+    for name in ("a", "b"):
+        cache.put(name, "bucket", name)
+    cache.get("a", "bucket")
+    cache.put("c", "bucket", "c")
+    assert cache.get("b", "bucket") == (None, None)
+    assert cache.get("a", "bucket") == ("a", "exact")
+    assert cache.stats()["evictions"] == 1
+
+    expired = ResponseCache(ttl_seconds=-1)
+    expired.put("a", "bucket", "a")
+    assert expired.get("a", "bucket") == (None, None)
+
+def test_disabled_cache_and_invalidate():
+    disabled = ResponseCache(enabled=False)
+    disabled.put("a", "bucket", "a")
+    assert disabled.get("a", "bucket") == (None, None)
+
+    cache = ResponseCache()
+    cache.put("a", "bucket", "a")
+    cache.invalidate()
+    assert cache.get("a", "bucket") == (None, None)
+    assert cache.stats()["invalidations"] == 1
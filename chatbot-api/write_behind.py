@@ -0,0 +1,104 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger("flexwork-chatbot-api")
+
+class WriteBehindBuffer:
+    """Coalesces repeated writes for the same key into one deferred write.
+
+    The first submit for a key schedules a flush window_seconds later; any further
+    submits for that key inside the window replace the pending value, so only the
+    latest state is written. A single daemon thread performs the flushes.
+    """
+
+    def __init__(self, flush: Callable[[Any], Any], window_seconds: float = 2.0, max_retries: int = 2):
+        self._flush = flush
+        self.window_seconds = window_seconds
+        self.max_retries = max_retries
+        self._pending: Dict[Hashable, Dict[str, Any]] = {}
+        self._cond = threading.Condition(threading.Lock())
+        self._stopped = False
+        self._stats = {"submitted": 0, "coalesced": 0, "flushed": 0, "failed": 0}
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, key: Hashable, value: Any) -> bool:
+        """Queue a write; returns True if it replaced a pending write for the same key"""
+        with self._cond:
+            self._stats["submitted"] += 1
+            pending = self._pending.get(key)
+            if pending:
+                pending["value"] = value
+                self._stats["coalesced"] += 1
+                return True
+            self._pending[key] = {
+                "value": value,
+                "due": time.monotonic() + self.window_seconds,
+                "attempts": 0
+            }
+            self._cond.notify()
+            return False
+
+    def _take_due(self):
+        """Wait for the next due write(s) and remove them from the pending map"""
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                due = [key for key, item in self._pending.items() if item["due"] <= now]
+                if due:
+                    return [(key, self._pending.pop(key)) for key in due]
+                timeout = min((item["due"] for item in self._pending.values()), default=now + 60) - now
+                self._cond.wait(max(timeout, 0))
+            return []
+
+    def _write(self, key: Hashable, item: Dict[str, Any]) -> None:
+        try:
+            self._flush(item["value"])
+            with self._cond:
+                self._stats["flushed"] += 1
+        except Exception as e:
+            item["attempts"] += 1
+            with self._cond:
+                # Requeue unless a newer value already arrived or retries are exhausted
+                if item["attempts"] <= self.max_retries and key not in self._pending:
+                    item["due"] = time.monotonic() + self.window_seconds
+                    self._pending[key] = item
+                    self._cond.notify()
+                    logger.warning(f"Write-behind flush for {key} failed, retrying: {e}")
+                    return
+                self._stats["failed"] += 1
+            logger.error(f"Write-behind flush for {key} failed: {e}")
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_due()
+            if not batch:
+                return
+            for key, item in batch:
+                self._write(key, item)
+
+    def flush_all(self) -> None:
+        """Write every pending value immediately (e.g. at shutdown)"""
+        with self._cond:
+            batch = list(self._pending.items())
+            self._pending.clear()
+        for key, item in batch:
+            item["attempts"] = self.max_retries  # no background retry at shutdown
+            self._write(key, item)
+
+    def stop(self) -> None:
+        """Flush pending writes and stop the background thread"""
+        self.flush_all()
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        stats["window_seconds"] = self.window_seconds
+        return stats
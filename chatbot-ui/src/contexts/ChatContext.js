@@ -143,7 +143,7 @@ export const ChatProvider = ({ children }) => {
     dispatch({ type: RESET_CHAT });
     
     // Generate a new session ID
-    const sessionId = `session-${Date.now()}`;
+    const sessionId = crypto.randomUUID();
     dispatch({ type: SET_SESSION_ID, payload: sessionId });
     
     // Add welcome message
@@ -315,7 +315,7 @@ export const ChatProvider = ({ children }) => {
       dispatch({ type: RESET_CHAT });
       
       // Generate a new session ID
-      const sessionId = `session-${Date.now()}`;
+      const sessionId = crypto.randomUUID();
       dispatch({ type: SET_SESSION_ID, payload: sessionId });
     }
     
@@ -388,7 +388,7 @@ export const ChatProvider = ({ children }) => {
     
     try {
       // Call Groq API with user selections for context
-      const response = await callGroqAPI(userInput, state.userSelections);
+      const response = await callGroqAPI(userInput, state.userSelections, state.sessionId);
       
       // Create new bot message
       const botResponse = {
@@ -26,6 +26,7 @@ class ConversationManager {
       }
     ];
     this.maxHistoryLength = 20; // Maximum number of messages to keep in history
+    this.sessionTurns = {}; // Recent turns per session, resent if the server lost the session
   }
 
   addUserMessage(message) {
@@ -57,8 +58,19 @@ class ConversationManager {
     }
   }
 
+  addSessionTurn(sessionId, userMessage, assistantMessage) {
+    const turns = this.getSessionTurns(sessionId);
+    turns.push({ role: "user", content: userMessage }, { role: "assistant", content: assistantMessage });
+    this.sessionTurns[sessionId] = turns.slice(-this.maxHistoryLength);
+  }
+
+  getSessionTurns(sessionId) {
+    return [...(this.sessionTurns[sessionId] || [])];
+  }
+
   reset() {
     this.history = [this.history[0]]; // Keep only the system message
+    this.sessionTurns = {};
   }
 }
 
@@ -69,18 +81,23 @@ const conversationManager = new ConversationManager();
  * Call Groq API for chat completion
  * @param {string|Array} input - The message from the user or an array of message objects
  * @param {Object} userSelections - Optional user selections from previous steps
+ * @param {string} sessionId - Optional chat session id; the server then keeps the history
  * @returns {Promise<string>} - The AI response
  */
-export const callGroqAPI = async (input, userSelections = {}) => {
+export const callGroqAPI = async (input, userSelections = {}, sessionId = null) => {
   // Handle different input types
   let messages;
 
   // Log selection types but not values for privacy
 
+  // With a session id the server keeps the conversation, so only the new message is sent
+  const serverHistory = Boolean(sessionId) && !Array.isArray(input);
   
   if (Array.isArray(input)) {
     // Direct prompt array for transcript summary
     messages = input;
+  } else if (serverHistory) {
+    messages = [];
   } else {
     // Regular user message
     conversationManager.addUserMessage(input);
@@ -140,11 +157,19 @@ export const callGroqAPI = async (input, userSelections = {}) => {
     content: systemContent
   };
 
-  // Always replace the first system message or add it if not present
-  if (messages.length && messages[0].role === "system") {
-    messages[0] = systemPrompt;
+  let body;
+  if (serverHistory) {
+    // "continued" lets the server report a session it no longer holds instead of starting over
+    const continued = conversationManager.getSessionTurns(sessionId).length > 0;
+    body = { sessionId, message: input, system: systemContent, continued };
   } else {
-    messages = [systemPrompt, ...messages];
+    // Always replace the first system message or add it if not present
+    if (messages.length && messages[0].role === "system") {
+      messages[0] = systemPrompt;
+    } else {
+      messages = [systemPrompt, ...messages];
+    }
+    body = { messages };
   }
 
 
@@ -156,12 +181,19 @@ export const callGroqAPI = async (input, userSelections = {}) => {
   // const baseUrl = 'https://devapi.flex-work.in/cb'; // DEV
   const baseUrl = 'https://api.flex-work.in/cb'; // PROD
     
+  const postChat = (payload) => fetch(`${baseUrl}/api/groq/chat`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify(payload)
+  });
+
   try {
-    const response = await fetch(`${baseUrl}/api/groq/chat`, {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ messages })
-    });
+    let response = await postChat(body);
+
+    if (serverHistory && response.status === 409) {
+      // The server lost the session (restart, eviction or another server): resend the recent turns
+      response = await postChat({ ...body, history: conversationManager.getSessionTurns(sessionId) });
+    }
 
     if (!response.ok) {
       throw new Error(`Flask server error: ${response.status}`);
@@ -171,7 +203,9 @@ export const callGroqAPI = async (input, userSelections = {}) => {
     const assistantResponse = data.content || data.choices?.[0]?.message?.content || data;
     
     // Only add to conversation history if it's a regular user message
-    if (!Array.isArray(input)) {
+    if (serverHistory) {
+      conversationManager.addSessionTurn(sessionId, input, assistantResponse);
+    } else if (!Array.isArray(input)) {
       conversationManager.addAssistantMessage(assistantResponse);
     }
     
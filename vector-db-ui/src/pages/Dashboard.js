@@ -44,6 +44,7 @@ function Dashboard() {
     collection_name: '',
   });
   const [documents, setDocuments] = useState([]);
+  const [documentTotal, setDocumentTotal] = useState(0);
 
   useEffect(() => {
     const fetchData = async () => {
@@ -63,9 +64,11 @@ function Dashboard() {
         // Check if the response has the expected structure
         if (documentsResponse && documentsResponse.documents) {
           setDocuments(documentsResponse.documents);
+          setDocumentTotal(documentsResponse.total_documents ?? documentsResponse.documents.length);
         } else {
           // Handle case where documents array might be missing
           setDocuments([]);
+          setDocumentTotal(0);
           console.warn('Documents response missing expected structure:', documentsResponse);
         }
 
@@ -91,10 +94,10 @@ function Dashboard() {
           documents.filter(doc => doc.filename.toLowerCase().endsWith('.docx')).length,
           documents.filter(doc => doc.filename.toLowerCase().endsWith('.txt')).length,
           documents.filter(doc => doc.filename.toLowerCase().endsWith('.csv')).length,
-          documents.filter(doc => doc.filename.toLowerCase().endsWith('.json')).length,
+          documents.filter(doc => /\.jsonl?$/.test(doc.filename.toLowerCase())).length,
           documents.filter(doc => {
             const ext = doc.filename.split('.').pop().toLowerCase();
-            return !['pdf', 'docx', 'txt', 'csv', 'json'].includes(ext);
+            return !['pdf', 'docx', 'txt', 'csv', 'json', 'jsonl'].includes(ext);
           }).length,
         ],
         backgroundColor: [
@@ -118,8 +121,8 @@ function Dashboard() {
     ],
   };
 
-  // Calculate total chunks
-  const totalChunks = documents.reduce((sum, doc) => sum + doc.chunk_count, 0);
+  // Total chunks come from the collection itself rather than summing the listed documents
+  const totalChunks = dbStatus.collection_count ?? documents.reduce((sum, doc) => sum + doc.chunk_count, 0);
 
   if (loading) {
     return (
@@ -171,7 +174,7 @@ function Dashboard() {
                 Documents
               </Typography>
               <Typography variant="h3" color="text.primary" sx={{ mb: 1, fontWeight: 'bold' }}>
-                {documents.length}
+                {documentTotal}
               </Typography>
               <Typography variant="body2" color="text.secondary">
                 Total Chunks: {totalChunks}
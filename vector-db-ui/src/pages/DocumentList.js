@@ -129,6 +129,7 @@ function DocumentList() {
         color = 'success';
         break;
       case 'json':
+      case 'jsonl':
         color = 'warning';
         break;
       default:
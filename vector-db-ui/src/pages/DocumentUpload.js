@@ -83,6 +83,7 @@ function DocumentUpload() {
       'text/plain': ['.txt'],
       'text/csv': ['.csv'],
       'application/json': ['.json'],
+      'application/x-ndjson': ['.jsonl'],
     },
     maxFiles: 1,
   });
@@ -136,7 +137,7 @@ function DocumentUpload() {
       { name: 'Word', ext: '.docx, .doc' },
       { name: 'Text', ext: '.txt' },
       { name: 'CSV', ext: '.csv' },
-      { name: 'JSON', ext: '.json' },
+      { name: 'JSON', ext: '.json, .jsonl' },
     ];
   };
 
@@ -250,7 +251,7 @@ function DocumentUpload() {
               <li>Word documents (.docx, .doc)</li>
               <li>Plain text files (.txt)</li>
               <li>CSV spreadsheets (.csv)</li>
-              <li>JSON files (.json)</li>
+              <li>JSON and JSON Lines files (.json, .jsonl)</li>
             </ul>
             
             <Typography variant="subtitle2" gutterBottom sx={{ mt: 2 }}>
@@ -21,6 +21,9 @@ api.interceptors.response.use(
   }
 );
 
+// Largest page the documents endpoint serves
+const DOCUMENTS_PAGE_LIMIT = 1000;
+
 // Vector DB API service
 export const vectorDbApi = {
   // Get vector database status
@@ -74,11 +77,33 @@ export const vectorDbApi = {
     }
   },
 
-  // List all documents in vector database
+  // List all documents in vector database, following the keyset pages (next_cursor) to the end
   listDocuments: async () => {
     try {
-      const response = await api.get('/api/vector-db/documents');
-      return response.data;
+      const documents = [];
+      let cursor = null;
+      let totalDocuments;
+      do {
+        const params = { limit: DOCUMENTS_PAGE_LIMIT };
+        if (cursor) {
+          params.cursor = cursor;
+        } else {
+          // The catalog count is only needed once
+          params.include_total = true;
+        }
+        const response = await api.get('/api/vector-db/documents', { params });
+        documents.push(...(response.data.documents || []));
+        if (response.data.total_documents !== undefined) {
+          totalDocuments = response.data.total_documents;
+        }
+        cursor = response.data.next_cursor;
+      } while (cursor);
+      return {
+        status: 'success',
+        documents,
+        document_count: documents.length,
+        total_documents: totalDocuments ?? documents.length
+      };
     } catch (error) {
       console.error('Error listing documents:', error);
       throw error;